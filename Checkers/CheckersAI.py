@@ -1,9 +1,27 @@
+import logging
 import random
+import time
+from Checkers.CheckersBitboard import BitboardMove, newMoveBuffer, packedMoveID, MAX_MOVES, CAPTURE_SHIFT
+from Checkers.CheckersEngine import computeScore, AMERICAN
+from Checkers.CheckersTablebase import MAX_DISTANCE
+from Checkers.CheckersTransposition import TranspositionTable, EXACT, LOWER, UPPER, NO_MOVE, DEFAULT_SIZE_MB
 
+log = logging.getLogger(__name__)
 
-pieceScore = {"K": 1, "Q": 10, "R": 5, "B": 3, "N": 3, "p": 1} #A dictionary that assigns points to each piece
-CHECKMATE = 1000 #Points assigned to checkmate
+CHECKMATE = 100000 #Points assigned to winning, more than any evaluation can add up to
 STALEMATE = 0 #Points assigned to stalemate
+MOBILITY_WEIGHT = 2 #Points for every quiet step a side has over the other
+DEPTH = 6 #Default depth for the negamax search, captures and forced moves are followed past it
+MAX_PLY = 128 #Deeper than any search will go, scores within this of CHECKMATE are wins or losses
+QUIESCENCE_DEPTH = 24 #Most plies of captures searched past the horizon
+QUIESCENCE_NODES = 4000 #Most nodes one quiescence search may visit before the rest of its leaves are just scored
+EXTENSION_FRACTION = 4 #A line may gain at most a quarter of the iteration's depth (and one ply) from forced moves
+CHECK_INTERVAL = 256 #Nodes searched between looks at the clock and the stop event, a few milliseconds
+transpositionTable = None #Shared by every search in this process, made the first time it is needed
+tablebase = None #CheckersTablebase.Tablebase probed at the leaves once few enough pieces are left, see setTablebase
+TABLEBASE_WIN = CHECKMATE // 2 #Score of a tablebase win, less the plies to get there so shorter wins score higher
+WIN_SCORE = TABLEBASE_WIN - MAX_PLY - MAX_DISTANCE #Scores this far from 0 or further are wins or losses
+openingBook = None #CheckersBook.OpeningBook consulted before searching, see setOpeningBook
 
 '''
 Picks and returns a random move
@@ -12,77 +30,61 @@ def findRandomMove(validMoves):
     return validMoves[random.randint(0, len(validMoves)-1)]
 
 
-def findBestMove(gs, validMoves): #fix pawn bug
-    turnMultiplier = 1 if gs.whiteToMove else -1 #Whether the AI plays white(1) or black(-1)
+def findBestMove(gs, validMoves):
+    info = SearchInfo() #for the capture searches at the leaves
     opponentsMinMaxScore = CHECKMATE
     bestPlayerMove = None
     random.shuffle(validMoves)
-    # equalMoves = []  # Moves of equivalent score impact
     for playerMove in validMoves:
         gs.makeMove(playerMove)
-        #print("AI: ", playerMove.pieceMoved, playerMove.moveID, playerMove.endRow, playerMove.endCol)
         #Finds the best move of the opponent after making our move
         #(Finding maximum score of opponents best move)
         opponentsMoves = gs.getValidMoves()
-        opponentsMaxScore = -CHECKMATE
-        for opponentsMove in opponentsMoves:
-            gs.makeMove(opponentsMove)
-            #print("Opponent: ", opponentsMove.pieceMoved, opponentsMove.moveID, opponentsMove.endRow, opponentsMove.endCol)
-            if gs.checkmate:
-                score = -turnMultiplier * CHECKMATE
-            elif gs.stalemate:
-                score = STALEMATE
-            else:
-                score = -turnMultiplier * scoreMaterial(gs.board) #Aiming for either 1000 or -1000 based on who the AI is
-            if score > opponentsMaxScore:
-                opponentsMaxScore = score
-            gs.undoMove()
+        if len(opponentsMoves) == 0: #the opponent can't move, so this move wins
+            opponentsMaxScore = -CHECKMATE
+        else:
+            opponentsMaxScore = -CHECKMATE
+            for opponentsMove in opponentsMoves:
+                gs.makeMove(opponentsMove)
+                playerMoves = gs.getValidMoves()
+                if len(playerMoves) == 0:
+                    score = CHECKMATE #we can't move after the opponent's reply, so we lose
+                else: #our score once the captures left on the board are played out, negated for the opponent
+                    score = -quiescence(gs, playerMoves, -CHECKMATE - 1, CHECKMATE + 1, 2, info)
+                if score > opponentsMaxScore:
+                    opponentsMaxScore = score
+                gs.undoMove()
         #Finds our best move based on what move is the lowest best move of our opponent after our move
         #(Finding minimum from all of maximum scores of opponents best move after our move)
         if opponentsMaxScore < opponentsMinMaxScore:
             opponentsMinMaxScore = opponentsMaxScore
             bestPlayerMove = playerMove
-        #     equalMoves.clear()
-        #     equalMoves.append(playerMove)
-        # elif opponentsMaxScore == opponentsMinMaxScore:
-        #     equalMoves.append(playerMove)
         gs.undoMove()
-
-    # if len(equalMoves) > 1: #If there are more than 1 equivalent moves, randomly pick one
-    #     bestPlayerMove = findRandomMove(equalMoves)
-    #     equalMoves.clear()
-    #print("Moved: ", bestPlayerMove.pieceMoved)
     return bestPlayerMove
 
 '''
-Greedy Algorithm - Find the best move based on material alone
+Greedy Algorithm - Find the best move based on the evaluation alone, once the captures it leads to are played out
 '''
 def greedyAlgo(gs, validMoves):
-    turnMultiplier = 1 if gs.whiteToMove else -1 #Whether the AI plays white or black
+    info = SearchInfo()
     maxScore = -CHECKMATE
     bestMove = None
     equalMoves = [] #Moves of equivalent score impact
     for playerMove in validMoves:
         gs.makeMove(playerMove)
-        if gs.checkmate:
-            score = CHECKMATE
-        elif gs.stalemate:
-            score = STALEMATE
-        else:
-            score = turnMultiplier*scoreMaterial(gs.board) #Aiming for either 1000 or -1000 based on who the AI is
-        # print("Score: ", score, "MaxScore: ", maxScore)
+        opponentsMoves = gs.getValidMoves()
+        if len(opponentsMoves) == 0:
+            score = CHECKMATE #the opponent has no moves left
+        else: #scored after any captures the move runs into, not in the middle of the exchange
+            score = -quiescence(gs, opponentsMoves, -CHECKMATE - 1, CHECKMATE + 1, 1, info)
         if score > maxScore:
             maxScore = score
             bestMove = playerMove
             equalMoves.clear()
             equalMoves.append(playerMove)
         elif score == maxScore:
-            #print("Appended Score: ", score)
             equalMoves.append(playerMove)
         gs.undoMove()
-    # print("Max: ", maxScore)
-    # print("Valid: ", len(validMoves))
-    # print("Equal: ", len(equalMoves))
     if len(equalMoves) > 1: #If there are more than 1 equivalent moves, randomly pick one
         bestMove = findRandomMove(equalMoves)
         equalMoves.clear()
@@ -90,16 +92,460 @@ def greedyAlgo(gs, validMoves):
     return bestMove
 
 '''
-Score the board based on material
+Score the board from red's point of view: men, kings, back row guards and centre control (see
+CheckersEngine.PIECE_SQUARE_SCORES). This scans the whole board, the search uses scoreBoard instead
 '''
 def scoreMaterial(board):
-    score = 0
-    for row in board:
-        for square in row:
-            if square[0] == 'w':
-                score += pieceScore[square[1]]
-            elif square[0] == 'b':
-                score -= pieceScore[square[1]]
+    return computeScore(board)
+
+'''
+Score the position from red's point of view. The material and piece-square part is kept up to date by
+makeMove/undoMove in evalScore, mobility is counted for the position. Both state classes count it the same way, so a
+position scores the same in either and they can share the transposition table
+'''
+def scoreBoard(gs):
+    return gs.evalScore + MOBILITY_WEIGHT * gs.mobility()
+
+'''
+Score for the negamax search, from the point of view of the side to move
+'''
+def scoreRelative(gs):
+    return scoreBoard(gs) if gs.redToMove else -scoreBoard(gs)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+'''
+Everything the negamax search keeps track of while it runs: node count, deadline, node budget and the principal
+variation. stopEvent is anything with an is_set() method (a threading.Event), setting it stops the search like the
+deadline does. The search only compares its node count with nextCheck at every node, the clock and the stop event are
+looked at every CHECK_INTERVAL nodes and a node budget is stopped at exactly
+'''
+class SearchInfo():
+    def __init__(self, timeLimit=None, tt=None, stopEvent=None, nodeLimit=None):
+        self.tt = tt
+        self.nodes = 0
+        self.deadline = None if timeLimit is None else time.monotonic() + timeLimit
+        self.stopEvent = stopEvent
+        self.nodeLimit = nodeLimit
+        self.nextCheck = CHECK_INTERVAL if nodeLimit is None else min(CHECK_INTERVAL, nodeLimit)
+        self.pv = [] #best line found by the last finished iteration
+        self.score = 0
+        self.depth = 0 #depth of the last finished iteration
+        self.extendedDepth = 0 #ply + depth a line may reach with forced move extensions, set for every iteration
+        self.quiescenceStop = 0 #node count at which the running quiescence search stops following captures
+        self.rootScore = 0 #score of the best root move so far in the running iteration
+        self.moveBuffer = None #array('Q') with a MAX_MOVES slice for every ply, made by searchMoves for a BitboardState
+
+    def shouldStop(self):
+        if self.nodeLimit is not None and self.nodes >= self.nodeLimit:
+            return True
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            return True
+        return self.stopEvent is not None and self.stopEvent.is_set()
+
+    def checkStop(self):
+        if self.shouldStop():
+            raise SearchTimeout()
+        self.nextCheck = self.nodes + CHECK_INTERVAL
+        if self.nodeLimit is not None and self.nodeLimit < self.nextCheck:
+            self.nextCheck = self.nodeLimit
+
+
+'''
+Negamax with alpha-beta pruning and iterative deepening. Searches one ply deeper each iteration until depth is reached
+or timeLimit (seconds) runs out, and returns the best move of the last finished iteration
+'''
+def findBestMoveNegaMax(gs, validMoves, depth=DEPTH, timeLimit=None):
+    move = bookMove(gs, validMoves)
+    if move is not None:
+        return move
+    info = searchPosition(gs, validMoves, depth, timeLimit)
+    return info.pv[0] if len(info.pv) != 0 else None
+
+
+'''
+The transposition table used when a search isn't given its own. sizeMB caps its memory, changing it starts a new table
+'''
+def getTranspositionTable(sizeMB=None):
+    global transpositionTable
+    if transpositionTable is None or (sizeMB is not None and sizeMB != transpositionTable.sizeMB):
+        transpositionTable = TranspositionTable(DEFAULT_SIZE_MB if sizeMB is None else sizeMB)
+    return transpositionTable
+
+
+'''
+Makes every search in this process look positions with few enough pieces up in the tablebase in directory. The files
+are memory-mapped, so processes using the same directory share them. None turns probing off. Only searches of a
+BitboardState probe, a CheckersEngine.GameState search plays on without it (search BitboardState.fromGameState(gs) to
+use the tablebase)
+'''
+def setTablebase(directory):
+    global tablebase
+    from Checkers.CheckersTablebase import Tablebase
+    opened = Tablebase(directory) if directory is not None else None #if this fails the old tablebase stays in use
+    if tablebase is not None:
+        tablebase.close()
+    tablebase = opened
+
+
+'''
+Makes bookMove answer from the opening book file at path. None turns the book off
+'''
+def setOpeningBook(path):
+    global openingBook
+    from Checkers.CheckersBook import OpeningBook
+    opened = OpeningBook(path) if path is not None else None #if this fails the old book stays in use
+    if openingBook is not None:
+        openingBook.close()
+    openingBook = opened
+
+
+'''
+A move out of validMoves from the opening book, or None when there is no book or the position isn't in it
+'''
+def bookMove(gs, validMoves):
+    if openingBook is None or len(validMoves) == 0 or getattr(gs, 'variant', AMERICAN) is not AMERICAN:
+        return None #the book only knows American checkers
+    move = openingBook.chooseMove(gs, validMoves)
+    if move is not None:
+        log.debug("book move %s", move.getChessNotation())
+    return move
+
+
+'''
+Runs the search and returns its SearchInfo. gs needs a zobristHash unless useTable is False. onIteration, if given, is
+called with the SearchInfo after every finished iteration. The search stops at depth, after timeLimit seconds, after
+nodeLimit nodes or when stopEvent is set, whichever comes first. When it is stopped partway through an iteration that
+had already finished searching a root move, the best root move of that iteration is kept, it was searched deeper than
+the last finished iteration's; the depth stays that of the last finished iteration
+'''
+def searchPosition(gs, validMoves, depth=DEPTH, timeLimit=None, tt=None, useTable=True, stopEvent=None,
+                   onIteration=None, nodeLimit=None):
+    if useTable and tt is None:
+        tt = getTranspositionTable()
+    if tt is not None:
+        tt.newSearch()
+    info = SearchInfo(timeLimit, tt, stopEvent, nodeLimit)
+    logLength = len(gs.moveLog)
+    for d in range(1, depth + 1):
+        if d > 1 and info.shouldStop(): #stopped between iterations, e.g. by a controller that saw the time was short
+            break
+        pvLine = []
+        info.extendedDepth = d + 1 + d // EXTENSION_FRACTION
+        try:
+            score = searchMoves(gs, validMoves, d, -CHECKMATE - 1, CHECKMATE + 1, 0, info, pvLine)
+        except SearchTimeout:
+            while len(gs.moveLog) > logLength: #put the board back the way it was when the search started
+                gs.undoMove()
+            log.debug("depth %d stopped after %d nodes", d, info.nodes)
+            if len(pvLine) != 0: #pvLine holds the best root move searched to completion in this iteration
+                info.pv = pvLine
+                info.score = info.rootScore
+            break
+        info.pv = pvLine if tt is None else extendPV(gs, pvLine, tt, d)
+        info.score = score
+        info.depth = d
+        if log.isEnabledFor(logging.INFO):
+            log.info("depth %d score %d nodes %d pv %s", d, score, info.nodes,
+                     ' '.join(move.getChessNotation() for move in info.pv))
+        if onIteration is not None:
+            onIteration(info)
+        if abs(score) >= CHECKMATE - d: #a forced win or loss was found, searching deeper won't change it
+            break
+    return info
+
+
+'''
+A table hit ends the principal variation early, so it is finished off with the best moves the table remembers for the
+positions after it, up to length moves long
+'''
+def extendPV(gs, pvLine, tt, length):
+    pv = list(pvLine)
+    for move in pv:
+        gs.makeMove(move)
+    while len(pv) < length:
+        slot = tt.probe(gs.zobristHash)
+        if slot is None or tt.moves[slot] == NO_MOVE:
+            break
+        move = findMove(gs, tt.moves[slot])
+        if move is None:
+            break
+        pv.append(move)
+        gs.makeMove(move)
+    for move in pv:
+        gs.undoMove()
+    return pv
+
+
+'''
+The legal move of gs with the given moveID, None if it has none
+'''
+def findMove(gs, moveID):
+    if not hasattr(gs, 'generateMoves'):
+        return next((m for m in gs.getValidMoves() if m.moveID == moveID), None)
+    buffer = gs.moveBuffer
+    for i in range(gs.generateMoves(buffer, 0)):
+        if packedMoveID(buffer[i]) == moveID:
+            return BitboardMove(buffer[i])
+    return None
 
+
+'''
+Negamax search of validMoves, the moves of gs, at ply. A BitboardState is searched by negaMaxPacked and its
+principal variation comes back in pvLine as BitboardMoves, anything else goes to negaMaxAlphaBeta
+'''
+def searchMoves(gs, validMoves, depth, alpha, beta, ply, info, pvLine):
+    if not hasattr(gs, 'generateMoves'):
+        return negaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, ply, info, pvLine)
+    plies = info.extendedDepth + QUIESCENCE_DEPTH + 1 #no line goes deeper than this
+    if info.moveBuffer is None or len(info.moveBuffer) < plies * MAX_MOVES:
+        info.moveBuffer = newMoveBuffer(plies)
+    start = ply * MAX_MOVES
+    for i, move in enumerate(validMoves):
+        info.moveBuffer[start + i] = move
+    line = []
+    try:
+        return negaMaxPacked(gs, start, start + len(validMoves), depth, alpha, beta, ply, info, line)
+    finally: #a stopped search still hands back the best root move it finished
+        pvLine[:] = [BitboardMove(move) for move in line]
+
+
+def negaMaxAlphaBeta(gs, validMoves, depth, alpha, beta, ply, info, pvLine):
+    info.nodes += 1
+    if info.nodes >= info.nextCheck:
+        info.checkStop()
+    if len(validMoves) == 0:
+        return -CHECKMATE + ply #no moves left means the side to move lost, sooner losses score lower
+    if tablebase is not None and ply > 0 and hasattr(gs, 'kings'): #the tablebase is probed with bitboards only
+        score = tablebaseScore(gs, ply)
+        if score is not None:
+            return score
+    if depth == 0:
+        return quiescence(gs, validMoves, alpha, beta, ply, info)
+
+    tt = info.tt
+    ttMove = NO_MOVE
+    if tt is not None:
+        score, ttMove = probeTable(tt, gs, depth, alpha, beta, ply)
+        if score is not None:
+            return score
+
+    alphaStart = alpha
+    bestMove = NO_MOVE
+    orderMoves(validMoves, info.pv[ply] if ply < len(info.pv) else None, ttMove)
+    #a forced move doesn't use up depth, so a line of forced replies is seen to its end instead of cut off halfway
+    #(ply + depth grows by one for every extension so far in this line)
+    childDepth = depth if len(validMoves) == 1 and ply + depth < info.extendedDepth else depth - 1
+    childLine = []
+    for move in validMoves:
+        gs.makeMove(move)
+        score = -negaMaxAlphaBeta(gs, gs.getValidMoves(), childDepth, -beta, -alpha, ply + 1, info, childLine)
+        gs.undoMove()
+        if score > alpha:
+            alpha = score
+            bestMove = move.moveID
+            pvLine[:] = [move] + childLine
+            if ply == 0:
+                info.rootScore = alpha
+            if alpha >= beta:
+                break
+        childLine.clear()
+
+    if tt is not None:
+        storeTable(tt, gs, depth, alpha, alphaStart, beta, ply, bestMove, ttMove)
+    return alpha
+
+
+'''
+negaMaxAlphaBeta for a BitboardState. Its moves are the packed ints in info.moveBuffer[start:end], every ply generates
+its children into its own slice of the buffer, so no move objects are made. pvLine gets packed ints
+'''
+def negaMaxPacked(gs, start, end, depth, alpha, beta, ply, info, pvLine):
+    info.nodes += 1
+    if info.nodes >= info.nextCheck:
+        info.checkStop()
+    if start == end:
+        return -CHECKMATE + ply
+    if tablebase is not None and ply > 0:
+        score = tablebaseScore(gs, ply)
+        if score is not None:
+            return score
+    if depth == 0:
+        info.quiescenceStop = info.nodes + QUIESCENCE_NODES
+        return captureSearchPacked(gs, start, end, alpha, beta, ply, 0, info)
+
+    tt = info.tt
+    ttMove = NO_MOVE
+    if tt is not None:
+        score, ttMove = probeTable(tt, gs, depth, alpha, beta, ply)
+        if score is not None:
+            return score
+
+    alphaStart = alpha
+    bestMove = NO_MOVE
+    buffer = info.moveBuffer
+    orderPacked(buffer, start, end, int(info.pv[ply]) if ply < len(info.pv) else None, ttMove)
+    childDepth = depth if end - start == 1 and ply + depth < info.extendedDepth else depth - 1
+    childStart = (ply + 1) * MAX_MOVES
+    childLine = []
+    for i in range(start, end):
+        move = buffer[i]
+        gs.makeMove(move)
+        childEnd = gs.generateMoves(buffer, childStart)
+        score = -negaMaxPacked(gs, childStart, childEnd, childDepth, -beta, -alpha, ply + 1, info, childLine)
+        gs.undoMove()
+        if score > alpha:
+            alpha = score
+            bestMove = packedMoveID(move)
+            pvLine[:] = [move] + childLine
+            if ply == 0:
+                info.rootScore = alpha
+            if alpha >= beta:
+                break
+        childLine.clear()
+
+    if tt is not None:
+        storeTable(tt, gs, depth, alpha, alphaStart, beta, ply, bestMove, ttMove)
+    return alpha
+
+
+'''
+The score of a position the tablebase knows, from the side to move's point of view, None if it isn't in it
+'''
+def tablebaseScore(gs, ply):
+    result = tablebase.probe(gs)
+    if result is None:
+        return None
+    value, distance = result
+    if value == 0:
+        return STALEMATE
+    score = TABLEBASE_WIN - ply - distance
+    return score if value == 1 else -score
+
+
+'''
+Looks gs up in the transposition table. Returns (score, move): score is the stored result when it is deep enough and
+its bound settles the position for (alpha, beta), else None; move is the best move stored for it or NO_MOVE
+'''
+def probeTable(tt, gs, depth, alpha, beta, ply):
+    slot = tt.probe(gs.zobristHash)
+    if slot is None:
+        return None, NO_MOVE
+    if ply > 0 and tt.depths[slot] >= depth:
+        score = scoreFromTable(tt.scores[slot], ply)
+        bound = tt.bounds[slot]
+        if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+            return score, tt.moves[slot]
+    return None, tt.moves[slot]
+
+
+def storeTable(tt, gs, depth, alpha, alphaStart, beta, ply, bestMove, ttMove):
+    if alpha >= beta:
+        bound = LOWER
+    elif alpha > alphaStart:
+        bound = EXACT
+    else:
+        bound = UPPER
+        bestMove = ttMove #nothing beat alpha, keep whatever move the table already had
+    tt.store(gs.zobristHash, depth, bound, scoreToTable(alpha, ply), bestMove)
+
+
+'''
+Searches captures only, past the end of the main search, so positions are never scored halfway through an exchange.
+Captures are compulsory, so when the side to move has one it has to play one and the score is the best of them; when
+it has none the position is quiet and is scored as it stands. Chains of captures stop at QUIESCENCE_DEPTH plies and a
+single quiescence search at QUIESCENCE_NODES nodes, after which positions are scored as they are. Nothing goes in the
+transposition table, the main search stores the result for the position it started from
+'''
+def quiescence(gs, validMoves, alpha, beta, ply, info):
+    info.quiescenceStop = info.nodes + QUIESCENCE_NODES
+    return captureSearch(gs, validMoves, alpha, beta, ply, 0, info)
+
+
+def captureSearch(gs, validMoves, alpha, beta, ply, qPly, info):
+    if len(validMoves) == 0:
+        return -CHECKMATE + ply
+    if not validMoves[0].isCapture or qPly >= QUIESCENCE_DEPTH or info.nodes >= info.quiescenceStop:
+        return scoreRelative(gs)
+    for move in validMoves:
+        info.nodes += 1
+        if info.nodes >= info.nextCheck:
+            info.checkStop()
+        gs.makeMove(move)
+        score = -captureSearch(gs, gs.getValidMoves(), -beta, -alpha, ply + 1, qPly + 1, info)
+        gs.undoMove()
+        if score > alpha:
+            alpha = score
+            if alpha >= beta:
+                break
+    return alpha
+
+
+def captureSearchPacked(gs, start, end, alpha, beta, ply, qPly, info):
+    if start == end:
+        return -CHECKMATE + ply
+    buffer = info.moveBuffer
+    if buffer[start] >> CAPTURE_SHIFT == 0 or qPly >= QUIESCENCE_DEPTH or info.nodes >= info.quiescenceStop:
+        return scoreRelative(gs)
+    childStart = (ply + 1) * MAX_MOVES
+    for i in range(start, end):
+        info.nodes += 1
+        if info.nodes >= info.nextCheck:
+            info.checkStop()
+        gs.makeMove(buffer[i])
+        childEnd = gs.generateMoves(buffer, childStart)
+        score = -captureSearchPacked(gs, childStart, childEnd, -beta, -alpha, ply + 1, qPly + 1, info)
+        gs.undoMove()
+        if score > alpha:
+            alpha = score
+            if alpha >= beta:
+                break
+    return alpha
+
+
+'''
+Win and loss scores, checkmates and tablebase results alike, count plies from the root. The table stores them counted
+from the position itself so they stay right when the same position turns up at a different ply
+'''
+def scoreToTable(score, ply):
+    if score >= WIN_SCORE:
+        return score + ply
+    if score <= -WIN_SCORE:
+        return score - ply
+    return score
+
+
+def scoreFromTable(score, ply):
+    if score >= WIN_SCORE:
+        return score - ply
+    if score <= -WIN_SCORE:
+        return score + ply
     return score
 
+
+'''
+Tries the move from the previous iteration's principal variation first, it is usually still the best one. Otherwise
+the best move the transposition table remembers for this position goes first
+'''
+def orderMoves(validMoves, pvMove, ttMove=NO_MOVE):
+    first = pvMove.moveID if pvMove is not None else ttMove
+    if first == NO_MOVE:
+        return
+    for i in range(len(validMoves)):
+        if validMoves[i].moveID == first:
+            validMoves[0], validMoves[i] = validMoves[i], validMoves[0]
+            return
+
+
+'''
+orderMoves for the packed moves in buffer[start:end]. pvMove is a packed move, ttMove a moveID
+'''
+def orderPacked(buffer, start, end, pvMove, ttMove=NO_MOVE):
+    for i in range(start, end):
+        move = buffer[i]
+        if move == pvMove if pvMove is not None else packedMoveID(move) == ttMove:
+            buffer[start], buffer[i] = move, buffer[start]
+            return
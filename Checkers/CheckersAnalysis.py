@@ -0,0 +1,173 @@
+"""
+Bulk position analysis. Positions (FEN strings) are searched with CheckersAI across a process pool and the best move,
+score and principal variation of each one are streamed back as they finish. Every result goes into an sqlite cache
+keyed by position hash and depth, so running over the same positions again only searches the ones that are new or
+that now need a deeper search. Run it as python -m Checkers.CheckersAnalysis from the folder above Checkers, see --help
+for the options.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from Checkers import CheckersAI
+from Checkers.CheckersBitboard import BitboardState
+
+CACHE_VERSION = 3 #bump when the search or evaluation changes enough that cached results should be thrown away
+COMMIT_EVERY = 100 #results written to the cache between commits
+
+
+'''
+Runs in a worker process. Searches one position and returns its result as a dict
+'''
+def analysePosition(fen, depth, timeLimit):
+    gs = BitboardState.fromFen(fen)
+    validMoves = gs.getValidMoves()
+    if len(validMoves) == 0:
+        return {"fen": fen, "depth": depth, "move": None, "score": -CheckersAI.CHECKMATE, "pv": [], "nodes": 0}
+    info = CheckersAI.searchPosition(gs, validMoves, depth, timeLimit)
+    pv = info.pv if len(info.pv) != 0 else [validMoves[0]]
+    if timeLimit is None or abs(info.score) >= CheckersAI.CHECKMATE - CheckersAI.MAX_PLY:
+        reached = depth #finished, or stopped early on a forced win or loss that deeper searches won't change
+    else:
+        reached = info.depth
+    return {"fen": fen, "depth": reached, "move": pv[0].getPdnNotation(), "score": info.score,
+            "pv": [move.getPdnNotation() for move in pv], "nodes": info.nodes}
+
+
+'''
+Results on disk. Hashes are stored as signed 64 bit numbers because that is what sqlite's integers are
+'''
+class AnalysisCache():
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results (hash INTEGER, depth INTEGER, move TEXT, score INTEGER, "
+                        "pv TEXT, nodes INTEGER, PRIMARY KEY (hash, depth))")
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if row is None or row[0] != CACHE_VERSION:
+            self.db.execute("DELETE FROM results")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (CACHE_VERSION,))
+        self.db.commit()
+        self.uncommitted = 0
+
+    '''
+    The deepest cached result for the position searched to at least depth, or None
+    '''
+    def get(self, key, depth):
+        row = self.db.execute("SELECT depth, move, score, pv, nodes FROM results WHERE hash = ? AND depth >= ? "
+                              "ORDER BY depth DESC LIMIT 1", (signed(key), depth)).fetchone()
+        if row is None:
+            return None
+        return {"depth": row[0], "move": row[1], "score": row[2], "pv": json.loads(row[3]), "nodes": row[4]}
+
+    def put(self, key, result):
+        self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                        (signed(key), result["depth"], result["move"], result["score"], json.dumps(result["pv"]),
+                         result["nodes"]))
+        self.uncommitted += 1
+        if self.uncommitted >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.uncommitted = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+def signed(key):
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+'''
+Analyses every FEN in fens (any iterable, read as it goes) and yields one result dict per position as soon as it is
+known, cached ones first, the rest in the order they finish. Each result has the input's index, the position's fen,
+hash, depth, move, score (for the side to move), pv (PDN moves), nodes and whether it came from the cache. A position
+that appears more than once is only searched once. At most a few positions per worker are in flight, so fens can be
+as long as a file of millions of lines
+'''
+def analyse(fens, depth=CheckersAI.DEPTH, timeLimit=None, workers=None, cachePath=None):
+    workers = workers or os.cpu_count() or 1
+    cache = AnalysisCache(cachePath) if cachePath is not None else None
+    executor = ProcessPoolExecutor(max_workers=workers)
+    running = {} #future -> hash
+    waiting = {} #hash -> [(index, fen)] for every input that asked for the position
+    try:
+        def finished(futures):
+            for future in futures:
+                key = running.pop(future)
+                result = future.result()
+                if cache is not None:
+                    cache.put(key, result)
+                for index, fen in waiting.pop(key):
+                    yield dict(result, index=index, fen=fen, hash=key, cached=False)
+
+        for index, fen in enumerate(fens):
+            key = BitboardState.fromFen(fen).zobristHash
+            if key in waiting:
+                waiting[key].append((index, fen))
+                continue
+            cached = cache.get(key, depth) if cache is not None else None
+            if cached is not None:
+                yield dict(cached, index=index, fen=fen, hash=key, cached=True)
+                continue
+            waiting[key] = [(index, fen)]
+            running[executor.submit(analysePosition, fen, depth, timeLimit)] = key
+            if len(running) >= 4 * workers:
+                done, pending = wait(running, return_when=FIRST_COMPLETED)
+                yield from finished(done)
+        while len(running) != 0:
+            done, pending = wait(running, return_when=FIRST_COMPLETED)
+            yield from finished(done)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        if cache is not None:
+            cache.close()
+
+
+'''
+The FENs in a text file, one per line. Blank lines and lines starting with # are skipped, anything after the FEN on a
+line (separated by whitespace) is ignored
+'''
+def readFens(f):
+    for line in f:
+        line = line.strip()
+        if len(line) != 0 and not line.startswith('#'):
+            yield line.split()[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search many positions and cache the results")
+    parser.add_argument('positions', help="file with one FEN per line, - for stdin")
+    parser.add_argument('--depth', type=int, default=CheckersAI.DEPTH)
+    parser.add_argument('--time', type=float, default=None, help="seconds per position")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', default=None, help="sqlite file results are kept in between runs")
+    parser.add_argument('--out', default=None, help="JSONL file for the results, stdout if not given")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.positions == '-' else open(args.positions)
+    out = open(args.out, 'w') if args.out else sys.stdout
+    searched = cached = 0
+    try:
+        for result in analyse(readFens(source), args.depth, args.time, args.workers, args.cache):
+            out.write(json.dumps(result) + '\n')
+            if result["cached"]:
+                cached += 1
+            else:
+                searched += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print("%d positions, %d searched, %d from the cache" % (searched + cached, searched, cached), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Batched positions for generating training data and bulk analysis. A BoardBatch keeps N positions as NumPy arrays of
+the same three bitboards BitboardState uses (red, black, kings as uint32) plus the side to move, and works out
+material, the evaluation CheckersAI uses, legal move masks and feature vectors for every position at once with array
+operations instead of one Python object at a time. Needs NumPy, the rest of the game does not.
+"""
+import numpy as np
+from Checkers.CheckersBitboard import BitboardState, UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT, RED_KING_ROW, \
+    BLACK_KING_ROW, FULL, squareToRowCol
+from Checkers.CheckersEngine import GameState, PIECE_SQUARE_SCORES, MAN_VALUE, KING_VALUE
+
+# directions in the order moveTargets returns them, and the direction that undoes each one
+DIRECTIONS = (UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+IS_UP = (True, True, False, False)
+OPPOSITE = (3, 2, 1, 0)
+SQUARES = np.arange(32, dtype=np.uint32)
+PIECE_SQUARES = np.array(PIECE_SQUARE_SCORES, dtype=np.int32) #[square][kind], kinds red man, black man, red king, black king
+CENTRE = sum(1 << sq for sq in range(32) if 3 <= squareToRowCol(sq)[0] <= 4 and 2 <= squareToRowCol(sq)[1] <= 5)
+FEATURE_NAMES = ("red men", "red kings", "black men", "black kings", "red mobility", "black mobility", "red back row",
+                 "black back row", "red centre", "black centre", "red to move", "jump available")
+
+
+'''
+Number of set bits in every element of a uint32 array
+'''
+def popcount(bb):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bb).astype(np.int32)
+    bb = bb - ((bb >> 1) & np.uint32(0x55555555))
+    bb = (bb & np.uint32(0x33333333)) + ((bb >> 2) & np.uint32(0x33333333))
+    bb = (bb + (bb >> 4)) & np.uint32(0x0F0F0F0F)
+    return ((bb * np.uint32(0x01010101)) >> 24).astype(np.int32)
+
+
+'''
+stepUp/stepDown from CheckersBitboard for a whole array of bitboards. Direction i is DIRECTIONS[i]
+'''
+def step(bb, i):
+    (maskA, shiftA), (maskB, shiftB) = DIRECTIONS[i]
+    if IS_UP[i]:
+        return ((bb & np.uint32(maskA)) >> shiftA) | ((bb & np.uint32(maskB)) >> shiftB)
+    return (((bb & np.uint32(maskA)) << shiftA) | ((bb & np.uint32(maskB)) << shiftB)) & np.uint32(FULL)
+
+
+'''
+(N, 32) array of 0/1, one column per square
+'''
+def squareBits(bb):
+    return ((bb[:, None] >> SQUARES) & np.uint32(1)).astype(np.int32)
+
+
+class BoardBatch():
+    def __init__(self, red, black, kings, redToMove):
+        self.red = np.asarray(red, dtype=np.uint32)
+        self.black = np.asarray(black, dtype=np.uint32)
+        self.kings = np.asarray(kings, dtype=np.uint32)
+        self.redToMove = np.asarray(redToMove, dtype=bool)
+
+    def __len__(self):
+        return len(self.red)
+
+    '''
+    Packs GameState and BitboardState objects (they can be mixed) into a batch
+    '''
+    @classmethod
+    def fromStates(cls, states):
+        boards = [gs if hasattr(gs, 'kings') else BitboardState.fromGameState(gs) for gs in states]
+        return cls([gs.red for gs in boards], [gs.black for gs in boards], [gs.kings for gs in boards],
+                   [gs.redToMove for gs in boards])
+
+    @classmethod
+    def fromFens(cls, fens):
+        return cls.fromStates([BitboardState.fromFen(fen) for fen in fens])
+
+    '''
+    The inverse of tensor: an (N, 32) int8 array with 1 for a red man, 2 a red king, -1 a black man and -2 a black king
+    '''
+    @classmethod
+    def fromTensor(cls, tensor, redToMove):
+        tensor = np.asarray(tensor)
+        def pack(squares):
+            return (squares.astype(np.uint32) << SQUARES).sum(axis=1, dtype=np.uint32)
+        return cls(pack(tensor > 0), pack(tensor < 0), pack(abs(tensor) == 2), redToMove)
+
+    def tensor(self):
+        redBits, blackBits, kingBits = squareBits(self.red), squareBits(self.black), squareBits(self.kings)
+        return ((redBits - blackBits) * (1 + kingBits)).astype(np.int8)
+
+    def bitboardStates(self):
+        return [BitboardState(int(red), int(black), int(kings), bool(redToMove))
+                for red, black, kings, redToMove in zip(self.red, self.black, self.kings, self.redToMove)]
+
+    def gameStates(self):
+        return [GameState.fromFen(gs.getFen()) for gs in self.bitboardStates()]
+
+    '''
+    Men and kings of each side, each an (N,) int32 array
+    '''
+    def pieceCounts(self):
+        return (popcount(self.red & ~self.kings), popcount(self.red & self.kings), popcount(self.black & ~self.kings),
+                popcount(self.black & self.kings))
+
+    '''
+    Material alone from red's point of view
+    '''
+    def material(self):
+        redMen, redKings, blackMen, blackKings = self.pieceCounts()
+        return MAN_VALUE * (redMen - blackMen) + KING_VALUE * (redKings - blackKings)
+
+    '''
+    Quiet steps each side has, the same count as BitboardState.mobility but kept apart
+    '''
+    def stepCounts(self):
+        empty = ~(self.red | self.black) & np.uint32(FULL)
+        redKings, blackKings = self.red & self.kings, self.black & self.kings
+        redSteps = np.zeros(len(self), dtype=np.int32)
+        blackSteps = np.zeros(len(self), dtype=np.int32)
+        for i in range(4):
+            redSteps += popcount(step(self.red if IS_UP[i] else redKings, i) & empty)
+            blackSteps += popcount(step(blackKings if IS_UP[i] else self.black, i) & empty)
+        return redSteps, blackSteps
+
+    '''
+    The same score CheckersAI.scoreBoard gives a BitboardState, from red's point of view: piece-square values plus
+    mobility
+    '''
+    def evaluate(self, mobilityWeight=None):
+        if mobilityWeight is None:
+            from Checkers.CheckersAI import MOBILITY_WEIGHT
+            mobilityWeight = MOBILITY_WEIGHT
+        redMen, blackMen = self.red & ~self.kings, self.black & ~self.kings
+        score = np.zeros(len(self), dtype=np.int32)
+        for kind, bb in enumerate((redMen, blackMen, self.red & self.kings, self.black & self.kings)):
+            score += squareBits(bb) @ PIECE_SQUARES[:, kind]
+        redSteps, blackSteps = self.stepCounts()
+        return score + mobilityWeight * (redSteps - blackSteps)
+
+    '''
+    Squares the side to move can reach in each of DIRECTIONS, as a (4, N) uint32 array: the landing square of a jump
+    when the position has one (captures are forced), the square stepped to otherwise. Multi-jumps only show their first
+    jump
+    '''
+    def moveTargets(self):
+        own = np.where(self.redToMove, self.red, self.black)
+        opponent = np.where(self.redToMove, self.black, self.red)
+        empty = ~(self.red | self.black) & np.uint32(FULL)
+        kings = own & self.kings
+        steps = np.zeros((4, len(self)), dtype=np.uint32)
+        jumps = np.zeros((4, len(self)), dtype=np.uint32)
+        for i in range(4):
+            # men only go forward, up the board for red and down for black
+            movers = np.where(self.redToMove == IS_UP[i], own, kings)
+            steps[i] = step(movers, i) & empty
+            jumps[i] = step(step(movers, i) & opponent, i) & empty
+        hasJump = (jumps != 0).any(axis=0)
+        return np.where(hasJump, jumps, steps), hasJump
+
+    '''
+    Pieces of the side to move that have a legal first step or jump, and whether that is a jump
+    '''
+    def movablePieces(self):
+        targets, hasJump = self.moveTargets()
+        movable = np.zeros(len(self), dtype=np.uint32)
+        for i in range(4):
+            back = step(targets[i], OPPOSITE[i])
+            movable |= np.where(hasJump, step(back, OPPOSITE[i]), back)
+        return movable, hasJump
+
+    '''
+    Number of legal moves, exact for positions without jumps. With jumps every first jump counts once, so a piece
+    that can go on jumping different ways is counted less than getValidMoves would. 0 means the side to move has lost
+    '''
+    def moveCounts(self):
+        targets, hasJump = self.moveTargets()
+        return popcount(targets).sum(axis=0)
+
+    '''
+    (N, len(FEATURE_NAMES)) int16 array of simple features for training an evaluation
+    '''
+    def features(self):
+        redMen, redKings, blackMen, blackKings = self.pieceCounts()
+        redSteps, blackSteps = self.stepCounts()
+        targets, hasJump = self.moveTargets()
+        columns = [redMen, redKings, blackMen, blackKings, redSteps, blackSteps,
+                   popcount(self.red & np.uint32(BLACK_KING_ROW)), popcount(self.black & np.uint32(RED_KING_ROW)),
+                   popcount(self.red & np.uint32(CENTRE)), popcount(self.black & np.uint32(CENTRE)),
+                   self.redToMove, hasJump]
+        return np.stack(columns, axis=1).astype(np.int16)
@@ -0,0 +1,538 @@
+"""
+This class is a bitboard version of the GameState in CheckersEngine. Instead of an 8x8 list of strings it keeps three
+32 bit integers (red pieces, black pieces and kings), one bit for every dark square. Moves and jumps are generated for
+all the pieces of a side at once by shifting and masking those integers. It has the same makeMove/undoMove/getValidMoves
+surface as CheckersEngine.GameState so CheckersAI and CheckersMain can use either one.
+"""
+from array import array
+from Checkers.CheckersEngine import ZOBRIST_PIECES, ZOBRIST_BLACK_TO_MOVE, PIECE_SQUARE_SCORES, AMERICAN, \
+    boardFromFen, fenFromBoard
+
+'''
+Square numbering: only the 32 dark squares are stored. Square 0 is the dark square on row 0 (col 1), squares are
+numbered left to right and top to bottom, so square 31 is row 7 col 6. Black starts on squares 0-11 and red on 20-31.
+
+    row 0:   .  0  .  1  .  2  .  3        even rows use cols 1, 3, 5, 7
+    row 1:   4  .  5  .  6  .  7  .        odd rows use cols 0, 2, 4, 6
+    ...
+    row 7:  28  . 29  . 30  . 31  .
+
+Going up the board (red's direction) a square moves 4 or 3 bits down on even rows and 5 or 4 bits down on odd rows.
+Going down (black's direction) it is 4 or 5 bits up on even rows and 3 or 4 bits up on odd rows.
+'''
+FULL = 0xFFFFFFFF
+EVEN_ROWS = 0x0F0F0F0F
+ODD_ROWS = 0xF0F0F0F0
+LEFT_EDGE = 0x11111111  # squares on col 0
+RIGHT_EDGE = 0x88888888  # squares on col 7
+RED_KING_ROW = 0x0000000F  # row 0, red men that get here are crowned
+BLACK_KING_ROW = 0xF0000000  # row 7, black men that get here are crowned
+RED_START = 0xFFF00000
+BLACK_START = 0x00000FFF
+
+# (mask of squares that can step this way, shift) for each half of a direction. The mask keeps pieces from wrapping
+# around an edge of the board.
+UP_LEFT = ((EVEN_ROWS & ~RED_KING_ROW, 4), (ODD_ROWS & ~LEFT_EDGE, 5))
+UP_RIGHT = ((EVEN_ROWS & ~RED_KING_ROW & ~RIGHT_EDGE & FULL, 3), (ODD_ROWS, 4))
+DOWN_LEFT = ((EVEN_ROWS, 4), (ODD_ROWS & ~LEFT_EDGE & ~BLACK_KING_ROW & FULL, 3))
+DOWN_RIGHT = ((EVEN_ROWS & ~RIGHT_EDGE & FULL, 5), (ODD_ROWS & ~BLACK_KING_ROW & FULL, 4))
+UP = (UP_LEFT, UP_RIGHT)
+DOWN = (DOWN_LEFT, DOWN_RIGHT)
+
+'''
+A move is packed into one integer: bits 0-4 from square, bits 5-9 to square, bit 10 promotion and bits 11-42 the
+bitboard of every piece it jumps. Move lists are written into preallocated array('Q') buffers, so generating moves
+doesn't create any objects.
+'''
+TO_SHIFT = 5
+PROMOTION = 1 << 10
+CAPTURE_SHIFT = 11
+MAX_MOVES = 128  # more than the legal moves of any position, the size of one ply of a move buffer
+
+
+def newMoveBuffer(plies=1):
+    return array('Q', [0]) * (plies * MAX_MOVES)
+
+
+'''
+Moves every bit of bb one square in the given direction, bits that would fall off the board are dropped
+'''
+def stepUp(bb, direction):
+    (maskA, shiftA), (maskB, shiftB) = direction
+    return ((bb & maskA) >> shiftA) | ((bb & maskB) >> shiftB)
+
+
+def stepDown(bb, direction):
+    (maskA, shiftA), (maskB, shiftB) = direction
+    return ((bb & maskA) << shiftA) | ((bb & maskB) << shiftB)
+
+
+def squareToRowCol(sq):
+    r = sq >> 2
+    return r, ((sq & 3) << 1) + (1 if r % 2 == 0 else 0)
+
+
+def rowColToSquare(r, c):
+    return (r << 2) + (c >> 1)
+
+
+SQUARE_IDS = [r * 10 + c for r, c in map(squareToRowCol, range(32))]  # row * 10 + col of every square
+
+
+'''
+The moveID (see CheckersEngine.Move) of a packed move, without making a BitboardMove
+'''
+def packedMoveID(move):
+    return SQUARE_IDS[move & 31] * 100 + SQUARE_IDS[(move >> TO_SHIFT) & 31]
+
+
+'''
+The squares a jump from fromSq lands on in order, rebuilt from the bitboard of the pieces it captured since a packed move
+doesn't keep the order. A path that keeps going the same way up or down the board is tried first, so a man's jump comes
+back the way the man could play it. None if no path jumps exactly those pieces and ends on toSq
+'''
+def jumpLandings(fromSq, toSq, captured):
+    for rowSteps in ((-1,), (1,), (-1, 1)):
+        landings = findLandings(squareToRowCol(fromSq), toSq, captured, rowSteps)
+        if landings is not None:
+            return landings
+    return None
+
+
+def findLandings(square, toSq, captured, rowSteps):
+    if captured == 0:
+        return [] if rowColToSquare(*square) == toSq else None
+    r, c = square
+    for dr in rowSteps:
+        for dc in (-1, 1):
+            landRow, landCol = r + 2 * dr, c + 2 * dc
+            if not (0 <= landRow < 8 and 0 <= landCol < 8):
+                continue
+            jumped = 1 << rowColToSquare(r + dr, c + dc)
+            if captured & jumped:
+                landings = findLandings((landRow, landCol), toSq, captured & ~jumped, rowSteps)
+                if landings is not None:
+                    return [rowColToSquare(landRow, landCol)] + landings
+    return None
+
+
+class BitboardMove(int):
+    '''
+    A packed move with the attributes CheckersMain and CheckersAI use. It is still the packed int, so makeMove treats
+    it the same as one read out of a move buffer
+    '''
+    __slots__ = ()
+
+    @property
+    def fromSq(self):
+        return self & 31
+
+    @property
+    def toSq(self):
+        return (self >> TO_SHIFT) & 31
+
+    @property
+    def captured(self):
+        return self >> CAPTURE_SHIFT  # bitboard of every piece jumped
+
+    @property
+    def promotion(self):
+        return bool(self & PROMOTION)
+
+    @property
+    def isCapture(self):
+        return self >> CAPTURE_SHIFT != 0
+
+    @property
+    def startRow(self):
+        return (self & 31) >> 2
+
+    @property
+    def startCol(self):
+        return squareToRowCol(self & 31)[1]
+
+    @property
+    def endRow(self):
+        return ((self >> TO_SHIFT) & 31) >> 2
+
+    @property
+    def endCol(self):
+        return squareToRowCol((self >> TO_SHIFT) & 31)[1]
+
+    @property
+    def moveID(self):
+        return packedMoveID(self)
+
+    '''
+    Overriding the equals method, moves with the same start and end are equal just like CheckersEngine.Move. The hash
+    goes by moveID too, so equal moves hash the same; use int(move) to key on the whole packed move
+    '''
+    def __eq__(self, other):
+        if hasattr(other, 'moveID'):
+            return self.moveID == other.moveID
+        return int.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.moveID)
+
+    def getChessNotation(self):
+        return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
+
+    def getRankFile(self, r, c):
+        return "abcdefgh"[c] + str(8 - r)
+
+    '''
+    PDN notation like CheckersEngine.Move.getPdnNotation. A multi-jump is written with every square it lands on, two
+    ways of jumping from the same start to the same end square take different pieces and have to read differently
+    '''
+    def getPdnNotation(self):
+        if self >> CAPTURE_SHIFT == 0:
+            return "%d-%d" % ((self & 31) + 1, ((self >> TO_SHIFT) & 31) + 1)
+        landings = jumpLandings(self & 31, (self >> TO_SHIFT) & 31, self >> CAPTURE_SHIFT)
+        if landings is None: #not a move of any position, fall back to the short form
+            landings = [(self >> TO_SHIFT) & 31]
+        return 'x'.join(str(sq + 1) for sq in [self & 31] + landings)
+
+
+'''
+The entry of validMoves that is the same move as move, None if there isn't one. Either can hold CheckersEngine.Move
+objects or BitboardMoves. Jumps between the same two squares are told apart by the pieces they take
+'''
+def matchMove(move, validMoves):
+    jumped = jumpedSquares(move)
+    for validMove in validMoves:
+        if validMove.moveID == move.moveID and jumpedSquares(validMove) == jumped:
+            return validMove
+    return None
+
+
+def jumpedSquares(move):
+    if hasattr(move, 'captures'):
+        return frozenset(move.captures)
+    return frozenset(squareToRowCol(sq) for sq in range(32) if move.captured >> sq & 1)
+
+
+class BitboardState():
+    def __init__(self, red=RED_START, black=BLACK_START, kings=0, redToMove=True):
+        self.red = red
+        self.black = black
+        self.kings = kings
+        self.redToMove = redToMove
+        self.moveLog = []
+        self.capturedKingsLog = [] #which of the pieces each move in moveLog jumped were kings, so undoMove can restore them
+        self.zobristHash = self.computeHash()
+        self.hashLog = [] #hash before each move in moveLog, so undoMove can restore it
+        self.evalScore = self.computeScore() #material and piece-square score for red, CheckersAI reads it at the leaves
+        self.scoreLog = []
+        self.moveBuffer = newMoveBuffer()
+
+    '''
+    Builds a bitboard state from the 8x8 board of a CheckersEngine.GameState. Raises ValueError for the other variants,
+    the bitboards only know the American rules
+    '''
+    @classmethod
+    def fromGameState(cls, gs):
+        variant = getattr(gs, 'variant', AMERICAN)
+        if variant is not AMERICAN:
+            raise ValueError("BitboardState only plays American checkers, not %s" % variant.name)
+        return cls.fromBoard(gs.board, gs.redToMove)
+
+    '''
+    Builds a bitboard state from a FEN string, see CheckersEngine.boardFromFen for the format
+    '''
+    @classmethod
+    def fromFen(cls, fen):
+        return cls.fromBoard(*boardFromFen(fen))
+
+    def getFen(self):
+        return fenFromBoard(self.board, self.redToMove)
+
+    @classmethod
+    def fromBoard(cls, board, redToMove):
+        red = black = kings = 0
+        for r in range(8):
+            for c in range(8):
+                square = board[r][c]
+                if square == "--":
+                    continue
+                bit = 1 << rowColToSquare(r, c)
+                if square[0] == 'r':
+                    red |= bit
+                else:
+                    black |= bit
+                if square[1] == 'k':
+                    kings |= bit
+        return cls(red, black, kings, redToMove)
+
+    '''
+    The position as a tuple of three ints and a bool, cheap to pickle and send to another process. The move log is not
+    included, the copy starts a fresh game from this position
+    '''
+    def pack(self):
+        return self.red, self.black, self.kings, self.redToMove
+
+    @classmethod
+    def unpack(cls, packed):
+        return cls(*packed)
+
+    '''
+    The position and its history as one tuple, for restore. Unlike pack it keeps the move history, so undoMove still
+    works after restoring
+    '''
+    def snapshot(self):
+        return (self.red, self.black, self.kings, self.redToMove, self.zobristHash, self.evalScore,
+                tuple(self.moveLog), tuple(self.capturedKingsLog), tuple(self.hashLog), tuple(self.scoreLog))
+
+    def restore(self, snapshot):
+        self.red, self.black, self.kings, self.redToMove, self.zobristHash, self.evalScore = snapshot[:6]
+        self.moveLog, self.capturedKingsLog, self.hashLog, self.scoreLog = [list(log) for log in snapshot[6:]]
+
+    '''
+    An independent copy with the same history. It gets its own move buffer, so the two can be searched on different
+    threads
+    '''
+    def clone(self):
+        gs = BitboardState.__new__(BitboardState)
+        gs.restore(self.snapshot())
+        gs.moveBuffer = newMoveBuffer()
+        return gs
+
+    '''
+    The 8x8 list of strings view of the position, the same format as CheckersEngine.GameState.board
+    '''
+    @property
+    def board(self):
+        board = [["--"] * 8 for _ in range(8)]
+        for sq in range(32):
+            bit = 1 << sq
+            if (self.red | self.black) & bit:
+                r, c = squareToRowCol(sq)
+                board[r][c] = ('r' if self.red & bit else 'b') + ('k' if self.kings & bit else 'c')
+        return board
+
+    '''
+    Zobrist hash of the whole position, the same number CheckersEngine.computeHash gives for the same board
+    '''
+    def computeHash(self):
+        h = 0 if self.redToMove else ZOBRIST_BLACK_TO_MOVE
+        for sq in range(32):
+            bit = 1 << sq
+            if (self.red | self.black) & bit:
+                h ^= ZOBRIST_PIECES[sq][(0 if self.red & bit else 1) + (2 if self.kings & bit else 0)]
+        return h
+
+    '''
+    Material and piece-square score of the whole position, the same number CheckersEngine.computeScore gives
+    '''
+    def computeScore(self):
+        score = 0
+        for sq in range(32):
+            bit = 1 << sq
+            if (self.red | self.black) & bit:
+                score += PIECE_SQUARE_SCORES[sq][(0 if self.red & bit else 1) + (2 if self.kings & bit else 0)]
+        return score
+
+    '''
+    How many more quiet steps red's pieces have than black's, counted with a few shifts and no move generation
+    '''
+    def mobility(self):
+        empty = ~(self.red | self.black) & FULL
+        redKings = self.red & self.kings
+        blackKings = self.black & self.kings
+        redSteps = blackSteps = 0
+        for direction in UP:
+            redSteps += bin(stepUp(self.red, direction) & empty).count('1')
+            blackSteps += bin(stepUp(blackKings, direction) & empty).count('1')
+        for direction in DOWN:
+            blackSteps += bin(stepDown(self.black, direction) & empty).count('1')
+            redSteps += bin(stepDown(redKings, direction) & empty).count('1')
+        return redSteps - blackSteps
+
+    '''
+    Takes a packed move (a BitboardMove or an int from a move buffer) and executes it
+    '''
+    def makeMove(self, move):
+        fromSq = move & 31
+        toSq = (move >> TO_SHIFT) & 31
+        captured = move >> CAPTURE_SHIFT
+        moved = (1 << fromSq) ^ (1 << toSq)  # xor so a king that loops back to its square stays put
+        kind = (0 if self.redToMove else 1) + (2 if self.kings & (1 << fromSq) else 0)
+        self.hashLog.append(self.zobristHash)
+        h = self.zobristHash ^ ZOBRIST_PIECES[fromSq][kind] ^ ZOBRIST_BLACK_TO_MOVE
+        h ^= ZOBRIST_PIECES[toSq][kind + 2 if move & PROMOTION else kind]
+        self.scoreLog.append(self.evalScore)
+        score = self.evalScore - PIECE_SQUARE_SCORES[fromSq][kind] + \
+            PIECE_SQUARE_SCORES[toSq][kind + 2 if move & PROMOTION else kind]
+        capturedKings = captured & self.kings
+        while captured:
+            low = captured & -captured
+            captured ^= low
+            sq = low.bit_length() - 1
+            capturedKind = (1 if self.redToMove else 0) + (2 if low & capturedKings else 0)
+            h ^= ZOBRIST_PIECES[sq][capturedKind]
+            score -= PIECE_SQUARE_SCORES[sq][capturedKind]
+        self.zobristHash = h
+        self.evalScore = score
+        captured = move >> CAPTURE_SHIFT
+        if self.redToMove:
+            self.red ^= moved
+            self.black &= ~captured
+        else:
+            self.black ^= moved
+            self.red &= ~captured
+        if self.kings & (1 << fromSq):
+            self.kings ^= moved
+        self.kings &= ~captured
+        if move & PROMOTION:
+            self.kings |= 1 << toSq
+        self.moveLog.append(move)
+        self.capturedKingsLog.append(capturedKings)
+        self.redToMove = not self.redToMove
+
+    def undoMove(self):
+        if len(self.moveLog) != 0:
+            move = self.moveLog.pop()
+            self.redToMove = not self.redToMove
+            self.zobristHash = self.hashLog.pop()
+            self.evalScore = self.scoreLog.pop()
+            fromSq = move & 31
+            toSq = (move >> TO_SHIFT) & 31
+            captured = move >> CAPTURE_SHIFT
+            moved = (1 << fromSq) ^ (1 << toSq)
+            if move & PROMOTION:
+                self.kings &= ~(1 << toSq)
+            if self.kings & (1 << toSq):
+                self.kings ^= moved
+            self.kings |= self.capturedKingsLog.pop()
+            if self.redToMove:
+                self.red ^= moved
+                self.black |= captured
+            else:
+                self.black ^= moved
+                self.red |= captured
+
+    '''
+    All legal moves as BitboardMove objects, for the UI and anything else that wants move objects. Jumps are
+    mandatory, so quiet moves are only returned when the side to move has no jump
+    '''
+    def getValidMoves(self):
+        end = self.generateMoves(self.moveBuffer, 0)
+        return [BitboardMove(self.moveBuffer[i]) for i in range(end)]
+
+    '''
+    Writes the packed legal moves into buffer starting at start and returns the index after the last one. This is
+    the allocation free generator searches should call, giving each ply its own MAX_MOVES slice of one buffer
+    '''
+    def generateMoves(self, buffer, start):
+        end = self.generateJumps(buffer, start)
+        if end == start:
+            end = self.generateQuietMoves(buffer, start)
+        return end
+
+    def generateQuietMoves(self, buffer, n):
+        empty = ~(self.red | self.black) & FULL
+        if self.redToMove:
+            men, kings, kingRow = self.red & ~self.kings, self.red & self.kings, RED_KING_ROW
+            forward, backward = UP, DOWN
+        else:
+            men, kings, kingRow = self.black & ~self.kings, self.black & self.kings, BLACK_KING_ROW
+            forward, backward = DOWN, UP
+        up = forward is UP
+        for direction in forward:
+            for mask, shift in direction:
+                for pieces, canPromote in ((men, True), (kings, False)):
+                    if up:
+                        dests = ((pieces & mask) >> shift) & empty
+                    else:
+                        dests = ((pieces & mask) << shift) & empty
+                    while dests:
+                        low = dests & -dests
+                        dests ^= low
+                        to = low.bit_length() - 1
+                        frm = to + shift if up else to - shift
+                        buffer[n] = frm | (to << TO_SHIFT) | (PROMOTION if canPromote and low & kingRow else 0)
+                        n += 1
+        if kings:
+            for direction in backward:
+                for mask, shift in direction:
+                    if up:
+                        dests = ((kings & mask) << shift) & empty
+                    else:
+                        dests = ((kings & mask) >> shift) & empty
+                    while dests:
+                        low = dests & -dests
+                        dests ^= low
+                        to = low.bit_length() - 1
+                        buffer[n] = (to - shift if up else to + shift) | (to << TO_SHIFT)
+                        n += 1
+        return n
+
+    '''
+    All jumps for the side to move, each one followed to the end of its multi-jump chain
+    '''
+    def generateJumps(self, buffer, start):
+        if self.redToMove:
+            own, opp, kingRow, forward = self.red, self.black, RED_KING_ROW, UP
+        else:
+            own, opp, kingRow, forward = self.black, self.red, BLACK_KING_ROW, DOWN
+        empty = ~(self.red | self.black) & FULL
+        kings = own & self.kings
+        # quick test for the whole side at once before following any chains
+        jumpers = 0
+        for direction in UP:
+            if stepUp(stepUp(own if forward is UP else kings, direction) & opp, direction) & empty:
+                jumpers = 1
+                break
+        if not jumpers:
+            for direction in DOWN:
+                if stepDown(stepDown(own if forward is DOWN else kings, direction) & opp, direction) & empty:
+                    jumpers = 1
+                    break
+        if not jumpers:
+            return start
+
+        n = start
+        pieces = own
+        while pieces:
+            piece = pieces & -pieces
+            pieces ^= piece
+            # the moving piece leaves its square, so a king may land back on it
+            n = self.followJumps(piece, bool(piece & kings), forward, opp, empty | piece, kingRow, buffer, start, n)
+        return n
+
+    def followJumps(self, piece, isKing, forward, opp, empty, kingRow, buffer, start, n):
+        fromSq = piece.bit_length() - 1
+        stack = [(piece, 0)]
+        while stack:
+            at, captured = stack.pop()
+            extended = False
+            for steps in ((UP, DOWN) if isKing else (forward,)):
+                step = stepUp if steps is UP else stepDown
+                for direction in steps:
+                    mid = step(at, direction) & opp & ~captured
+                    if not mid:
+                        continue
+                    land = step(mid, direction) & empty
+                    if not land:
+                        continue
+                    extended = True
+                    if not isKing and land & kingRow:  # a man that is crowned ends its move
+                        n = addJump(fromSq, land, captured | mid, PROMOTION, buffer, start, n)
+                    else:
+                        stack.append((land, captured | mid))
+            if not extended and captured:
+                n = addJump(fromSq, at, captured, 0, buffer, start, n)
+        return n
+
+
+def addJump(fromSq, land, captured, promotion, buffer, start, n):
+    move = fromSq | ((land.bit_length() - 1) << TO_SHIFT) | promotion | (captured << CAPTURE_SHIFT)
+    if bin(captured).count('1') >= 4:  # kings can go round a loop either way and capture the same pieces
+        for i in range(start, n):
+            if buffer[i] == move:
+                return n
+    buffer[n] = move
+    return n + 1
@@ -0,0 +1,160 @@
+"""
+Opening book. The builder replays finished games (the JSONL records CheckersSelfPlay writes, or any list of packed
+moves with a result) and counts, for every position in the first few plies, how often each move was played and how it
+scored. The book file is those counts as fixed size records sorted by position hash, so a lookup is a binary search
+over a memory-mapped file: a few page reads, and the file is never loaded into memory. Run it as
+python -m Checkers.CheckersBook from the folder above Checkers, see --help for the options.
+"""
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+from Checkers.CheckersBitboard import BitboardState, BitboardMove, matchMove
+
+MAGIC = b'CKOB'
+VERSION = 1
+HEADER = struct.Struct('<4sB3xQ') #magic, version, entries
+ENTRY = struct.Struct('<QQII') #position hash, packed move, games, half points scored by the side that played it
+BOOK_PLIES = 16 #positions deeper into the game than this are left out
+MIN_GAMES = 2 #moves played fewer times than this are left out
+
+
+class BookBuilder():
+    def __init__(self, plies=BOOK_PLIES):
+        self.plies = plies
+        self.counts = {} #(hash, packed move) -> [games, half points]
+
+    '''
+    Adds one position and the move played from it. points is 2 for a win of the side that played it, 1 for a draw
+    '''
+    def add(self, key, move, points):
+        entry = self.counts.setdefault((key, int(move)), [0, 0])
+        entry[0] += 1
+        entry[1] += points
+
+    '''
+    Replays a game given as packed moves from the start position. result is "red", "black" or "draw". The first
+    randomPlies moves were picked at random to vary the openings, they are played but not booked
+    '''
+    def addGame(self, moves, result, randomPlies=0):
+        gs = BitboardState()
+        for ply, move in enumerate(moves[:self.plies]):
+            if ply < randomPlies:
+                gs.makeMove(move)
+                continue
+            if result == "draw":
+                points = 1
+            else:
+                points = 2 if (result == "red") == gs.redToMove else 0
+            self.add(gs.zobristHash, move, points)
+            gs.makeMove(move)
+
+    '''
+    Adds every game in a CheckersSelfPlay JSONL file, returns how many there were
+    '''
+    def addSelfPlay(self, path):
+        games = 0
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.addGame(record["moves"], record["result"], record.get("randomPlies", 0))
+                    games += 1
+        return games
+
+    '''
+    Writes the book sorted by hash, then move. Returns the number of entries written
+    '''
+    def write(self, path, minGames=MIN_GAMES):
+        entries = sorted((key, move, games, points) for (key, move), (games, points) in self.counts.items()
+                         if games >= minGames)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+            for entry in entries:
+                f.write(ENTRY.pack(*entry))
+        return len(entries)
+
+
+'''
+Read only access to a book file
+'''
+class OpeningBook():
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.entries = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or HEADER.size + self.entries * ENTRY.size > len(self.mm):
+            self.mm.close()
+            raise ValueError("%s is not a version %d opening book" % (path, VERSION))
+
+    def keyAt(self, i):
+        return struct.unpack_from('<Q', self.mm, HEADER.size + i * ENTRY.size)[0]
+
+    '''
+    [(packed move, games, half points)] for the position with this hash, empty when it isn't in the book
+    '''
+    def lookup(self, key):
+        low, high = 0, self.entries
+        while low < high: #first entry whose key is not below key
+            middle = (low + high) // 2
+            if self.keyAt(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        found = []
+        while low < self.entries:
+            entryKey, move, games, points = ENTRY.unpack_from(self.mm, HEADER.size + low * ENTRY.size)
+            if entryKey != key:
+                break
+            found.append((move, games, points))
+            low += 1
+        return found
+
+    '''
+    A move out of validMoves for gs, picked at random in proportion to the points it scored, or None when the book has
+    nothing (or only losing moves) for the position. Works with GameState and BitboardState
+    '''
+    def chooseMove(self, gs, validMoves, rng=random):
+        candidates, weights = [], []
+        for move, games, points in self.lookup(gs.zobristHash):
+            validMove = matchMove(BitboardMove(move), validMoves)
+            if validMove is not None and points > 0:
+                candidates.append(validMove)
+                weights.append(points)
+        if len(candidates) == 0:
+            return None
+        return rng.choices(candidates, weights)[0]
+
+    def close(self):
+        self.mm.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query a checkers opening book")
+    parser.add_argument('book', help="book file to write, or to read with --probe")
+    parser.add_argument('games', nargs='*', help="CheckersSelfPlay JSONL files to build from")
+    parser.add_argument('--plies', type=int, default=BOOK_PLIES)
+    parser.add_argument('--min-games', type=int, default=MIN_GAMES)
+    parser.add_argument('--probe', default=None, metavar='FEN', help="show the book moves for a position")
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        book = OpeningBook(args.book)
+        for move, games, points in book.lookup(BitboardState.fromFen(args.probe).zobristHash):
+            print("%-8s %6d games %5.1f%%" % (BitboardMove(move).getPdnNotation(), games, 50.0 * points / games))
+        book.close()
+        return 0
+    builder = BookBuilder(args.plies)
+    games = sum(builder.addSelfPlay(path) for path in args.games)
+    entries = builder.write(args.book, args.min_games)
+    print("%d games, %d positions/moves, %d written to %s (%d bytes)" % (games, len(builder.counts), entries,
+                                                                          args.book, os.path.getsize(args.book)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Time management for the CheckersAI search. A SearchController runs the iterative deepening search under a set of
+SearchLimits (any mix of a depth, a fixed time per move, a node budget, an absolute deadline, and a game clock with an
+increment) and stops it in time. With a clock, the time for a move is shared out from the time left, the increment and
+how far the game has got: the middle game gets more than the opening, where moves are simpler. Each move then has a
+target time and a hard limit. The search gives up before the target once its best move has stayed the same for a few
+iterations, goes past it when the best move keeps changing, and never passes the hard limit. Whatever stops it, the
+search answers with the best move it has found so far.
+"""
+import time
+from Checkers import CheckersAI
+
+MAX_DEPTH = 64 #iterations to allow when only time or nodes limit the search
+MOVE_OVERHEAD = 0.05 #seconds kept back on the clock for every move, for the GUI, the pipe or the network
+MIN_MOVE_TIME = 0.01 #seconds, the least a move is given however little is left on the clock
+HARD_LIMIT_FACTOR = 4 #a move may run to this many times its target when the best move keeps changing
+MAX_CLOCK_SHARE = 0.25 #and never past this share of the time left on the clock
+OPENING_PIECES = 22 #with at least this many pieces on the board the game is still in the opening
+MIDDLEGAME_PIECES = 10 #and down to this many, the middle game
+OPENING_FACTOR = 0.7
+MIDDLEGAME_FACTOR = 1.2
+NEXT_ITERATION_SHARE = 0.5 #another iteration isn't started past this share of the target, it would not finish in time
+STABLE_ITERATIONS = 3 #iterations with the same best move before the search stops early
+STABLE_FACTOR = 0.6
+UNSTABLE_FACTOR = 1.6
+SCORE_DROP = 30 #a best score this much lower than the last iteration's counts as unstable, like a new best move
+
+
+class SearchLimits():
+    '''
+    What a search may use. Times are in seconds, deadline is a time.monotonic() value, clock is the time the side to
+    move has left and increment what it gets back after the move. A search with none of the time or node limits runs
+    to depth, or CheckersAI.DEPTH when that isn't given either
+    '''
+    def __init__(self, depth=None, moveTime=None, nodes=None, deadline=None, clock=None, increment=0.0,
+                 movesToGo=None):
+        self.depth = depth
+        self.moveTime = moveTime
+        self.nodes = nodes
+        self.deadline = deadline
+        self.clock = clock
+        self.increment = increment
+        self.movesToGo = movesToGo
+
+    def isTimed(self):
+        return self.moveTime is not None or self.deadline is not None or self.clock is not None
+
+    def isBounded(self):
+        return self.isTimed() or self.nodes is not None
+
+
+def countPieces(gs):
+    if hasattr(gs, 'kings'):
+        return bin(gs.red | gs.black).count('1')
+    return sum(1 for row in gs.board for square in row if square != "--")
+
+
+'''
+(target, hard limit) in seconds for one move made with clock seconds left. Without movesToGo the moves still to play
+are guessed from the number of pieces, games with more pieces on the board have longer to go
+'''
+def allocateTime(pieces, clock, increment=0.0, movesToGo=None):
+    available = clock - MOVE_OVERHEAD
+    if available <= MIN_MOVE_TIME:
+        return MIN_MOVE_TIME, MIN_MOVE_TIME
+    if movesToGo is None:
+        movesToGo = 12 + pieces * 3 // 4
+    target = available / max(movesToGo, 1) + increment
+    if pieces >= OPENING_PIECES:
+        target *= OPENING_FACTOR
+    elif pieces >= MIDDLEGAME_PIECES:
+        target *= MIDDLEGAME_FACTOR
+    hard = min(target * HARD_LIMIT_FACTOR, available * MAX_CLOCK_SHARE + increment, available)
+    target = min(target, hard)
+    return max(target, MIN_MOVE_TIME), max(hard, MIN_MOVE_TIME)
+
+
+class SearchController():
+    '''
+    Runs one search under limits. stopEvent, if given, is anything with an is_set() method and stops the search from
+    outside, the controller passes itself to CheckersAI.searchPosition as the stop event so it can end the search
+    between iterations too
+    '''
+    def __init__(self, limits, stopEvent=None):
+        self.limits = limits
+        self.stopEvent = stopEvent
+        self.stopped = False
+        self.target = None #seconds the move should take, None when only a hard limit applies
+        self.hardLimit = None
+        self.lastBest = None
+        self.lastScore = 0
+        self.stableIterations = 0
+
+    def is_set(self):
+        return self.stopped or (self.stopEvent is not None and self.stopEvent.is_set())
+
+    '''
+    Works out the target and hard limit for gs from the limits, both in seconds from now
+    '''
+    def budget(self, gs):
+        limits = self.limits
+        target = hard = None
+        if limits.clock is not None:
+            target, hard = allocateTime(countPieces(gs), limits.clock, limits.increment, limits.movesToGo)
+        if limits.moveTime is not None:
+            hard = limits.moveTime if hard is None else min(hard, limits.moveTime)
+        if limits.deadline is not None:
+            left = max(limits.deadline - time.monotonic(), 0.0)
+            hard = left if hard is None else min(hard, left)
+        if target is not None and target > hard:
+            target = hard
+        return target, hard
+
+    '''
+    Searches gs and returns the CheckersAI.SearchInfo. Its pv always starts with a move when validMoves isn't empty,
+    even if the search was stopped before its first iteration finished
+    '''
+    def search(self, gs, validMoves, tt=None, onIteration=None):
+        start = time.monotonic()
+        limits = self.limits
+        self.target, self.hardLimit = self.budget(gs)
+        if limits.depth is not None:
+            depth = limits.depth
+        else:
+            depth = MAX_DEPTH if limits.isBounded() else CheckersAI.DEPTH
+        if len(validMoves) == 1 and limits.isBounded(): #nothing to think about, keep the time for later moves
+            info = CheckersAI.SearchInfo()
+            info.pv = [validMoves[0]]
+            return info
+
+        def iterationDone(info):
+            self.updateStability(info)
+            if self.target is not None and time.monotonic() - start > self.target * self.factor() * NEXT_ITERATION_SHARE:
+                self.stopped = True
+            if onIteration is not None:
+                onIteration(info)
+
+        info = CheckersAI.searchPosition(gs, validMoves, depth, self.hardLimit, tt=tt, stopEvent=self,
+                                         onIteration=iterationDone, nodeLimit=limits.nodes)
+        if len(info.pv) == 0 and len(validMoves) != 0:
+            info.pv = [validMoves[0]]
+        return info
+
+    def updateStability(self, info):
+        best = info.pv[0].moveID if len(info.pv) != 0 else None
+        if self.lastBest is not None and (best != self.lastBest or info.score < self.lastScore - SCORE_DROP):
+            self.stableIterations = 0
+        else:
+            self.stableIterations += 1
+        self.lastBest = best
+        self.lastScore = info.score
+
+    '''
+    How much of the target the search should use given how settled its answer is
+    '''
+    def factor(self):
+        if self.stableIterations == 0:
+            return UNSTABLE_FACTOR
+        if self.stableIterations >= STABLE_ITERATIONS:
+            return STABLE_FACTOR
+        return 1.0
+
+
+'''
+Searches gs under limits and returns its SearchInfo, see SearchController.search
+'''
+def think(gs, validMoves, limits, stopEvent=None, tt=None, onIteration=None):
+    return SearchController(limits, stopEvent).search(gs, validMoves, tt, onIteration)
@@ -2,73 +2,369 @@
 This class is responsible for storing all the information about the current state of a checkers game. It will also be
 responsible for determining the valid moves at the current state. It will also keep a move log.
 """
+import random
+
+'''
+Zobrist keys: one random 64 bit number for every kind of piece on every dark square, plus one for black to move. The
+hash of a position is the xor of the keys of everything on it, so a move only has to xor in and out the squares it
+changes. The keys come from a fixed seed so that every process, and both GameState and CheckersBitboard.BitboardState,
+give the same position the same hash.
+'''
+PIECE_KINDS = {'rc': 0, 'bc': 1, 'rk': 2, 'bk': 3}
+_zobristRandom = random.Random(0x636865636b657273)
+ZOBRIST_PIECES = [[_zobristRandom.getrandbits(64) for kind in range(4)] for sq in range(64)]
+ZOBRIST_BLACK_TO_MOVE = _zobristRandom.getrandbits(64)
+
+
+'''
+Piece-square scores, from red's point of view, for every kind of piece on every dark square: the material value of
+the piece plus positional terms. Men are worth more the further they have advanced, get a bonus for guarding their
+own back row (which stops the other side crowning) and for the four centre squares. Kings are worth more than men
+and prefer the middle of the board to the edges. Black pieces use the same numbers mirrored and negated, so the
+score of a position is the sum of the entries for everything on it and a move only adds and subtracts the squares it
+changes, just like the Zobrist hash.
+'''
+MAN_VALUE = 100
+KING_VALUE = 130
+BACK_ROW_GUARD = 6
+CENTRE_BONUS = 4
+ADVANCE_BONUS = 2
+KING_CENTRE_BONUS = 6
+KING_EDGE_PENALTY = 4
+
+
+def redPieceSquareScore(r, c, isKing, size=8):
+    last = size - 1
+    centre = size // 2 - 1 <= r <= size // 2 and 2 <= c <= last - 2
+    if isKing:
+        if 2 <= r <= last - 2 and 2 <= c <= last - 2:
+            return KING_VALUE + KING_CENTRE_BONUS
+        if r == 0 or r == last or c == 0 or c == last:
+            return KING_VALUE - KING_EDGE_PENALTY
+        return KING_VALUE
+    advanced = last - r
+    return MAN_VALUE + (BACK_ROW_GUARD if advanced == 0 else ADVANCE_BONUS * advanced) + (CENTRE_BONUS if centre else 0)
+
+
+def buildPieceSquareScores(size=8):
+    scores = []
+    last = size - 1
+    for sq in range(size * size // 2):
+        r = sq // (size // 2)
+        c = (sq % (size // 2)) * 2 + (1 if r % 2 == 0 else 0)
+        scores.append([redPieceSquareScore(r, c, False, size), -redPieceSquareScore(last - r, last - c, False, size),
+                       redPieceSquareScore(r, c, True, size), -redPieceSquareScore(last - r, last - c, True, size)])
+    return scores
+
+
+PIECE_SQUARE_SCORES = buildPieceSquareScores()  # indexed [square][PIECE_KINDS value] like ZOBRIST_PIECES
+
+
+'''
+Board geometry. Directions are numbered up-left, up-right, down-left, down-right, red moves up the board and black down.
+Everything move generation needs to know about the shape of the board is worked out once per board size when the module
+is imported and kept in tables indexed [row][col] (None on the light squares): the neighbour in each direction, the
+neighbours a man can step to, the (jumped, landing) square pairs for short jumps, and the ray of squares out to the
+edge in each direction for flying kings. Dark squares are numbered row by row, row * (size // 2) + col // 2, which is
+the index into ZOBRIST_PIECES and the piece-square scores, and one more than the PDN square number. The hash key and
+score of every piece on every square are in tables too, so makeMove doesn't have to work out square numbers
+'''
+DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+FORWARD = {'r': (0, 1), 'b': (2, 3)} #directions each side's men move in
+BOARD_SIZES = (8, 10)
+
+
+class BoardGeometry():
+    def __init__(self, size):
+        self.size = size
+        self.squaresPerRow = size // 2
+        self.squares = tuple((r, c) for r in range(size) for c in range(size) if (r + c) % 2 == 1)
+        self.lastRow = {'r': 0, 'b': size - 1} #where each side's men are crowned
+        self.squareNumbers = self.table(lambda r, c: r * self.squaresPerRow + c // 2)
+        scores = buildPieceSquareScores(size)
+        self.zobristKeys = self.table(lambda r, c: {piece: ZOBRIST_PIECES[self.squareNumbers[r][c]][kind]
+                                                    for piece, kind in PIECE_KINDS.items()})
+        self.pieceScores = self.table(lambda r, c: {piece: scores[self.squareNumbers[r][c]][kind]
+                                                    for piece, kind in PIECE_KINDS.items()})
+        self.neighbours = self.table(lambda r, c: tuple(self.onBoard(r + dr, c + dc) for (dr, dc) in DIRECTIONS))
+        self.rays = self.table(lambda r, c: tuple(self.ray(r, c, dr, dc) for (dr, dc) in DIRECTIONS))
+        self.steps = self.table(lambda r, c: tuple(ray[0] for ray in self.rays[r][c] if len(ray) != 0))
+        self.jumps = self.table(lambda r, c: tuple(ray[:2] for ray in self.rays[r][c] if len(ray) >= 2))
+        self.forwardSteps = {}
+        self.forwardJumps = {}
+        for color, directions in FORWARD.items():
+            self.forwardSteps[color] = self.table(
+                lambda r, c: tuple(self.rays[r][c][d][0] for d in directions if len(self.rays[r][c][d]) != 0))
+            self.forwardJumps[color] = self.table(
+                lambda r, c: tuple(self.rays[r][c][d][:2] for d in directions if len(self.rays[r][c][d]) >= 2))
+
+    def table(self, entry):
+        rows = [[None] * self.size for _ in range(self.size)]
+        for (r, c) in self.squares:
+            rows[r][c] = entry(r, c)
+        return rows
+
+    def onBoard(self, r, c):
+        return (r, c) if 0 <= r < self.size and 0 <= c < self.size else None
+
+    def ray(self, r, c, dr, dc):
+        squares = []
+        while self.onBoard(r + dr, c + dc) is not None:
+            r, c = r + dr, c + dc
+            squares.append((r, c))
+        return tuple(squares)
+
+
+GEOMETRIES = {size: BoardGeometry(size) for size in BOARD_SIZES}
+
+
+'''
+Hash of a whole board, only needed when a position is set up. makeMove and undoMove keep it up to date after that
+'''
+def computeHash(board, redToMove):
+    keys = GEOMETRIES[len(board)].zobristKeys
+    h = 0 if redToMove else ZOBRIST_BLACK_TO_MOVE
+    for r in range(len(board)):
+        for c in range(len(board[r])):
+            if board[r][c] != "--":
+                h ^= keys[r][c][board[r][c]]
+    return h
+
+
+'''
+Score of a whole board from red's point of view, only needed when a position is set up. makeMove and undoMove keep
+GameState.evalScore up to date after that
+'''
+def computeScore(board):
+    scores = GEOMETRIES[len(board)].pieceScores
+    score = 0
+    for r in range(len(board)):
+        for c in range(len(board[r])):
+            if board[r][c] != "--":
+                score += scores[r][c][board[r][c]]
+    return score
+
+
+'''
+FEN strings in the PDN style, for example "W:W21,22,K30:B1,2,3". The first letter is the side to move, then come the
+squares of each side with K in front of kings. Squares are numbered 1-32 over the dark squares, left to right from
+the top row, so black starts on 1-12 and red on 21-32. Red plays the part of White and black the part of Black,
+so the starting position (red to move) is "W:W21-32:B1-12". 10x10 boards number their squares 1-50 the same way
+'''
+START_FEN = "W:W21-32:B1-12"
+UNDO_STACK_SIZE = 256 #undo records GameState makes room for up front, the stack doubles if a game goes past it
+
+
+def boardFromFen(fen, size=8):
+    board = [["--"] * size for _ in range(size)]
+    half = size // 2
+    fields = fen.strip().rstrip('.').split(':')
+    redToMove = fields[0].strip().upper() == 'W'
+    for field in fields[1:]:
+        field = field.strip()
+        if len(field) == 0:
+            continue
+        color = 'r' if field[0].upper() == 'W' else 'b'
+        for square in field[1:].split(','):
+            square = square.strip()
+            if len(square) == 0:
+                continue
+            piece = color + ('k' if square[0].upper() == 'K' else 'c')
+            square = square.lstrip('Kk')
+            if '-' in square:
+                first, last = square.split('-')
+                squares = range(int(first), int(last) + 1)
+            else:
+                squares = [int(square)]
+            for number in squares:
+                r = (number - 1) // half
+                board[r][((number - 1) % half) * 2 + (1 if r % 2 == 0 else 0)] = piece
+    return board, redToMove
+
+
+def fenFromBoard(board, redToMove):
+    sides = {'r': [], 'b': []}
+    half = len(board) // 2
+    for r in range(len(board)):
+        for c in range(len(board)):
+            if board[r][c] != "--":
+                sides[board[r][c][0]].append(('K' if board[r][c][1] == 'k' else '') + str(r * half + c // 2 + 1))
+    return ('W' if redToMove else 'B') + ':W' + ','.join(sides['r']) + ':B' + ','.join(sides['b'])
+
+
+'''
+The rules that differ between the checkers families GameState can play:
+    flyingKings         kings move and capture any distance along a diagonal instead of one square
+    menCaptureBackwards men may jump backwards as well as forwards (they still only step forwards)
+    crowningEndsMove    a man that reaches the last row during a jump is crowned and its move ends there
+    crownDuringCapture  a man that reaches the last row during a jump is crowned and carries on jumping as a king.
+                        With neither, it carries on as a man and is only crowned if its move ends on the last row
+    mostCaptures        of all the jumps, only those that capture the most pieces may be played
+In every variant jumps are mandatory, a jumped piece stays on the board until the move is finished (so it can't be
+jumped twice), and black and white are played by black and red with red moving first
+'''
+class Variant():
+    def __init__(self, name, size, startFen, flyingKings=False, menCaptureBackwards=False, crowningEndsMove=False,
+                 crownDuringCapture=False, mostCaptures=False):
+        self.name = name
+        self.size = size
+        self.geometry = GEOMETRIES[size]
+        self.startFen = startFen
+        self.flyingKings = flyingKings
+        self.menCaptureBackwards = menCaptureBackwards
+        self.crowningEndsMove = crowningEndsMove
+        self.crownDuringCapture = crownDuringCapture
+        self.mostCaptures = mostCaptures
+
+
+AMERICAN = Variant("american", 8, START_FEN, crowningEndsMove=True)
+RUSSIAN = Variant("russian", 8, START_FEN, flyingKings=True, menCaptureBackwards=True, crownDuringCapture=True)
+INTERNATIONAL = Variant("international", 10, "W:W31-50:B1-20", flyingKings=True, menCaptureBackwards=True,
+                        mostCaptures=True)
+VARIANTS = {variant.name: variant for variant in (AMERICAN, RUSSIAN, INTERNATIONAL)}
 
 
 class GameState():
-    def __init__(self):  # This initializes itself
-        # The Board is a 8x8 two-dimensional list, each element of the list has 2 characters.
-        # The first character represents the color of piece, 'b' or 'r'
-        # The second character represents the type of the piece 'c' for checker, etc.
+    def __init__(self, variant=AMERICAN):  # This initializes itself
+        # The Board is a two-dimensional list, 8x8 or 10x10 depending on the variant, each element of the list has 2
+        # characters. The first character represents the color of piece, 'b' or 'r'
+        # The second character represents the type of the piece 'c' for checker, 'k' for king.
         # "--" represents an empty space with no piece.
-        self.board = [
-            ["--", "bc", "--", "bc", "--", "bc", "--", "bc"],
-            ["bc", "--", "bc", "--", "bc", "--", "bc", "--"],
-            ["--", "bc", "--", "bc", "--", "bc", "--", "bc"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["--", "--", "--", "--", "--", "--", "--", "--"],
-            ["rc", "--", "rc", "--", "rc", "--", "rc", "--"],
-            ["--", "rc", "--", "rc", "--", "rc", "--", "rc"],
-            ["rc", "--", "rc", "--", "rc", "--", "rc", "--"],
-        ]
-        self.moveFunctions = {'c': self.getCheckerMoves}
-
-        self.redToMove = True
+        self.variant = variant
+        self.board, redToMove = boardFromFen(variant.startFen, variant.size)
+        self.bindPieceFunctions()
+
+        self.redToMove = redToMove
         self.moveLog = []
+        self.zobristHash = computeHash(self.board, self.redToMove)
+        self.evalScore = computeScore(self.board) #material and piece-square score for red, CheckersAI reads it at the leaves
+        self.mobilityScore = self.computeMobility() #quiet steps red has over black, kept up to date like evalScore
+        #one undo record per move in moveLog: (start row, start col, end row, end col, piece moved, ((row, col, piece)
+        #for every piece jumped), promoted, hash before, score before, mobility before). Records are tuples, so clones
+        #can share them
+        self.undoStack = [None] * UNDO_STACK_SIZE
+        self.undoTop = 0
         #self.checkmate = False
         #self.stalemate = False
         #self.inCheck = False
         #self.pins = []
         #self.checks = []
 
+    '''
+    A new game starting from the position in a FEN string
+    '''
+    @classmethod
+    def fromFen(cls, fen, variant=AMERICAN):
+        gs = cls(variant)
+        gs.board, gs.redToMove = boardFromFen(fen, variant.size)
+        gs.zobristHash = computeHash(gs.board, gs.redToMove)
+        gs.evalScore = computeScore(gs.board)
+        gs.mobilityScore = gs.computeMobility()
+        return gs
+
+    def getFen(self):
+        return fenFromBoard(self.board, self.redToMove)
+
+    '''
+    Picks the move generators for the variant's kings and the geometry tables for its board size
+    '''
+    def bindPieceFunctions(self):
+        self.geometry = self.variant.geometry
+        self.moveFunctions = {'c': self.getCheckerMoves,
+                              'k': self.getFlyingKingMoves if self.variant.flyingKings else self.getKingMoves}
+        self.jumpFunctions = {'c': self.getCheckerJumps, 'k': self.getKingJumps}
+
+    '''
+    Everything needed to come back to this position and its history later with restore. Only tuples are copied, the
+    moves and undo records themselves are shared
+    '''
+    def snapshot(self):
+        return (tuple(tuple(row) for row in self.board), self.redToMove, self.zobristHash, self.evalScore,
+                self.mobilityScore, tuple(self.moveLog), tuple(self.undoStack[:self.undoTop]))
+
+    def restore(self, snapshot):
+        rows, self.redToMove, self.zobristHash, self.evalScore, self.mobilityScore, moveLog, undoRecords = snapshot
+        for r in range(len(rows)):
+            self.board[r][:] = rows[r]
+        self.moveLog = list(moveLog)
+        while len(self.undoStack) < len(undoRecords):
+            self.undoStack.extend([None] * len(self.undoStack))
+        self.undoStack[:len(undoRecords)] = undoRecords
+        self.undoTop = len(undoRecords)
 
     '''
-    Takes a move as a parameter and executes it (this will not work for castling, pawn promotion, and en-passant
+    An independent copy to search or try moves on. Only the board rows and the lists are copied, the moves and undo
+    records in them are shared, and nothing is recomputed
+    '''
+    def clone(self):
+        gs = GameState.__new__(GameState)
+        gs.variant = self.variant
+        gs.board = [row[:] for row in self.board]
+        gs.bindPieceFunctions()
+        gs.redToMove = self.redToMove
+        gs.moveLog = self.moveLog[:]
+        gs.zobristHash = self.zobristHash
+        gs.evalScore = self.evalScore
+        gs.mobilityScore = self.mobilityScore
+        gs.undoStack = self.undoStack[:]
+        gs.undoTop = self.undoTop
+        return gs
+
+    '''
+    Takes a move as a parameter and executes it, removing every piece it jumped and crowning a man that ends on the last
+    row
     '''
 
     def makeMove(self, move):
         if self.board[move.startRow][move.startCol] != '--':
+            if self.undoTop == len(self.undoStack):
+                self.undoStack.extend([None] * len(self.undoStack))
+            captured = tuple([(r, c, self.board[r][c]) for (r, c) in move.captures]) if move.captures else ()
+            self.undoStack[self.undoTop] = (move.startRow, move.startCol, move.endRow, move.endCol, move.pieceMoved,
+                                            captured, move.piecePromotion, self.zobristHash, self.evalScore,
+                                            self.mobilityScore)
+            changed = {(move.startRow, move.startCol), (move.endRow, move.endCol)}
+            changed.update((r, c) for (r, c, piece) in captured)
+            mobilityBefore = self.mobilityAround(changed)
+            self.undoTop += 1
+            keys, scores = self.geometry.zobristKeys, self.geometry.pieceScores
+            placed = move.pieceMoved[0] + 'k' if move.piecePromotion else move.pieceMoved
+            self.zobristHash ^= keys[move.startRow][move.startCol][move.pieceMoved] ^ \
+                keys[move.endRow][move.endCol][placed] ^ ZOBRIST_BLACK_TO_MOVE
+            self.evalScore += scores[move.endRow][move.endCol][placed] - \
+                scores[move.startRow][move.startCol][move.pieceMoved]
             self.board[move.startRow][move.startCol] = '--'
-            if move.pieceCaptured != "": #FIX
-                self.board[move.capturedRow][move.capturedCol] = "--"
-                print("CAPTURED: ", move.capturedRow, move.capturedCol, move.pieceCaptured)
+            for (r, c, piece) in captured:
+                self.board[r][c] = "--"
+                self.zobristHash ^= keys[r][c][piece]
+                self.evalScore -= scores[r][c][piece]
 
-            self.board[move.endRow][move.endCol] = move.pieceMoved
+            self.board[move.endRow][move.endCol] = placed
+            self.mobilityScore += self.mobilityAround(changed) - mobilityBefore
             self.moveLog.append(move)  # log the move so we can undo it later
             self.redToMove = not self.redToMove  # switch turns
 
-        #piece promotion FIX
-        #if move.isPawnPromotion:
-            #promotedPiece = input("Promote to Q, R, B, or N:")
-            #self.board[move.endRow][move.endCol] =  move.pieceMoved[0] + promotedPiece.upper()
-
 
     '''
-    Undo the last move made  FIX
+    Undo the last move made from its undo record, the jumped pieces go back on the squares they were jumped on and a
+    crowned piece goes back as the man it was
     '''
     def undoMove(self):
-        if len(self.moveLog) != 0:  # make sure that there is a move to undo
-            move = self.moveLog.pop()
-            #print("UNDO: ", move.pieceMoved, move.moveID, move.endRow, move.endCol)
-            self.board[move.startRow][move.startCol] = move.pieceMoved
-            #print(move.pieceMoved)
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
-            #print("UNDO CAPTURE: ", move.pieceCaptured, move.endRow, move.endCol)
+        if self.undoTop != 0:  # make sure that there is a move to undo
+            self.moveLog.pop()
+            self.undoTop -= 1
+            startRow, startCol, endRow, endCol, piece, captured, promoted, self.zobristHash, self.evalScore, \
+                self.mobilityScore = self.undoStack[self.undoTop]
+            self.board[endRow][endCol] = "--"
+            self.board[startRow][startCol] = piece
+            for (r, c, capturedPiece) in captured:
+                self.board[r][c] = capturedPiece
             self.redToMove = not self.redToMove  # switch turns back
 
 
 
     '''
-    All moves considering checks
+    All moves considering the forced capture rule
     '''
     def getValidMoves(self):
         #generate all possible moves
@@ -76,9 +372,6 @@ class GameState():
 
         moves = self.getAllPossibleMoves()
 
-        # prints list of valid moves
-        for i in range(len(moves)):
-            print("VALID: ", moves[i].startRow, moves[i].startCol, moves[i].endRow, moves[i].endCol, "DONE")
         #if moves == []:
             #if self.inCheck:
                 #self.checkmate = True
@@ -89,175 +382,266 @@ class GameState():
         return moves
 
     '''
-    All moves without considering checks
+    How many more quiet one square steps red's pieces have than black's, the same count as BitboardState.mobility so
+    a position scores the same in either state. makeMove and undoMove keep it up to date, so this is a field read
+    '''
+    def mobility(self):
+        return self.mobilityScore
+
+    '''
+    The mobility counted over the whole board, only needed when a position is set up
+    '''
+    def computeMobility(self):
+        return self.mobilityAround(self.geometry.squares)
+
+    '''
+    The part of the mobility that depends on the squares in changed: steps from a piece on one of them and steps onto
+    one of them. A move changes the mobility by how much this changes over the squares it empties and fills
+    '''
+    def mobilityAround(self, changed):
+        board = self.board
+        geometry = self.geometry
+        steps = 0
+        for (r, c) in changed:
+            piece = board[r][c]
+            if piece != "--":
+                targets = geometry.steps[r][c] if piece[1] == 'k' else geometry.forwardSteps[piece[0]][r][c]
+                free = sum(1 for (endRow, endCol) in targets if board[endRow][endCol] == "--")
+                steps += free if piece[0] == 'r' else -free
+                continue
+            for d, square in enumerate(geometry.neighbours[r][c]):
+                if square is None or square in changed: #steps between two changed squares are counted from the piece
+                    continue
+                neighbour = board[square[0]][square[1]]
+                #the neighbour in direction d reaches this square going the opposite way, 3 - d
+                if neighbour != "--" and (neighbour[1] == 'k' or 3 - d in FORWARD[neighbour[0]]):
+                    steps += 1 if neighbour[0] == 'r' else -1
+        return steps
+
+    '''
+    All moves for the side to move. Jumps are mandatory: if any piece can jump, only the jumps are returned, and in
+    variants with the majority rule only the ones that capture the most pieces
     '''
     def getAllPossibleMoves(self):
         moves = []  #List of all possible moves
-        for r in range(len(self.board)):  # number of rows
-            for c in range(len(self.board[r])):  # number of columns in given row
-                turn = self.board[r][c][0]  # returns the first letter of what is in the current square
-                if (turn == 'r' and self.redToMove) or (turn == 'b' and not self.redToMove):
-                    piece = self.board[r][c][1]
-                    multiple = 0 #how many times a piece can capture
-                    #instead of doing a lot of if statements, you can make a dictionary
-                    # if piece == 'p':
-                    #     self.getPawnMoves(r, c, moves)
-                    # elif piece == 'R':
-                    #     self.getRookMoves(r, c, moves)
-                    # elif piece == 'N':
-                    #     self.getKnightMoves(r, c, moves)
-                    # elif piece == 'B':
-                    #     self.getBishopMoves(r, c, moves)
-                    # elif piece == 'Q':
-                    #     self.getQueenMoves(r, c, moves)
-                    # elif piece == 'K':
-                    #     self.getKingMoves(r, c, moves)
-                    self.moveFunctions[piece](r, c, moves, multiple) #calls the appropriate move function based on piece types
+        color = 'r' if self.redToMove else 'b'
+        board = self.board
+        pieces = [(r, c) for (r, c) in self.geometry.squares if board[r][c][0] == color]
+        for (r, c) in pieces:
+            self.jumpFunctions[board[r][c][1]](r, c, moves)
+        if len(moves) != 0:
+            if self.variant.mostCaptures:
+                most = max(len(move.captures) for move in moves)
+                moves = [move for move in moves if len(move.captures) == most]
+            return moves
+        for (r, c) in pieces:
+            self.moveFunctions[board[r][c][1]](r, c, moves) #calls the appropriate move function based on piece types
         return moves
 
     '''
-    Get all the pawn moves for the pawn located at row, col, and add these moves to the list
-    '''
-
-    def getCheckerMoves(self, r, c, moves, multiple): # FIX METHOD
-
-        if self.redToMove: #red checker moves
-            if c-1 >= 0:
-                if self.board[r-1][c-1] == "--": #red piece can advance left
-                    if r - 1 == 0:
-                        piecePromotion = True
-                        moves.append(Move((r, c), (r-1, c-1), self.board, piecePromotion))
-                    else:
-                        moves.append(Move((r, c), (r-1, c-1), self.board))
-            if c+1 <= 7:
-                if self.board[r-1][c+1] == "--": #red piece can advance right
-                    if r - 1 == 0:
-                        piecePromotion = True
-                        moves.append(Move((r, c), (r-1, c+1), self.board, piecePromotion))
-                    else:
-                        moves.append(Move((r, c), (r-1, c+1), self.board))
-
-            #capturing ONLY 1 jump for now
-            if c-multiple-2 >= 0: #captures to the left
-                if self.board[r-multiple-1][c-multiple-1][0] == "b":
-                    if r-multiple-2 >= 0 and self.board[r-multiple-2][c-multiple-2] == "--":
-                        if r - multiple - 2 == 0:
-                            piecePromotion = True
-                            moves.append(Move((r, c), (r-multiple-2, c-multiple-2), self.board, piecePromotion=True))
-                        else: #FIX CAPTURING MULTIPLE PIECES
-                            moves.append(Move((r, c), (r - multiple - 2, c - multiple - 2), self.board))
-                            multiple = multiple+2
-                            self.getCheckerMoves(r, c, moves, multiple)
-                            for i in range(len(moves)):
-                                print("VALID: ", moves[i].startRow, moves[i].startCol, moves[i].endRow, moves[i].endCol)
-            if c+2 <= 7: #captures to the right
-                if self.board[r-1][c+1][0] == "b":
-                    if r-2 >= 0 and self.board[r-2][c+2] == "--":
-                        if r - 2 == 0:
-                            piecePromotion = True
-                            moves.append(Move((r, c), (r-2, c+2), self.board, piecePromotion=True))
-                        else:
-                            moves.append(Move((r, c), (r-2, c+2), self.board))
-
-        else:  # black checker moves
-            if c - 1 >= 0:
-                if self.board[r + 1][c - 1] == "--":  # black piece can advance left
-                    if r + 1 == 7:
-                        piecePromotion = True
-                        moves.append(Move((r, c), (r + 1, c - 1), self.board, piecePromotion))
-                    else:
-                        moves.append(Move((r, c), (r + 1, c - 1), self.board))
-            if c + 1 <= 7:
-                if self.board[r + 1][c + 1] == "--":  # black piece can advance right
-                    if r + 1 == 7:
-                        piecePromotion = True
-                        moves.append(Move((r, c), (r + 1, c + 1), self.board, piecePromotion))
-                    else:
-                        moves.append(Move((r, c), (r + 1, c + 1), self.board))
-
-            # capturing ONLY 1 jump for now
-            if c - 2 >= 0:  # captures to the left
-                if self.board[r + 1][c - 1][0] == "r":
-                    if r+2 >= 0 and self.board[r + 2][c - 2] == "--":
-                        if r + 2 == 7:
-                            piecePromotion = True
-                            moves.append(Move((r, c), (r + 2, c - 2), self.board, piecePromotion=True))
-                        else:
-                            moves.append(Move((r, c), (r + 2, c - 2), self.board))
-            if c + 2 <= 7:  # captures to the right
-                if self.board[r + 1][c + 1][0] == "r":
-                    if r+2 >= 0 and self.board[r + 2][c + 2] == "--":
-                        if r + 2 == 7:
-                            piecePromotion = True
-                            moves.append(Move((r, c), (r + 2, c + 2), self.board, piecePromotion=True))
-                        else:
-                            moves.append(Move((r, c), (r + 2, c + 2), self.board))
+    Get all the non capturing moves for the checker located at row, col, and add these moves to the list
+    '''
+
+    def getCheckerMoves(self, r, c, moves):
+        color = self.board[r][c][0]
+        kingRow = self.geometry.lastRow[color]
+        for (endRow, endCol) in self.geometry.forwardSteps[color][r][c]: #red moves up the board, black moves down
+            if self.board[endRow][endCol] == "--":
+                moves.append(Move((r, c), (endRow, endCol), self.board, piecePromotion=(endRow == kingRow), captures=()))
+
+    '''
+    Non capturing moves for a king that steps one square in any direction
+    '''
+    def getKingMoves(self, r, c, moves):
+        for (endRow, endCol) in self.geometry.steps[r][c]:
+            if self.board[endRow][endCol] == "--":
+                moves.append(Move((r, c), (endRow, endCol), self.board, captures=()))
+
+    '''
+    Non capturing moves for a flying king, to any empty square along a diagonal up to the first piece in the way
+    '''
+    def getFlyingKingMoves(self, r, c, moves):
+        for ray in self.geometry.rays[r][c]:
+            for (endRow, endCol) in ray:
+                if self.board[endRow][endCol] != "--":
+                    break
+                moves.append(Move((r, c), (endRow, endCol), self.board, captures=()))
+
+    '''
+    Jumps for the checker located at row, col. Most checkers can't jump at all, so the short jumps next to it are looked
+    at first and the chains are only followed when there is one
+    '''
+    def getCheckerJumps(self, r, c, moves):
+        color = self.board[r][c][0]
+        enemy = 'b' if color == 'r' else 'r'
+        if self.variant.menCaptureBackwards:
+            jumps = self.geometry.jumps[r][c]
+        else:
+            jumps = self.geometry.forwardJumps[color][r][c]
+        for ((midRow, midCol), (endRow, endCol)) in jumps:
+            if self.board[midRow][midCol][0] == enemy and self.board[endRow][endCol] == "--":
+                self.followJumps(r, c, False, moves)
+                return
+
+    def getKingJumps(self, r, c, moves):
+        if self.variant.flyingKings:
+            self.followJumps(r, c, True, moves)
+            return
+        enemy = 'b' if self.board[r][c][0] == 'r' else 'r'
+        for ((midRow, midCol), (endRow, endCol)) in self.geometry.jumps[r][c]:
+            if self.board[midRow][midCol][0] == enemy and self.board[endRow][endCol] == "--":
+                self.followJumps(r, c, True, moves)
+                return
+
+    '''
+    Get every complete jump sequence for the piece located at row, col. A sequence has to keep jumping while it can,
+    so only the squares where a chain ends become moves. The chains are followed with an explicit stack, each entry
+    holding where the piece is, whether it is a king by now, the squares it has jumped so far and the squares it landed
+    on. Pieces that were jumped stay on the board until the move is made, so they can't be jumped twice or landed on,
+    while the square the piece started from counts as empty
+    '''
+    def followJumps(self, r, c, isKing, moves):
+        color = self.board[r][c][0]
+        enemy = 'b' if color == 'r' else 'r'
+        kingRow = self.geometry.lastRow[color]
+        variant = self.variant
+        start = (r, c)
+        first = len(moves)
+        stack = [(r, c, isKing, (), ())]
+        while stack:
+            row, col, king, captures, path = stack.pop()
+            options = self.jumpOptions(row, col, king, captures, start, color, enemy)
+            if len(options) == 0:
+                if len(captures) != 0:
+                    self.addJump(Move(start, (row, col), self.board, piecePromotion=not isKing and (king or row == kingRow),
+                                      captures=captures, path=path), moves, first)
+                continue
+            for (jumped, landings) in options:
+                followers = []
+                for (endRow, endCol) in landings:
+                    crowned = king
+                    if not king and endRow == kingRow:
+                        if variant.crowningEndsMove: #a checker that reaches the last row is crowned and its move ends
+                            moves.append(Move(start, (endRow, endCol), self.board, piecePromotion=True,
+                                              captures=captures + (jumped,), path=path + ((endRow, endCol),)))
+                            continue
+                        crowned = variant.crownDuringCapture
+                    followers.append((endRow, endCol, crowned, captures + (jumped,), path + ((endRow, endCol),)))
+                if len(followers) > 1: #a flying king has to land where it can carry on jumping, if there is such a square
+                    carryOn = [f for f in followers if self.jumpOptions(f[0], f[1], f[2], f[3], start, color, enemy)]
+                    if len(carryOn) != 0:
+                        followers = carryOn
+                stack.extend(followers)
+
+    '''
+    The jumps a piece at row, col could make next: a list of (jumped square, landing squares). A man or a short king
+    lands just past the piece it jumps, a flying king anywhere on the empty squares after it
+    '''
+    def jumpOptions(self, row, col, king, captures, start, color, enemy):
+        board = self.board
+        options = []
+        if king and self.variant.flyingKings:
+            for ray in self.geometry.rays[row][col]:
+                for i, (midRow, midCol) in enumerate(ray):
+                    if board[midRow][midCol] == "--" or ray[i] == start:
+                        continue
+                    if board[midRow][midCol][0] == enemy and ray[i] not in captures:
+                        landings = []
+                        for (endRow, endCol) in ray[i + 1:]:
+                            if board[endRow][endCol] != "--" and (endRow, endCol) != start:
+                                break
+                            landings.append((endRow, endCol))
+                        if len(landings) != 0:
+                            options.append((ray[i], landings))
+                    break #the first piece along the ray is the only one that can be jumped
+            return options
+        if king or self.variant.menCaptureBackwards:
+            jumps = self.geometry.jumps[row][col]
+        else:
+            jumps = self.geometry.forwardJumps[color][row][col]
+        for (jumped, (endRow, endCol)) in jumps:
+            if board[jumped[0]][jumped[1]][0] == enemy and jumped not in captures and \
+                    (board[endRow][endCol] == "--" or (endRow, endCol) == start):
+                options.append((jumped, ((endRow, endCol),)))
+        return options
+
+    '''
+    Adds a finished jump unless the same piece already has a move to the same square taking the same pieces, which
+    happens when a king (or a man that can jump backwards) goes round a loop of pieces one way and then the other
+    '''
+    def addJump(self, move, moves, first):
+        if len(move.captures) >= (2 if self.variant.flyingKings else 4):
+            jumped = set(move.captures)
+            for other in moves[first:]:
+                if other.moveID == move.moveID and len(other.captures) == len(move.captures) \
+                        and set(other.captures) == jumped:
+                    return
+        moves.append(move)
 
 class Move():
     # these dictionaries maps keys to values
     # key : value
-    ranksToRows = {"1": 7, "2": 6, "3": 5, "4": 4,
-                   "5": 3, "6": 2, "7": 1, "8": 0}
-    rowsToRanks = {v: k for k, v in ranksToRows.items()}
-    filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3,
-                   "e": 4, "f": 5, "g": 6, "h": 7}
+    filesToCols = {"a": 0, "b": 1, "c": 2, "d": 3, "e": 4,
+                   "f": 5, "g": 6, "h": 7, "i": 8, "j": 9}
     colsToFiles = {v: k for k, v in filesToCols.items()}
+    # slots instead of an attribute dictionary, moves are made by the thousand during a search
+    __slots__ = ('startRow', 'startCol', 'endRow', 'endCol', 'pieceMoved', 'captures', 'piecesCaptured',
+                 'pieceCaptured', 'piecePromotion', 'moveID', 'path', 'boardSize')
 
-    def __init__(self, startSq, endSq, board, isEnpassantMove = False, piecePromotion = False, isCastleMove = False):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
+    def __init__(self, startSq, endSq, board, piecePromotion=False, captures=None, path=None):
+        self.startRow, self.startCol = startSq
+        self.endRow, self.endCol = endSq
         self.pieceMoved = board[self.startRow][self.startCol]
-        #only 1 capture
-        if self.pieceMoved == 'rc':
-            #print("CAPTURE: ")
-            if self.startCol-2 == self.endCol: #if captured to the left
-                self.capturedRow = self.startRow - 1
-                self.capturedCol = self.startCol - 1
-                self.pieceCaptured = board[self.capturedRow][self.capturedCol]
-                #print("CAPTURE: ", self.pieceCaptured)
-            elif self.startCol+2 == self.endCol: #if captured to the right
-                self.capturedRow = self.startRow - 1
-                self.capturedCol = self.startCol + 1
-                self.pieceCaptured = board[self.capturedRow][self.capturedCol]
-                #print("CAPTURE: ", self.pieceCaptured)
-            else:
-                self.pieceCaptured = ""
-        if self.pieceMoved == 'bc':
-            if self.startCol-2 == self.endCol: #if captured to the left
-                self.capturedRow = self.startRow + 1
-                self.capturedCol = self.startCol - 1
-                self.pieceCaptured = board[self.capturedRow][self.capturedCol]
-            elif self.startCol+2 == self.endCol: #if captured to the right
-                self.capturedRow = self.startRow + 1
-                self.capturedCol = self.startCol + 1
-                self.pieceCaptured = board[self.capturedRow][self.capturedCol]
-
+        #every square jumped in order, a single jump can be worked out from the start and end squares
+        if captures is None:
+            if abs(self.endRow - self.startRow) == 2:
+                captures = (((self.startRow + self.endRow) // 2, (self.startCol + self.endCol) // 2),)
             else:
-                self.pieceCaptured = ""
-        #pawn promotion
-        self.isPiecePromotion = ((self.pieceMoved == 'wp' and self.endRow == 0) or (self.pieceMoved == 'bp' and self.endRow == 7)) #will determine pawn promotion
-        #en passant
-        self.isEnpassantMove = isEnpassantMove
+                captures = ()
+        self.captures = captures
+        self.piecesCaptured = [board[r][c] for (r, c) in captures]
+        self.pieceCaptured = self.piecesCaptured[0] if len(captures) != 0 else ""
         self.piecePromotion = piecePromotion
-        if self.isEnpassantMove:
-            self.pieceCaptured = 'bp' if self.pieceMoved == 'wp' else 'wp'
-        #castle move
-        self.isCastleMove = isCastleMove
-
         self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+        self.path = path #every square landed on in order, only needed when kings fly past the squares they jump
+        self.boardSize = len(board)
+
     '''
     Overriding the equals method
     '''
     def __eq__(self, other):
-        if isinstance(other, Move):
+        if hasattr(other, 'moveID'): #also matches a CheckersBitboard.BitboardMove between the same squares
             return self.moveID == other.moveID
         return False
 
+    def __hash__(self):
+        return self.moveID
+
+    @property
+    def isCapture(self):
+        return len(self.captures) != 0
+
     def getChessNotation(self):
         # you can add to make this like real chess notation
         return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol)
 
     def getRankFile(self, r, c):
-        return self.colsToFiles[c] + self.rowsToRanks[r]
+        return self.colsToFiles[c] + str(self.boardSize - r)
+
+    '''
+    PDN notation with checkers square numbers (1-32, black's side first, 1-50 on a 10x10 board): "22-18" for a step,
+    "23x14" for a jump and every square landed on for a multi-jump, "23x14x5"
+    '''
+    def getPdnNotation(self):
+        half = self.boardSize // 2
+        if len(self.captures) == 0:
+            return "%d-%d" % (self.startRow * half + self.startCol // 2 + 1, self.endRow * half + self.endCol // 2 + 1)
+        r, c = self.startRow, self.startCol
+        squares = [str(r * half + c // 2 + 1)]
+        if self.path is not None:
+            squares.extend(str(r * half + c // 2 + 1) for (r, c) in self.path)
+            return 'x'.join(squares)
+        for (midRow, midCol) in self.captures:
+            r, c = 2 * midRow - r, 2 * midCol - c
+            squares.append(str(r * half + c // 2 + 1))
+        return 'x'.join(squares)
@@ -2,14 +2,22 @@
 This is our main driver file. It will be responsible for handling user input and displaying the current GameState object.
 """
 
+import logging
+import os
 import pygame as p
-from Checkers.Checkers import CheckersEngine, CheckersAI
+from Checkers import CheckersEngine, CheckersAI, CheckersWorker, CheckersStats
 
 WIDTH = HEIGHT = 512# 400 is also good
 DIMENSION = 8  # Chessboard dimensions are 8x8
 SQ_SIZE = HEIGHT // DIMENSION  # Since 512 is divisible by 8, each square will be uniformly sized
-MAX_FPS = 15  # For animations later on
+MAX_FPS = 15  # Frames a second while the AI is thinking, the rest of the time the loop sleeps until an event comes
+AI_TIME_LIMIT = 2  # Seconds the AI may think about a move
+PONDER = True  # Let the AI keep searching on the human's time
+HERE = os.path.dirname(os.path.abspath(__file__))  # Images and the book are found next to this file, wherever it is run from
+BOOK_FILE = os.path.join(HERE, "book.bin")  # Opening book, used when it exists
 IMAGES = {}  # Dictionary of images
+colors = [p.Color(238, 238, 210), p.Color(118, 150, 86)]  # Light and dark squares
+log = logging.getLogger(__name__)  # Off unless CHECKERS_LOG is set, see CheckersStats
 
 '''
 Initialize a global dictionary of images. This will be called exactly once in the main
@@ -19,7 +27,10 @@ Initialize a global dictionary of images. This will be called exactly once in th
 def loadImages():
     pieces = ['rc', 'bc']
     for piece in pieces:  # Will set piece equal to the first element in pieces and iterate until completion or error
-        IMAGES[piece] = p.transform.scale(p.image.load("Checkers images/" + piece + ".png"), (SQ_SIZE, SQ_SIZE))
+        IMAGES[piece] = p.transform.scale(p.image.load(os.path.join(HERE, "Checkers images", piece + ".png")), (SQ_SIZE, SQ_SIZE))
+        king = IMAGES[piece].copy()  # Kings are the checker with a gold ring in the middle
+        p.draw.circle(king, p.Color(230, 190, 40), (SQ_SIZE // 2, SQ_SIZE // 2), SQ_SIZE // 6, max(2, SQ_SIZE // 24))
+        IMAGES[piece[0] + 'k'] = king
     # Note: We can access an image by saying 'IMAGES['wc']'
     # p.transform.scale will make sure each image is uniformly scaled to the entire size of the chessboard square
 
@@ -44,17 +55,26 @@ def main():
     gameOver = False
     playerOne = True #If a human is playing white, then this will be True. If an AI is playing, then False
     playerTwo = True #Same but for black pieces
-    drawGameState(screen, gs, validMoves, sqSelected)  # draws the screen
+    worker = CheckersWorker.SearchWorker(CheckersAI.DEPTH, AI_TIME_LIMIT) #runs the AI search off the event loop
+    if os.path.exists(BOOK_FILE):
+        CheckersAI.setOpeningBook(BOOK_FILE)
+    renderer = BoardRenderer(screen)
+    p.event.set_blocked(p.MOUSEMOTION)  # nothing follows the mouse, so moving it shouldn't wake the loop
+    drawGameState(renderer, gs, validMoves, sqSelected)  # draws the screen
 
     while running:
         
         humanTurn = (gs.redToMove and playerOne) or (not gs.redToMove and playerTwo)
-        for e in p.event.get():
+        #nothing changes until the human does something, so sleep until an event instead of drawing frames
+        idle = gameOver or humanTurn or len(validMoves) == 0
+        for e in ([p.event.wait()] + p.event.get() if idle else p.event.get()):
             if e.type == p.QUIT:
+                worker.cancel()
                 running = False
+            elif e.type in (p.VIDEOEXPOSE, getattr(p, 'WINDOWEXPOSED', p.VIDEOEXPOSE)):
+                renderer.invalidate()  # the window was covered, everything has to be drawn again
             #mouse handler
             elif e.type == p.MOUSEBUTTONDOWN:
-                print("PLAYER MOVE:")
                 if not gameOver and humanTurn:
                     location = p.mouse.get_pos()  # (x, y) location of mouse
                     col = location[0]//SQ_SIZE  # Uses double divides // to make sure it is rounded
@@ -67,7 +87,7 @@ def main():
                         playerClicks.append(sqSelected) #append for both 1st and 2nd clicks
                     if len(playerClicks) == 2: #after 2nd click
                         move = CheckersEngine.Move(playerClicks[0], playerClicks[1], gs.board)
-                        print(move.getChessNotation())
+                        log.debug("player move %s", move.getChessNotation())
                         for i in range(len(validMoves)): #iterates through all the validMoves
                             if move == validMoves[i]: #if our current move is equal to the current valid move
                                 gs.makeMove(validMoves[i])
@@ -81,10 +101,12 @@ def main():
             #key handler
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z: #undo when 'z' is pressed
+                    worker.cancel() #whatever the AI was thinking about is no longer the position
                     gs.undoMove()
                     moveMade = True
                     #animate = False
                 if e.key == p.K_r: #resets the board when 'r' is pressed
+                    worker.cancel()
                     gs = CheckersEngine.GameState()
                     validMoves = gs.getValidMoves()
                     sqSelected = ()
@@ -92,16 +114,22 @@ def main():
                     moveMade = False
                     #animate = False
 
-        #AI move finder
-        if not gameOver and not humanTurn:
+        #AI move finder, the search runs on the worker's thread and is checked once a frame
+        if not gameOver and not humanTurn and len(validMoves) != 0:
             # #AIMove = CheckersAI.findRandomMove(validMoves)  #The AI will make random moves
             # AIMove = CheckersAI.greedyAlgo(gs, validMoves)  #The AI will make the best moves based only on material
-            AIMove = CheckersAI.findBestMove(gs, validMoves)
+            # AIMove = CheckersAI.findBestMove(gs, validMoves)  #Fixed 2 ply min/max
+            AIMove = None if worker.isThinking() else CheckersAI.bookMove(gs, validMoves) #book moves need no search
             if AIMove is None:
-                AIMove = CheckersAI.findRandomMove(validMoves)
-            gs.makeMove(AIMove)
-            moveMade = True
-            #animate = True
+                if not worker.isThinking():
+                    worker.start(gs, validMoves)
+                AIMove = worker.poll()
+            if AIMove is not None:
+                gs.makeMove(AIMove)
+                moveMade = True
+                #animate = True
+                if PONDER and ((gs.redToMove and playerOne) or (not gs.redToMove and playerTwo)):
+                    worker.ponder(gs) #think about our next move while the human thinks about theirs
 
         if moveMade:
             #if animate:
@@ -109,8 +137,11 @@ def main():
             validMoves = gs.getValidMoves()
             moveMade = False
             #animate = False
+            if log.isEnabledFor(logging.DEBUG) and len(gs.moveLog) != 0:
+                log.debug("%s captured %s, valid moves %s", gs.moveLog[-1].getChessNotation(),
+                          gs.moveLog[-1].captures, ' '.join(move.getChessNotation() for move in validMoves))
 
-        drawGameState(screen, gs, validMoves, sqSelected)  # draws the screen
+        drawGameState(renderer, gs, validMoves, sqSelected)  # redraws the squares that changed
 
         #if gs.checkmate:
             #gameOver = True
@@ -122,37 +153,76 @@ def main():
             #gameOver = True
             #drawText(screen, 'Stalemate')
         
-        clock.tick(MAX_FPS)
-        p.display.flip()
+        if not idle:
+            clock.tick(MAX_FPS)
 
 
 '''
-Highlight square selected and moves for piece selected
+Highlight square selected and moves for piece selected. Returns {(row, col): colour name} for the squares to shade
 '''
 
-def highlightSquares(screen, gs, validMoves, sqSelected):
+def highlightSquares(gs, validMoves, sqSelected):
+    highlights = {}
     if sqSelected != (): #square is not empty
         r, c = sqSelected
         if gs.board[r][c][0] == ('r' if gs.redToMove else 'b'): #makes sure the square selected is a piece that can be moved
-            #highlight selected square
-            s = p.Surface((SQ_SIZE, SQ_SIZE))
-            s.set_alpha(100) #transparency value --> 0 transparent; 255 solid
-            s.fill(p.Color('blue'))
-            screen.blit(s, (c*SQ_SIZE, r*SQ_SIZE))
-            #highlight moves from that square
-            s.fill(p.Color('yellow'))
-            for move in validMoves:
+            highlights[(r, c)] = 'blue' #highlight selected square
+            for move in validMoves: #highlight moves from that square
                 if move.startRow == r and move.startCol == c:
-                    screen.blit(s, (move.endCol*SQ_SIZE, move.endRow*SQ_SIZE))
+                    highlights[(move.endRow, move.endCol)] = 'yellow'
+    return highlights
 
 '''
 Responsible for all the graphics within a current game state
 '''
-#def drawGameState(screen, gs, validMoves, sqSelected):
-def drawGameState(screen, gs, validMoves, sqSelected):
-    drawBoard(screen)  # draw squares on the board
-    highlightSquares(screen, gs, validMoves, sqSelected)
-    drawPieces(screen, gs.board)  # draw pieces on top of those squares
+def drawGameState(renderer, gs, validMoves, sqSelected):
+    return renderer.draw(gs.board, highlightSquares(gs, validMoves, sqSelected))
+
+
+'''
+Keeps the screen up to date by redrawing only the squares whose piece or highlight changed since the last draw. The
+empty board is drawn once into its own surface and copied back under a square before its piece is drawn, and only the
+redrawn squares are sent to the display
+'''
+class BoardRenderer():
+    def __init__(self, screen):
+        self.screen = screen
+        self.background = p.Surface((WIDTH, HEIGHT))
+        drawBoard(self.background)
+        self.shades = {}
+        for color in ('blue', 'yellow'):
+            s = p.Surface((SQ_SIZE, SQ_SIZE))
+            s.set_alpha(100) #transparency value --> 0 transparent; 255 solid
+            s.fill(p.Color(color))
+            self.shades[color] = s
+        self.shown = {} #(row, col) -> (piece, highlight) currently on the screen
+
+    '''
+    Forgets what is on the screen, so the next draw redraws every square
+    '''
+    def invalidate(self):
+        self.shown = {}
+
+    '''
+    Returns the rects that were redrawn, empty when nothing changed
+    '''
+    def draw(self, board, highlights):
+        dirty = []
+        for r in range(DIMENSION):
+            for c in range(DIMENSION):
+                square = (board[r][c], highlights.get((r, c)))
+                if self.shown.get((r, c)) != square:
+                    rect = p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE)
+                    self.screen.blit(self.background, rect, rect)
+                    if square[1] is not None:
+                        self.screen.blit(self.shades[square[1]], rect)
+                    if square[0] != "--":
+                        self.screen.blit(IMAGES[square[0]], rect)
+                    self.shown[(r, c)] = square
+                    dirty.append(rect)
+        if len(dirty) != 0:
+            p.display.update(dirty)
+        return dirty
 
 
 '''
@@ -160,8 +230,6 @@ Draw the squares on the board. Must call this function before the pieces.
 '''
 
 def drawBoard(screen):
-    global colors
-    colors = [p.Color(238, 238, 210), p.Color(118, 150, 86)]
     for r in range(DIMENSION):
         for c in range(DIMENSION):
             color = colors[((r + c) % 2)]
@@ -214,4 +282,5 @@ def drawText(screen, text):
     screen.blit(textObject, textLocation.move(2, 2))
 
 if __name__ == "__main__":
-    main()
+    with CheckersStats.configureFromEnvironment():
+        main()
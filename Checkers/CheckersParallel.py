@@ -0,0 +1,169 @@
+"""
+Parallel root search. The parent process runs iterative deepening itself and, at every depth, splits the root moves
+across a concurrent.futures process pool: each worker makes its move on its own copy of the position and runs the
+CheckersAI negamax on the reply. The move that was best at the last depth is searched first with the full window, and
+its score is handed to every other root move as the alpha bound to beat, so they are cut off as soon as they can't.
+All root moves of a depth are compared at that depth, and every task stops at one shared deadline. Positions travel to
+the workers as CheckersBitboard.BitboardState.pack() tuples, every worker process keeps its own transposition table
+between tasks, and the pool is started with this process's opening book and tablebase.
+"""
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from Checkers import CheckersAI
+from Checkers.CheckersBitboard import BitboardState, BitboardMove, matchMove
+from Checkers.CheckersEngine import AMERICAN
+
+pool = None #process pool shared by every parallel search, made the first time it is needed
+poolSettings = None #(workers, book path, tablebase directory) the pool was started with
+
+
+def getPool(workers=None):
+    global pool, poolSettings
+    workers = workers or os.cpu_count() or 1
+    book = CheckersAI.openingBook.path if CheckersAI.openingBook is not None else None
+    tablebase = CheckersAI.tablebase.directory if CheckersAI.tablebase is not None else None
+    if pool is None or poolSettings != (workers, book, tablebase):
+        shutdownPool()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=initWorker, initargs=(book, tablebase))
+        poolSettings = (workers, book, tablebase)
+    return pool
+
+
+def shutdownPool():
+    global pool, poolSettings
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+    pool = None
+    poolSettings = None
+
+
+def initWorker(book, tablebase):
+    if book is not None:
+        CheckersAI.setOpeningBook(book)
+    if tablebase is not None:
+        CheckersAI.setTablebase(tablebase)
+
+
+'''
+Runs in a worker process: plays one root move and searches the reply to depth - 1 within (alpha, beta). Returns the
+score from the root side's point of view, the principal variation after the root move (as packed ints), the node count
+and whether the search finished before deadline, a time.monotonic() value (the clock is the same in every process).
+pv is the move's line from the last depth, searched first again
+'''
+def searchRootMove(packedState, move, depth, alpha, beta, deadline, pv):
+    gs = BitboardState.unpack(packedState)
+    gs.makeMove(move)
+    replies = gs.getValidMoves()
+    if len(replies) == 0:
+        return CheckersAI.CHECKMATE - 1, [], 1, True
+    timeLimit = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+    info = CheckersAI.SearchInfo(timeLimit, CheckersAI.getTranspositionTable())
+    info.pv = [BitboardMove(move)] + [BitboardMove(m) for m in pv] #tried first at each ply, like a last iteration's pv
+    info.extendedDepth = depth + 1 + depth // CheckersAI.EXTENSION_FRACTION
+    pvLine = []
+    try: #ply 1, so scores come back counted from the root
+        score = -CheckersAI.searchMoves(gs, replies, depth - 1, -beta, -alpha, 1, info, pvLine)
+    except CheckersAI.SearchTimeout:
+        return alpha, [], info.nodes, False
+    return score, [int(m) for m in pvLine], info.nodes, True
+
+
+class ParallelResult():
+    def __init__(self, move, score, pv, nodes, rootScores, depth=0):
+        self.move = move #one of the validMoves passed in
+        self.score = score
+        self.pv = pv #packed BitboardMove ints, starting with the root move
+        self.nodes = nodes
+        self.rootScores = rootScores #score of every root move at depth, in the order of validMoves
+        self.depth = depth #deepest depth whose result was used
+
+
+'''
+Searches the root moves in parallel one depth at a time and returns a ParallelResult. gs can be an American
+CheckersEngine.GameState (other variants raise ValueError) or a BitboardState, the returned move is the matching entry
+of validMoves. At every depth the last best move is searched first and the others only have to beat its score, so in
+rootScores a move that couldn't holds one less than the best score rather than its own. When several moves share the
+best score the first one in validMoves is taken, or with a seed one of them is picked by random.Random(seed).
+timeLimit is shared by the whole search: once it runs out the last finished depth is used, together with any move the
+unfinished depth had already found to be better
+'''
+def searchParallel(gs, validMoves, depth=CheckersAI.DEPTH, timeLimit=None, workers=None, seed=None):
+    bitboard = gs if isinstance(gs, BitboardState) else BitboardState.fromGameState(gs)
+    rootMoves = matchRootMoves(bitboard, validMoves)
+    packedState = bitboard.pack()
+    executor = getPool(workers)
+    deadline = None if timeLimit is None else time.monotonic() + timeLimit
+    order = list(range(len(rootMoves))) #root moves by score at the last depth, best first
+    pvs = [[] for _ in rootMoves]
+    rootScores = [0] * len(rootMoves)
+    nodes = reached = 0
+    for d in range(1, depth + 1):
+        def submit(i, alpha):
+            return executor.submit(searchRootMove, packedState, int(rootMoves[i]), d, alpha, CheckersAI.CHECKMATE + 1,
+                                   deadline, pvs[i])
+        first = order[0]
+        score, pv, searched, finished = submit(first, -CheckersAI.CHECKMATE - 1).result()
+        nodes += searched
+        if not finished:
+            break
+        scores = {first: (score, pv)}
+        # one below the best score so a move that only ties it still comes back with its real score
+        futures = {i: submit(i, score - 1) for i in order[1:]}
+        wait(futures.values())
+        complete = True
+        for i, future in futures.items():
+            moveScore, pv, searched, finished = future.result()
+            nodes += searched
+            complete = complete and finished
+            if finished:
+                scores[i] = (moveScore, pv)
+        if not complete:
+            better = [i for i in scores if scores[i][0] > score]
+            if len(better) != 0:
+                i = max(better, key=lambda i: scores[i][0])
+                rootScores[i] = scores[i][0]
+                pvs[i] = scores[i][1]
+                order.remove(i)
+                order.insert(0, i)
+            break
+        for i, (moveScore, pv) in scores.items():
+            rootScores[i] = moveScore
+            pvs[i] = pv
+        order.sort(key=lambda i: -rootScores[i]) #stable, moves that tie keep their place
+        reached = d
+        if abs(rootScores[order[0]]) >= CheckersAI.CHECKMATE - d:
+            break #a forced win or loss was found, searching deeper won't change it
+
+    bestScore = rootScores[order[0]]
+    best = sorted(i for i in range(len(rootScores)) if rootScores[i] == bestScore)
+    i = best[0] if seed is None else random.Random(seed).choice(best)
+    return ParallelResult(validMoves[i], bestScore, [int(rootMoves[i])] + pvs[i], nodes, rootScores, reached)
+
+
+def findBestMoveParallel(gs, validMoves, depth=CheckersAI.DEPTH, timeLimit=None, workers=None, seed=None):
+    if len(validMoves) == 0:
+        return None
+    if getattr(gs, 'variant', AMERICAN) is not AMERICAN: #the workers only search bitboards, this runs on the list engine
+        return CheckersAI.findBestMoveNegaMax(gs, validMoves, depth, timeLimit)
+    move = CheckersAI.bookMove(gs, validMoves)
+    if move is not None:
+        return move
+    return searchParallel(gs, validMoves, depth, timeLimit, workers, seed).move
+
+
+'''
+The bitboard move for each of validMoves, matched on start and end square and the squares jumped
+'''
+def matchRootMoves(bitboard, validMoves):
+    if len(validMoves) != 0 and isinstance(validMoves[0], int):
+        return list(validMoves)
+    generated = bitboard.getValidMoves()
+    rootMoves = []
+    for move in validMoves:
+        rootMove = matchMove(move, generated)
+        if rootMove is None:
+            raise ValueError("%s is not a legal move in %s" % (move.getPdnNotation(), bitboard.getFen()))
+        rootMoves.append(rootMove)
+    return rootMoves
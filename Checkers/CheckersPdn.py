@@ -0,0 +1,364 @@
+"""
+PDN (Portable Draughts Notation) games. readGames walks a PDN file one line at a time and yields the games as it
+finishes them, so collections far larger than memory can be read; writeGame does the reverse. A position index maps
+the hash of every position in a collection to the byte offsets of the games that reach it, sorted on disk and searched
+through mmap, so "every game that reached this position" never reads more than those games. Run it as
+python -m Checkers.CheckersPdn from the folder above Checkers, see --help for the commands.
+"""
+import argparse
+import heapq
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from Checkers.CheckersBitboard import BitboardState, BitboardMove
+from Checkers.CheckersEngine import START_FEN
+
+log = logging.getLogger(__name__)
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '2-0', '0-2', '1-1', '*')
+TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+MOVE = re.compile(r'^(\d+)((?:[-x:]\d+)+)')
+LINE_WIDTH = 80
+
+INDEX_MAGIC = b'CKPI'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<4sB3xQ') #magic, version, entries
+INDEX_ENTRY = struct.Struct('<QQ') #position hash, offset of the game in the PDN file
+CHUNK_ENTRIES = 1 << 20 #index entries sorted in memory at a time, the rest wait in temporary files
+# Where a game without a FEN tag starts. PDN games start with black (the side on squares 1-12) to move, unlike the
+# engine's START_FEN where red moves first, so games written from the engine carry their own FEN tag
+PDN_START_FEN = "B:W21-32:B1-12"
+AMERICAN_GAME_TYPE = "21"
+
+
+class PdnError(Exception):
+    pass
+
+
+class PdnGame():
+    __slots__ = ('tags', 'moves', 'result', 'offset')
+
+    def __init__(self, tags=None, moves=None, result='*', offset=0):
+        self.tags = tags if tags is not None else {} #tag name -> value, in file order
+        self.moves = moves if moves is not None else [] #move text, e.g. "22-18" or "23x14x5"
+        self.result = result
+        self.offset = offset #byte offset of the game in the file it came from
+
+    def startFen(self):
+        return self.tags.get('FEN', PDN_START_FEN)
+
+    '''
+    Plays the game out on a BitboardState, yielding the state before each move and the move. Raises PdnError at the
+    first move that isn't legal
+    '''
+    def replay(self):
+        gs = BitboardState.fromFen(self.startFen())
+        for text in self.moves:
+            move = findPdnMove(gs, text)
+            yield gs, move
+            gs.makeMove(move)
+
+    '''
+    Hashes of the start position and the position after each move, the first plies moves only if plies is given
+    '''
+    def positions(self, plies=None):
+        gs = BitboardState.fromFen(self.startFen())
+        yield gs.zobristHash
+        for text in self.moves[:plies]:
+            gs.makeMove(findPdnMove(gs, text))
+            yield gs.zobristHash
+
+
+'''
+The squares (numbered 1-32) a move starts from, passes through and ends on, and the bitboard of pieces it jumps, for a
+CheckersEngine.Move or a BitboardMove
+'''
+def moveSquares(move):
+    if hasattr(move, 'captures'):
+        jumped = sum(1 << (r * 4 + c // 2) for (r, c) in move.captures)
+        return move.startRow * 4 + move.startCol // 2 + 1, move.endRow * 4 + move.endCol // 2 + 1, jumped
+    return move.fromSq + 1, move.toSq + 1, move.captured
+
+
+def squareRowCol(number):
+    r = (number - 1) // 4
+    return r, ((number - 1) % 4) * 2 + (1 if r % 2 == 0 else 0)
+
+
+'''
+The legal move of gs (a GameState or BitboardState) written as PDN. Short jumps ("23x5") match on their first and last
+square and raise PdnError when more than one jump does; when every landing square is given the pieces jumped have to
+match as well
+'''
+def findPdnMove(gs, text):
+    match = MOVE.match(text)
+    if match is None:
+        raise PdnError("not a move: %r" % text)
+    squares = [int(match.group(1))] + [int(s) for s in re.split(r'[-x:]', match.group(2))[1:]]
+    jump = 'x' in text or ':' in text
+    jumped = None
+    if len(squares) > 2:
+        jumped = 0
+        for first, second in zip(squares, squares[1:]):
+            (r1, c1), (r2, c2) = squareRowCol(first), squareRowCol(second)
+            jumped |= 1 << (((r1 + r2) // 2) * 4 + ((c1 + c2) // 2) // 2)
+    found = []
+    for move in gs.getValidMoves():
+        start, end, captured = moveSquares(move)
+        if start == squares[0] and end == squares[-1] and (captured != 0) == jump and \
+                (jumped is None or jumped == captured) and captured not in [moveSquares(m)[2] for m in found]:
+            found.append(move)
+    if len(found) == 0:
+        raise PdnError("illegal move %s in %s" % (text, gs.getFen()))
+    if len(found) > 1:
+        raise PdnError("ambiguous move %s in %s, it could be %s" % (
+            text, gs.getFen(), " or ".join(move.getPdnNotation() for move in found)))
+    return found[0]
+
+
+'''
+The games in a PDN file opened in binary mode, one at a time. Comments, variations, move numbers and annotations are
+skipped. Each game's offset is where its first line starts, so readGameAt can go straight back to it
+'''
+def readGames(f):
+    offset = f.tell()
+    game = None
+    inMoves = False
+    inComment = False #comments can run over several lines
+    depth = 0 #inside this many nested variations
+    for raw in f:
+        lineOffset = offset
+        offset += len(raw)
+        line = raw.decode('utf-8', 'replace').strip()
+        if depth == 0 and not inComment and line.startswith('['):
+            if inMoves: #tags after moves without a result start a new game
+                yield game
+                game, inMoves = None, False
+            if game is None:
+                game = PdnGame(offset=lineOffset)
+            for name, value in TAG.findall(line):
+                game.tags[name] = value.replace('\\"', '"')
+            continue
+        if len(line) == 0:
+            continue
+        if game is None:
+            game = PdnGame(offset=lineOffset)
+        inMoves = True
+        for token in tokenize(line):
+            if inComment:
+                inComment = token != '}'
+            elif token == '{':
+                inComment = True
+            elif token == '(':
+                depth += 1
+            elif token == ')':
+                depth = max(depth - 1, 0)
+            elif depth != 0:
+                continue
+            elif token in RESULTS:
+                game.result = token
+                yield game
+                game, inMoves = None, False
+            else:
+                match = MOVE.match(token)
+                if match is not None:
+                    game.moves.append(match.group(0))
+    if game is not None and (inMoves or len(game.tags) != 0):
+        yield game
+
+
+def tokenize(line):
+    return re.findall(r'[{}()]|[^\s{}()]+', line)
+
+
+def readGameAt(f, offset):
+    f.seek(offset)
+    return next(readGames(f), None)
+
+
+'''
+Writes one game. moves can be move objects (anything with getPdnNotation) or PDN strings. Without a FEN tag the
+game is taken to start from PDN_START_FEN, black to move
+'''
+def writeGame(out, moves, tags=None, result='*'):
+    tags = dict(tags or {})
+    tags.setdefault('Event', '?')
+    tags.setdefault('Result', result)
+    for name, value in tags.items():
+        out.write('[%s "%s"]\n' % (name, str(value).replace('"', '\\"')))
+    line = ""
+    whiteFirst = tags.get('FEN', PDN_START_FEN).strip().upper().startswith('W') #black's move opens a move number
+    for i, move in enumerate(moves):
+        text = move if isinstance(move, str) else move.getPdnNotation()
+        ply = i + (1 if whiteFirst else 0)
+        if ply % 2 == 0:
+            text = "%d. %s" % (ply // 2 + 1, text)
+        elif i == 0:
+            text = "%d... %s" % (ply // 2 + 1, text)
+        if len(line) + len(text) + 1 > LINE_WIDTH:
+            out.write(line + '\n')
+            line = ""
+        line = text if len(line) == 0 else line + ' ' + text
+    if len(line) + len(result) + 1 > LINE_WIDTH:
+        out.write(line + '\n')
+        line = ""
+    out.write((line + ' ' + result if line else result) + '\n\n')
+
+
+'''
+Sorted (position hash, game offset) pairs for every game in a PDN file, written to indexPath. Pairs are sorted a chunk
+at a time and the chunks merged from temporary files, so memory use doesn't grow with the collection. plies limits
+how far into each game positions are indexed. Returns (games, entries)
+'''
+def buildIndex(pdnPath, indexPath, plies=None):
+    chunks = []
+    entries = array('Q')
+    games = total = 0
+    with open(pdnPath, 'rb') as f, tempfile.TemporaryDirectory() as tmp:
+        for game in readGames(f):
+            games += 1
+            seen = set() #a position the game repeats is indexed once
+            try:
+                for key in game.positions(plies):
+                    seen.add(key)
+            except PdnError as e:
+                log.warning("game at offset %d: %s", game.offset, e)
+            for key in seen:
+                entries.append(key)
+                entries.append(game.offset)
+            if len(entries) >= 2 * CHUNK_ENTRIES:
+                chunks.append(writeChunk(tmp, len(chunks), entries))
+                entries = array('Q')
+        if len(entries) != 0 or len(chunks) == 0:
+            chunks.append(writeChunk(tmp, len(chunks), entries))
+        with open(indexPath, 'wb') as out:
+            out.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0))
+            for key, offset in heapq.merge(*[readChunk(path) for path in chunks]):
+                out.write(INDEX_ENTRY.pack(key, offset))
+                total += 1
+            out.seek(0)
+            out.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, total))
+    return games, total
+
+
+def writeChunk(directory, number, entries):
+    pairs = sorted(zip(entries[0::2], entries[1::2]))
+    path = os.path.join(directory, "chunk%d" % number)
+    with open(path, 'wb') as f:
+        for key, offset in pairs:
+            f.write(INDEX_ENTRY.pack(key, offset))
+    return path
+
+
+def readChunk(path):
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(INDEX_ENTRY.size * 4096)
+            if not data:
+                return
+            yield from INDEX_ENTRY.iter_unpack(data)
+
+
+'''
+Read only access to an index made by buildIndex
+'''
+class PositionIndex():
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.entries = INDEX_HEADER.unpack_from(self.mm, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or \
+                INDEX_HEADER.size + self.entries * INDEX_ENTRY.size > len(self.mm):
+            self.mm.close()
+            raise ValueError("%s is not a version %d position index" % (path, INDEX_VERSION))
+
+    def keyAt(self, i):
+        return struct.unpack_from('<Q', self.mm, INDEX_HEADER.size + i * INDEX_ENTRY.size)[0]
+
+    '''
+    Offsets of every game that reaches the position with this hash, in file order
+    '''
+    def gamesReaching(self, key):
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            if self.keyAt(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        offsets = []
+        while low < self.entries:
+            entryKey, offset = INDEX_ENTRY.unpack_from(self.mm, INDEX_HEADER.size + low * INDEX_ENTRY.size)
+            if entryKey != key:
+                break
+            offsets.append(offset)
+            low += 1
+        return offsets
+
+    def close(self):
+        self.mm.close()
+
+
+'''
+Turns CheckersSelfPlay JSONL records into PDN games
+'''
+def selfPlayToPdn(jsonlPath, out):
+    games = 0
+    with open(jsonlPath) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                result = {'red': '1-0', 'black': '0-1'}.get(record['result'], '1/2-1/2')
+                writeGame(out, [BitboardMove(move) for move in record['moves']],
+                          {'Event': 'self-play game %d' % record['game'], 'White': record['red'],
+                           'Black': record['black'], 'GameType': AMERICAN_GAME_TYPE, 'FEN': START_FEN,
+                           'Termination': record['reason']}, result)
+                games += 1
+    return games
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDN conversion, indexing and position search")
+    commands = parser.add_subparsers(dest='command', required=True)
+    index = commands.add_parser('index', help="index every position of a PDN file")
+    index.add_argument('pdn')
+    index.add_argument('index')
+    index.add_argument('--plies', type=int, default=None, help="only index this far into each game")
+    find = commands.add_parser('find', help="list the games that reach a position")
+    find.add_argument('pdn')
+    find.add_argument('index')
+    find.add_argument('fen')
+    convert = commands.add_parser('convert', help="write CheckersSelfPlay JSONL games as PDN")
+    convert.add_argument('jsonl')
+    convert.add_argument('pdn')
+    args = parser.parse_args(argv)
+
+    if args.command == 'index':
+        games, entries = buildIndex(args.pdn, args.index, args.plies)
+        print("%d games, %d positions indexed into %s" % (games, entries, args.index))
+    elif args.command == 'find':
+        positionIndex = PositionIndex(args.index)
+        offsets = positionIndex.gamesReaching(BitboardState.fromFen(args.fen).zobristHash)
+        with open(args.pdn, 'rb') as f:
+            for offset in offsets:
+                game = readGameAt(f, offset)
+                print("%10d  %s  %s vs %s  %s" % (offset, game.tags.get('Event', '?'), game.tags.get('White', '?'),
+                                                  game.tags.get('Black', '?'), game.result))
+        print("%d games" % len(offsets))
+        positionIndex.close()
+    else:
+        with open(args.pdn, 'w') as out:
+            games = selfPlayToPdn(args.jsonl, out)
+        print("%d games written to %s" % (games, args.pdn))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""
+Perft counts every position reachable in exactly depth moves, which checks the move generator, makeMove and undoMove
+against known numbers and measures how fast they are. Run it as python -m Checkers.CheckersPerft from the folder
+above Checkers, see --help for the options.
+"""
+import argparse
+import sys
+import time
+from Checkers import CheckersEngine, CheckersStats
+from Checkers.CheckersBitboard import BitboardState, newMoveBuffer, MAX_MOVES
+
+'''
+Reference positions and their node counts for depth 1, 2, 3, ... The start position numbers are the published American
+checkers perft results. The others were produced by BitboardState and checked against GameState; they cover multi-jumps,
+kings, and a king capturing round a loop, which has to count as one move however it goes round
+'''
+PERFT_SUITE = [
+    ("start", CheckersEngine.START_FEN,
+     [7, 49, 302, 1469, 7361, 36768, 179740, 845931, 3963680, 18391564]),
+    ("men middlegame", "B:W14,15,18,19,22,23,24,26,27,28,31:B1,2,3,5,6,9,10,11,12,16",
+     [1, 2, 13, 29, 142, 569, 2860]),
+    ("kings", "W:WK10,K14,22,23,27:BK18,K19,5,6,7",
+     [4, 10, 18, 94, 490, 2220, 11116]),
+    ("multi-jumps", "W:WK29,9,17,26:B10,11,13,14,18,19,21,22",
+     [4, 7, 23, 71, 146, 779, 1979]),
+    ("black kings", "B:W6,7,14,15,21,22,24:BK25,K28,11,12,19",
+     [2, 3, 13, 123, 553, 4098, 21022]),
+    ("king loop", "W:WK23,K30,5:BK2,10,11,18,19,26",
+     [1, 3, 17, 70, 248, 1024, 5675]),
+]
+
+'''
+Start position counts for the other rule sets, which only GameState plays. The international numbers are the published
+ones for 10x10 draughts
+'''
+VARIANT_PERFT_SUITE = [
+    ("russian", [7, 49, 302, 1469, 7482, 37986]),
+    ("international", [9, 81, 658, 4265, 27117, 167140]),
+]
+
+
+'''
+Perft through getValidMoves/makeMove/undoMove, works for any state
+'''
+def perft(gs, depth):
+    if depth == 0:
+        return 1
+    moves = gs.getValidMoves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+
+'''
+Perft through BitboardState.generateMoves and one preallocated move buffer, no move objects are created
+'''
+def perftBitboard(gs, depth, buffer=None, ply=0):
+    if depth == 0:
+        return 1
+    if buffer is None:
+        buffer = newMoveBuffer(depth)
+    start = ply * MAX_MOVES
+    end = gs.generateMoves(buffer, start)
+    if depth == 1:
+        return end - start
+    nodes = 0
+    for i in range(start, end):
+        gs.makeMove(buffer[i])
+        nodes += perftBitboard(gs, depth - 1, buffer, ply + 1)
+        gs.undoMove()
+    return nodes
+
+
+'''
+Node count below each root move, keyed by moveKey
+'''
+def divide(gs, depth):
+    counts = {}
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        counts[moveKey(move)] = perft(gs, depth - 1)
+        gs.undoMove()
+    return counts
+
+
+'''
+A name for a move that is the same for both engines: start and end square plus every square jumped
+'''
+def moveKey(move):
+    if hasattr(move, 'captures'):
+        half = move.boardSize // 2
+        jumped = sorted(r * half + c // 2 + 1 for (r, c) in move.captures)
+    else:
+        jumped = [sq + 1 for sq in range(32) if move.captured >> sq & 1]
+    key = move.getChessNotation()
+    return key + ('x' + ','.join(str(sq) for sq in jumped) if jumped else '')
+
+
+def makeState(engine, fen, variant=CheckersEngine.AMERICAN):
+    if engine == 'list':
+        return CheckersEngine.GameState.fromFen(fen, variant)
+    return BitboardState.fromFen(fen)
+
+
+'''
+Runs divide on both engines and follows the first root move whose counts differ down the tree, until it reaches a
+position where the move lists themselves differ. Returns the line of moves leading there and the two move lists, or
+None when the counts agree
+'''
+def findMismatch(fen, depth):
+    line = []
+    listState = makeState('list', fen)
+    bitState = makeState('bitboard', fen)
+    while depth > 0:
+        listCounts = divide(listState, depth)
+        bitCounts = divide(bitState, depth)
+        if set(listCounts) != set(bitCounts):
+            return line, sorted(listCounts), sorted(bitCounts)
+        differing = [key for key in sorted(listCounts) if listCounts[key] != bitCounts[key]]
+        if len(differing) == 0:
+            return None
+        key = differing[0]
+        listState.makeMove(next(m for m in listState.getValidMoves() if moveKey(m) == key))
+        bitState.makeMove(next(m for m in bitState.getValidMoves() if moveKey(m) == key))
+        line.append(key)
+        depth -= 1
+    return None
+
+
+def runSuite(engine, maxDepth, out=sys.stdout):
+    failures = 0
+    suite = [(name, fen, counts, CheckersEngine.AMERICAN) for name, fen, counts in PERFT_SUITE]
+    if engine == 'list':
+        for name, counts in VARIANT_PERFT_SUITE:
+            variant = CheckersEngine.VARIANTS[name]
+            suite.append((name, variant.startFen, counts, variant))
+    for name, fen, counts, variant in suite:
+        for depth in range(1, min(maxDepth, len(counts)) + 1):
+            gs = makeState(engine, fen, variant)
+            start = time.perf_counter()
+            nodes = perft(gs, depth) if engine == 'list' else perftBitboard(gs, depth)
+            elapsed = time.perf_counter() - start
+            ok = nodes == counts[depth - 1]
+            failures += 0 if ok else 1
+            print("%-16s depth %2d %10d %s %8.3fs %10.0f nodes/s" % (name, depth, nodes,
+                  "ok  " if ok else "FAIL (expected %d)" % counts[depth - 1], elapsed, nodes / max(elapsed, 1e-9)),
+                  file=out)
+    return failures
+
+
+'''
+Throughput of the pieces a search leans on: move generation alone, and make/undo pairs, for both engines
+'''
+def benchmark(fen, seconds=1.0, out=sys.stdout):
+    bitState = BitboardState.fromFen(fen)
+    listState = CheckersEngine.GameState.fromFen(fen)
+    buffer = newMoveBuffer()
+    tests = [("bitboard generateMoves", lambda: bitState.generateMoves(buffer, 0)),
+             ("bitboard getValidMoves", bitState.getValidMoves),
+             ("list getValidMoves", listState.getValidMoves)]
+    moves = bitState.getValidMoves()
+    listMoves = listState.getValidMoves()
+    if len(moves) != 0:
+        tests.append(("bitboard make+undo", lambda: (bitState.makeMove(moves[0]), bitState.undoMove())))
+        tests.append(("list make+undo", lambda: (listState.makeMove(listMoves[0]), listState.undoMove())))
+    for name, function in tests:
+        calls = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            for i in range(100):
+                function()
+            calls += 100
+        elapsed = time.perf_counter() - start
+        print("%-24s %12.0f calls/s" % (name, calls / elapsed), file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft node counts and move generator benchmarks")
+    parser.add_argument('--fen', default=None, help="position to count from, the variant's start position if not given")
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--engine', choices=['bitboard', 'list'], default='bitboard')
+    parser.add_argument('--variant', choices=sorted(CheckersEngine.VARIANTS), default='american',
+                        help="rules to count with, anything but american needs --engine list")
+    parser.add_argument('--divide', action='store_true', help="show the count below each root move")
+    parser.add_argument('--suite', action='store_true', help="check every reference position up to --depth")
+    parser.add_argument('--compare', action='store_true', help="find where GameState and BitboardState disagree")
+    parser.add_argument('--bench', action='store_true', help="measure move generation and make/undo speed")
+    CheckersStats.addArguments(parser)
+    args = parser.parse_args(argv)
+    with CheckersStats.configureFromArguments(args):
+        return run(args)
+
+
+def run(args):
+    variant = CheckersEngine.VARIANTS[args.variant]
+    if variant is not CheckersEngine.AMERICAN and args.engine != 'list':
+        print("BitboardState only plays American checkers, use --engine list for", variant.name, file=sys.stderr)
+        return 2
+    if args.fen is None:
+        args.fen = variant.startFen
+    if args.suite:
+        return 1 if runSuite(args.engine, args.depth) else 0
+    if args.compare:
+        mismatch = findMismatch(args.fen, args.depth)
+        if mismatch is None:
+            print("engines agree to depth", args.depth)
+            return 0
+        line, listMoves, bitMoves = mismatch
+        print("after", ' '.join(line) if line else "the root")
+        print("  GameState:     ", ' '.join(listMoves))
+        print("  BitboardState: ", ' '.join(bitMoves))
+        return 1
+    if args.bench:
+        benchmark(args.fen)
+        return 0
+
+    gs = makeState(args.engine, args.fen, variant)
+    start = time.perf_counter()
+    if args.divide:
+        counts = divide(gs, args.depth)
+        nodes = sum(counts.values())
+    else:
+        nodes = perftBitboard(gs, args.depth) if args.engine == 'bitboard' else perft(gs, args.depth)
+    elapsed = time.perf_counter() - start
+    if args.divide:
+        for key in sorted(counts):
+            print("%-20s %d" % (key, counts[key]))
+    print("depth %d: %d nodes in %.3fs, %.0f nodes/s" % (args.depth, nodes, elapsed, nodes / max(elapsed, 1e-9)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+The engine without the GUI. It reads commands one line at a time on stdin and answers on stdout, so a GUI, a tournament
+manager or any other program can run it as a subprocess. Nothing here imports pygame, and the transposition table is
+only made when the first search starts, so a new engine process is ready as soon as Python is. Run it as
+python -m Checkers.CheckersProtocol from the folder above Checkers.
+
+Moves are written in PDN with every square a jump lands on, e.g. 22-18 or 26x19x10, so two multi-jumps between the same
+squares read differently. A jump given by its first and last square only is accepted when no other jump matches it.
+
+Commands:
+    hello                                   -> id name ... / id protocol 1 / hellook
+    isready                                 -> readyok
+    newgame                                 start position, empty transposition table
+    position startpos [moves m1 m2 ...]
+    position fen <FEN> [moves m1 m2 ...]
+    go [depth N] [movetime MS] [nodes N] [wtime MS] [btime MS] [winc MS] [binc MS] [movestogo N] [infinite]
+                                            search on a background thread, prints info lines then bestmove. wtime
+                                            and winc are red's clock and increment, btime and binc black's
+    stop                                    ends the search early, its bestmove is still printed
+    setoption name <Hash|Book|Tablebase> value <v>
+    fen                                     -> fen <FEN of the current position>
+    moves                                   -> moves <legal moves>
+    quit
+"""
+import struct
+import sys
+import threading
+import time
+from Checkers import CheckersAI
+from Checkers.CheckersBitboard import BitboardState
+from Checkers.CheckersClock import SearchLimits, think
+from Checkers.CheckersEngine import START_FEN
+from Checkers.CheckersPdn import PdnError, findPdnMove
+
+ENGINE_NAME = "Checkers"
+PROTOCOL_VERSION = 2 #1 wrote moves as squares like c3d4
+INFINITE_DEPTH = 64 #depth for "go infinite", the search runs until stop
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class EngineProtocol():
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.outLock = threading.Lock() #the search thread writes info lines while the main thread answers commands
+        self.gs = BitboardState()
+        self.thread = None
+        self.stopEvent = None
+        self.commands = {'hello': self.hello, 'isready': self.isReady, 'newgame': self.newGame,
+                         'position': self.position, 'go': self.go, 'stop': self.stop, 'setoption': self.setOption,
+                         'fen': self.fen, 'moves': self.moves}
+
+    def send(self, line):
+        with self.outLock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    '''
+    Runs one command line, returns False once the engine should exit
+    '''
+    def handle(self, line):
+        words = line.split()
+        if len(words) == 0:
+            return True
+        if words[0] == 'quit':
+            self.stop()
+            return False
+        command = self.commands.get(words[0])
+        if command is None:
+            self.send("error unknown command %s" % words[0])
+            return True
+        try:
+            command(words[1:])
+        except (ProtocolError, ValueError, OSError, struct.error) as e: #OSError and struct.error from book files
+            self.send("error %s" % e)
+        return True
+
+    def run(self, lines):
+        for line in lines:
+            if not self.handle(line):
+                return
+        if self.thread is not None: #input ended, let the last search finish and print its move
+            self.thread.join()
+
+    def hello(self, words):
+        self.send("id name %s" % ENGINE_NAME)
+        self.send("id protocol %d" % PROTOCOL_VERSION)
+        self.send("hellook")
+
+    def isReady(self, words):
+        self.send("readyok")
+
+    def newGame(self, words):
+        self.stop()
+        self.gs = BitboardState()
+        CheckersAI.getTranspositionTable().clear()
+
+    def position(self, words):
+        self.stop()
+        if 'moves' in words:
+            split = words.index('moves')
+            words, moves = words[:split], words[split + 1:]
+        else:
+            moves = []
+        if words == ['startpos']:
+            fen = START_FEN
+        elif len(words) == 2 and words[0] == 'fen':
+            fen = words[1]
+        else:
+            raise ProtocolError("expected position startpos or position fen <FEN>")
+        gs = BitboardState.fromFen(fen)
+        for text in moves:
+            gs.makeMove(findMove(gs, text))
+        self.gs = gs
+
+    def go(self, words):
+        self.stop()
+        limits = SearchLimits()
+        clocks, increments = {}, {}
+        i = 0
+        while i < len(words):
+            if words[i] == 'infinite':
+                limits.depth = INFINITE_DEPTH
+                i += 1
+                continue
+            if i + 1 == len(words):
+                raise ProtocolError("unknown go option %s" % words[i])
+            name, value = words[i], int(words[i + 1])
+            if name == 'depth':
+                limits.depth = value
+            elif name == 'movetime':
+                limits.moveTime = value / 1000
+            elif name == 'nodes':
+                limits.nodes = value
+            elif name in ('wtime', 'btime'):
+                clocks[name[0]] = value / 1000
+            elif name in ('winc', 'binc'):
+                increments[name[0]] = value / 1000
+            elif name == 'movestogo':
+                limits.movesToGo = value
+            else:
+                raise ProtocolError("unknown go option %s" % name)
+            i += 2
+        side = 'w' if self.gs.redToMove else 'b'
+        if side in clocks:
+            limits.clock = clocks[side]
+            limits.increment = increments.get(side, 0.0)
+        self.stopEvent = threading.Event()
+        gs = self.gs.clone() #the search gets its own copy, position may change meanwhile
+        self.thread = threading.Thread(target=self.search, args=(gs, limits, self.stopEvent), daemon=True)
+        self.thread.start()
+
+    def search(self, gs, limits, stopEvent):
+        validMoves = gs.getValidMoves()
+        if len(validMoves) == 0:
+            self.send("bestmove (none)")
+            return
+        try:
+            pv = self.bestLine(gs, validMoves, limits, stopEvent)
+        except Exception as e: #whoever sent go waits for a bestmove, so there always is one
+            self.send("error search failed: %s" % e)
+            pv = [validMoves[0]]
+        line = "bestmove %s" % pv[0].getPdnNotation()
+        if len(pv) > 1:
+            line += " ponder %s" % pv[1].getPdnNotation()
+        self.send(line)
+
+    def bestLine(self, gs, validMoves, limits, stopEvent):
+        start = time.perf_counter()
+        def report(info):
+            self.send("info depth %d score %d nodes %d time %d pv %s" % (
+                info.depth, info.score, info.nodes, (time.perf_counter() - start) * 1000,
+                ' '.join(move.getPdnNotation() for move in info.pv)))
+        move = CheckersAI.bookMove(gs, validMoves)
+        if move is not None:
+            self.send("info book")
+            return [move]
+        return think(gs, validMoves, limits, stopEvent, onIteration=report).pv
+
+    '''
+    Stops a running search and waits for it to print its bestmove
+    '''
+    def stop(self, words=()):
+        if self.thread is not None:
+            self.stopEvent.set()
+            self.thread.join()
+            self.thread = None
+
+    def setOption(self, words):
+        if len(words) < 4 or words[0] != 'name' or 'value' not in words:
+            raise ProtocolError("expected setoption name <name> value <value>")
+        split = words.index('value')
+        name, value = ' '.join(words[1:split]), ' '.join(words[split + 1:])
+        self.stop()
+        if name == 'Hash':
+            CheckersAI.getTranspositionTable(int(value))
+        elif name == 'Book':
+            CheckersAI.setOpeningBook(value if value not in ('', 'none') else None)
+        elif name == 'Tablebase':
+            CheckersAI.setTablebase(value if value not in ('', 'none') else None)
+        else:
+            raise ProtocolError("unknown option %s" % name)
+
+    def fen(self, words):
+        self.send("fen %s" % self.gs.getFen())
+
+    def moves(self, words):
+        self.send("moves %s" % ' '.join(move.getPdnNotation() for move in self.gs.getValidMoves()))
+
+
+'''
+The legal move of gs written as text, see CheckersPdn.findPdnMove
+'''
+def findMove(gs, text):
+    try:
+        return findPdnMove(gs, text)
+    except PdnError as e:
+        raise ProtocolError(str(e))
+
+
+def main():
+    EngineProtocol().run(sys.stdin)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Headless self-play. Two CheckersAI strategies play each other for many games on BitboardState positions, spread over a
+process pool, with no pygame or display involved. Each finished game is written to a JSONL file as soon as it comes
+back, and the run ends with an Elo estimate and, when asked for, a sequential probability ratio test. Run it as
+python -m Checkers.CheckersSelfPlay from the folder above Checkers, see --help for the options.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Checkers import CheckersAI
+from Checkers.CheckersBitboard import BitboardState
+from Checkers.CheckersClock import SearchLimits, think
+
+MAX_PLIES = 300 #a game that gets this long is a draw
+QUIET_LIMIT = 80 #plies in a row without a capture or a man moving, after which the game is a draw (40 moves each)
+REPETITIONS = 3 #the same position this many times is a draw
+
+
+'''
+Every strategy takes (gs, validMoves, options) and returns (move, nodes searched). Options come from the player spec,
+so "negamax:depth=4,time=0.5" runs negaMax with depth 4 and half a second per move. negamax also takes nodes, a node
+budget per move that, unlike time, gives the same games on any machine
+'''
+def playRandom(gs, validMoves, options):
+    return CheckersAI.findRandomMove(validMoves), 0
+
+
+def playGreedy(gs, validMoves, options):
+    return CheckersAI.greedyAlgo(gs, validMoves), len(validMoves)
+
+
+def playMinMax(gs, validMoves, options):
+    return CheckersAI.findBestMove(gs, validMoves), 0
+
+
+def playNegaMax(gs, validMoves, options):
+    limits = SearchLimits(int(options['depth']) if 'depth' in options else None,
+                          float(options['time']) if 'time' in options else None,
+                          int(options['nodes']) if 'nodes' in options else None)
+    info = think(gs, validMoves, limits)
+    return info.pv[0], info.nodes
+
+
+STRATEGIES = {
+    'random': playRandom,
+    'greedy': playGreedy,
+    'minmax': playMinMax, #the fixed 2 ply CheckersAI.findBestMove
+    'negamax': playNegaMax,
+}
+
+
+'''
+"negamax:depth=4,time=0.5" -> ('negamax', {'depth': '4', 'time': '0.5'}). A bare number is taken as the depth
+'''
+def parsePlayer(spec):
+    name, _, rest = spec.partition(':')
+    if name not in STRATEGIES:
+        raise ValueError("unknown strategy %r, expected one of %s" % (name, ', '.join(sorted(STRATEGIES))))
+    options = {}
+    for item in rest.split(','):
+        if '=' in item:
+            key, value = item.split('=', 1)
+            options[key.strip()] = value.strip()
+        elif item.strip():
+            options['depth'] = item.strip()
+    return name, options
+
+
+'''
+Plays one game in a worker process and returns its record. The first randomPlies moves are random (from seed) so that
+deterministic strategies don't play the same game every time
+'''
+def playGame(game, redSpec, blackSpec, seed, randomPlies=0, maxPlies=MAX_PLIES):
+    random.seed(seed)
+    openingRandom = random.Random(seed)
+    CheckersAI.getTranspositionTable().clear() #every game starts from nothing, so results don't depend on scheduling
+    players = {True: parsePlayer(redSpec), False: parsePlayer(blackSpec)}
+    gs = BitboardState()
+    moves, times, nodes = [], [], []
+    seen = {gs.zobristHash: 1}
+    quietPlies = 0
+    result, reason = "draw", "move limit"
+    while len(moves) < maxPlies:
+        validMoves = gs.getValidMoves()
+        if len(validMoves) == 0:
+            result, reason = ("black" if gs.redToMove else "red"), "no moves"
+            break
+        start = time.perf_counter()
+        if len(moves) < randomPlies:
+            move, searched = openingRandom.choice(validMoves), 0
+        else:
+            name, options = players[gs.redToMove]
+            move, searched = STRATEGIES[name](gs, validMoves, options)
+            if move is None:
+                move = validMoves[0]
+        times.append(round(time.perf_counter() - start, 6))
+        nodes.append(searched)
+        movedMan = not (gs.kings >> move.fromSq) & 1
+        gs.makeMove(move)
+        moves.append(int(move))
+        quietPlies = 0 if move.captured or movedMan else quietPlies + 1
+        if quietPlies >= QUIET_LIMIT:
+            reason = "no progress"
+            break
+        seen[gs.zobristHash] = seen.get(gs.zobristHash, 0) + 1
+        if seen[gs.zobristHash] >= REPETITIONS:
+            reason = "repetition"
+            break
+    return {"game": game, "red": redSpec, "black": blackSpec, "seed": seed, "result": result, "reason": reason,
+            "plies": len(moves), "randomPlies": randomPlies, "moves": moves, "times": times, "nodes": nodes}
+
+
+'''
+Plays games between playerA and playerB, swapping colours every game, and yields each record as it finishes. Records
+get "redPlayer", "A" or "B" for the player that had red, since both players can have the same spec
+'''
+def runMatch(playerA, playerB, games, workers=None, seed=0, randomPlies=4, maxPlies=MAX_PLIES):
+    parsePlayer(playerA) #fail before starting any processes
+    parsePlayer(playerB)
+    executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    try:
+        futures = []
+        for game in range(games):
+            # each pair of games uses the same opening, once with each side on red
+            red, black = (playerA, playerB) if game % 2 == 0 else (playerB, playerA)
+            futures.append(executor.submit(playGame, game, red, black, seed + game // 2, randomPlies, maxPlies))
+        for future in as_completed(futures):
+            record = future.result()
+            record["redPlayer"] = "A" if record["game"] % 2 == 0 else "B"
+            yield record
+    finally:
+        executor.shutdown(cancel_futures=True) #games not started yet are dropped if the caller stops early
+
+
+'''
+Score of a runMatch game for player "A" or "B", 1 for a win, 0.5 for a draw, 0 for a loss
+'''
+def scoreFor(record, player):
+    if record["result"] == "draw":
+        return 0.5
+    return 1.0 if (record["result"] == "red") == (record["redPlayer"] == player) else 0.0
+
+
+class MatchStats():
+    def __init__(self, player, side="A"):
+        self.player = player #the name shown in the summary
+        self.side = side #"A" or "B", which of the runMatch players the stats are for
+        self.wins = self.draws = self.losses = 0
+
+    def add(self, record):
+        score = scoreFor(record, self.side)
+        if score == 1.0:
+            self.wins += 1
+        elif score == 0.5:
+            self.draws += 1
+        else:
+            self.losses += 1
+
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    '''
+    Mean score and the variance of a single game's score
+    '''
+    def scoreAndVariance(self):
+        n = self.games()
+        score = (self.wins + 0.5 * self.draws) / n
+        variance = (self.wins * (1 - score) ** 2 + self.draws * (0.5 - score) ** 2 + self.losses * score ** 2) / n
+        return score, variance
+
+    '''
+    Elo difference of the player over the opponent and the 95% error margin
+    '''
+    def elo(self):
+        n = self.games()
+        if n == 0:
+            return 0.0, 0.0
+        score, variance = self.scoreAndVariance()
+        margin = 1.96 * math.sqrt(variance / n)
+        low, high = eloFromScore(score - margin), eloFromScore(score + margin)
+        return eloFromScore(score), (high - low) / 2
+
+    '''
+    Log likelihood ratio of "the player is elo1 stronger" against "elo0 stronger", using the normal approximation.
+    The test passes when it climbs over upper, fails when it drops under lower, and needs more games in between
+    '''
+    def sprt(self, elo0, elo1, alpha=0.05, beta=0.05):
+        lower, upper = math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+        n = self.games()
+        if n == 0:
+            return 0.0, lower, upper
+        score, variance = self.scoreAndVariance()
+        if variance == 0:
+            return 0.0, lower, upper
+        s0, s1 = scoreFromElo(elo0), scoreFromElo(elo1)
+        llr = n * (s1 - s0) * (2 * score - s0 - s1) / (2 * variance)
+        return llr, lower, upper
+
+
+def eloFromScore(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def scoreFromElo(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def summary(stats, opponent, sprtBounds=None):
+    elo, margin = stats.elo()
+    text = "%s vs %s: +%d =%d -%d  Elo %+.1f +/- %.1f" % (stats.player, opponent, stats.wins, stats.draws,
+                                                          stats.losses, elo, margin)
+    if sprtBounds is not None:
+        llr, lower, upper = stats.sprt(*sprtBounds)
+        verdict = "H1 accepted" if llr >= upper else "H0 accepted" if llr <= lower else "continue"
+        text += "  SPRT(%g, %g) LLR %.2f [%.2f, %.2f] %s" % (sprtBounds[0], sprtBounds[1], llr, lower, upper, verdict)
+    return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless self-play between CheckersAI strategies")
+    parser.add_argument('playerA', help="e.g. negamax:depth=4 (strategies: %s)" % ', '.join(sorted(STRATEGIES)))
+    parser.add_argument('playerB')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--random-plies', type=int, default=4, help="random opening moves before the players start")
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES)
+    parser.add_argument('--out', default=None, help="JSONL file the game records are streamed to")
+    parser.add_argument('--sprt', type=float, nargs=2, metavar=('ELO0', 'ELO1'), default=None,
+                        help="stop early once an SPRT of playerA being ELO1 rather than ELO0 stronger is decided")
+    parser.add_argument('--report-every', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    stats = MatchStats(args.playerA)
+    out = open(args.out, 'a') if args.out else None
+    try:
+        for record in runMatch(args.playerA, args.playerB, args.games, args.workers, args.seed, args.random_plies,
+                               args.max_plies):
+            stats.add(record)
+            if out is not None:
+                out.write(json.dumps(record) + '\n')
+                out.flush()
+            if stats.games() % args.report_every == 0:
+                print(summary(stats, args.playerB, args.sprt), flush=True)
+            if args.sprt is not None:
+                llr, lower, upper = stats.sprt(*args.sprt)
+                if llr >= upper or llr <= lower:
+                    break
+    finally:
+        if out is not None:
+            out.close()
+    print(summary(stats, args.playerB, args.sprt))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
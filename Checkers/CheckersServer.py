@@ -0,0 +1,300 @@
+"""
+Game server. One asyncio process holds many human vs AI games at once; clients talk to it over TCP with one JSON
+object per line. Human moves are checked against getValidMoves, and AI turns go to a bounded process pool so searches
+use every core and a slow one never holds up the other games. Each game only keeps its position packed into a tuple
+plus its moves as packed ints, a full BitboardState is rebuilt just for the request that needs it. Run it as
+python -m Checkers.CheckersServer from the folder above Checkers, see --help for the options.
+
+Requests and replies (every reply has "ok", failures have "error" instead of the rest):
+    {"op": "new", "human": "red"|"black", "depth": 6, "time": 1.0}
+        -> {"ok": true, "game": id, "fen": ..., "moves": [...], "result": null, "ai": move or null}
+    {"op": "move", "game": id, "move": "22-18"}     the human's move, answered once the AI has replied. Moves are
+                                                    PDN with every square a jump lands on, e.g. 26x19x10
+    {"op": "state", "game": id}
+    {"op": "close", "game": id}
+    {"op": "stats"}
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from Checkers import CheckersAI
+from Checkers.CheckersBitboard import BitboardState, BitboardMove
+from Checkers.CheckersClock import SearchLimits, think
+from Checkers.CheckersProtocol import findMove, ProtocolError
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+MAX_GAMES = 10000
+MAX_TIME = 5.0 #seconds, the most a game may give the AI for one move
+GRACE = 2.0 #seconds past a game's time limit before its search is given up on
+IDLE_TIMEOUT = 1800 #seconds without a request after which a game is dropped
+MAX_LINE = 4096
+
+
+class ServerError(Exception):
+    pass
+
+
+'''
+Runs in a worker process: searches a packed position and returns the packed move and the node count. timeLimit is a
+hard limit, the search answers with the best move it has by then however far it got
+'''
+def searchMove(packedState, depth, timeLimit):
+    gs = BitboardState.unpack(packedState)
+    validMoves = gs.getValidMoves()
+    move = CheckersAI.bookMove(gs, validMoves)
+    if move is not None:
+        return int(move), 0
+    info = think(gs, validMoves, SearchLimits(depth=depth, moveTime=timeLimit))
+    return int(info.pv[0]), info.nodes
+
+
+class Session():
+    __slots__ = ('game', 'position', 'moves', 'humanRed', 'depth', 'timeLimit', 'busy', 'lastUsed')
+
+    def __init__(self, game, humanRed, depth, timeLimit):
+        self.game = game
+        self.position = BitboardState().pack() #(red, black, kings, redToMove)
+        self.moves = array('Q') #every move played, packed
+        self.humanRed = humanRed
+        self.depth = depth
+        self.timeLimit = timeLimit
+        self.busy = False #a request for this game is being handled
+        self.lastUsed = time.monotonic()
+
+    def state(self):
+        return BitboardState.unpack(self.position)
+
+    def play(self, gs, move):
+        gs.makeMove(move)
+        self.moves.append(int(move))
+        self.position = gs.pack()
+
+    def aiToMove(self):
+        return self.position[3] != self.humanRed
+
+
+class GameServer():
+    def __init__(self, workers=None, depth=CheckersAI.DEPTH, maxGames=MAX_GAMES, maxWaiting=None, maxTime=MAX_TIME):
+        self.workers = workers or os.cpu_count() or 1
+        self.depth = depth
+        self.maxGames = maxGames
+        self.maxWaiting = maxWaiting if maxWaiting is not None else 4 * self.workers
+        self.maxTime = maxTime
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.searchSlots = None #asyncio.Semaphore, made on the event loop by start
+        self.sessions = {}
+        self.gameIds = itertools.count(1)
+        self.waiting = 0 #AI turns queued or running
+        self.searches = 0
+        self.rejected = 0
+        self.clients = {} #task serving each connection -> its writer
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.searchSlots = asyncio.Semaphore(self.workers)
+        self.server = await asyncio.start_server(self.serveClient, host, port, limit=MAX_LINE)
+        self.reaper = asyncio.create_task(self.dropIdleGames())
+        log.info("serving on %s", ', '.join(str(s.getsockname()) for s in self.server.sockets))
+        return self.server
+
+    async def close(self):
+        self.reaper.cancel()
+        self.server.close()
+        for writer in self.clients.values():
+            writer.close() #their readline sees the end of the stream and the tasks finish
+        await asyncio.gather(*self.clients, return_exceptions=True)
+        await self.server.wait_closed()
+        self.pool.shutdown(cancel_futures=True)
+
+    async def serveClient(self, reader, writer):
+        task = asyncio.current_task()
+        self.clients[task] = writer
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write(b'{"ok": false, "error": "request too long"}\n')
+                    break
+                if not line:
+                    break
+                reply = await self.handle(line)
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain() #a client that stops reading stops being served instead of filling memory
+        except ConnectionError:
+            pass
+        finally:
+            del self.clients[task]
+            writer.close()
+
+    async def handle(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ServerError("expected a JSON object")
+            op = request.get('op')
+            if op == 'new':
+                return await self.newGame(request)
+            if op == 'move':
+                return await self.move(request)
+            if op == 'state':
+                return self.reply(self.session(request))
+            if op == 'close':
+                self.sessions.pop(self.session(request).game, None)
+                return {"ok": True}
+            if op == 'stats':
+                return {"ok": True, "games": len(self.sessions), "waiting": self.waiting, "searches": self.searches,
+                        "rejected": self.rejected, "workers": self.workers}
+            raise ServerError("unknown op %r" % op)
+        except (ServerError, ProtocolError, ValueError, TypeError) as e:
+            return {"ok": False, "error": str(e)}
+
+    def session(self, request):
+        session = self.sessions.get(request.get('game'))
+        if session is None:
+            raise ServerError("no game %r" % request.get('game'))
+        session.lastUsed = time.monotonic()
+        return session
+
+    async def newGame(self, request):
+        if len(self.sessions) >= self.maxGames:
+            raise ServerError("too many games")
+        self.checkCapacity()
+        human = request.get('human', 'red')
+        if human not in ('red', 'black'):
+            raise ServerError("human must be red or black")
+        depth = min(int(request.get('depth', self.depth)), CheckersAI.MAX_PLY)
+        if depth < 1:
+            raise ServerError("depth must be at least 1")
+        timeLimit = float(request.get('time', self.maxTime))
+        if not timeLimit > 0: #also false for NaN
+            raise ServerError("time must be a positive number of seconds")
+        timeLimit = min(timeLimit, self.maxTime)
+        session = Session(next(self.gameIds), human == 'red', depth, timeLimit)
+        self.sessions[session.game] = session
+        return await self.runTurn(session, None)
+
+    async def move(self, request):
+        session = self.session(request)
+        if session.busy:
+            raise ServerError("the last request for this game isn't finished")
+        if session.aiToMove():
+            raise ServerError("it is not your move")
+        self.checkCapacity()
+        gs = session.state()
+        session.play(gs, findMove(gs, str(request.get('move'))))
+        return await self.runTurn(session, gs)
+
+    '''
+    Lets the AI move if it is its turn and answers with the game's state
+    '''
+    async def runTurn(self, session, gs):
+        aiMove = None
+        if session.aiToMove():
+            gs = gs or session.state()
+            if len(gs.getValidMoves()) != 0:
+                aiMove = await self.search(session)
+                session.play(gs, aiMove)
+        return self.reply(session, aiMove, gs)
+
+    '''
+    Backpressure: with too many AI turns already queued a request is refused before it changes anything, and the
+    client can send it again later
+    '''
+    def checkCapacity(self):
+        if self.waiting >= self.maxWaiting:
+            self.rejected += 1
+            raise ServerError("server busy, try again")
+
+    async def search(self, session):
+        self.waiting += 1
+        session.busy = True
+        try:
+            await self.searchSlots.acquire() #at most one search per worker is handed to the pool, the rest wait here
+            loop = asyncio.get_running_loop()
+            try:
+                future = loop.run_in_executor(self.pool, searchMove, session.position, session.depth,
+                                              session.timeLimit)
+            except Exception: #the pool is broken or shut down, nothing will ever release the slot
+                self.searchSlots.release()
+                raise
+            future.add_done_callback(self.searchDone)
+            # shielded, giving up on a search mustn't free its slot while the worker is still busy with it
+            move, nodes = await asyncio.wait_for(asyncio.shield(future), session.timeLimit + GRACE)
+            self.searches += 1
+            log.debug("game %d searched %d nodes", session.game, nodes)
+            return BitboardMove(move)
+        except asyncio.TimeoutError:
+            log.warning("game %d search ran over its time, playing the first legal move", session.game)
+            return session.state().getValidMoves()[0]
+        except Exception: #the game mustn't be left with the AI to move and nobody to move for it
+            log.exception("game %d search failed, playing the first legal move", session.game)
+            return session.state().getValidMoves()[0]
+        finally:
+            self.waiting -= 1
+            session.busy = False
+
+    '''
+    Called when a search handed to the pool ends, even one nobody waits for any more
+    '''
+    def searchDone(self, future):
+        self.searchSlots.release()
+        if not future.cancelled():
+            future.exception() #retrieved so asyncio doesn't report it, search logs the failures it waits for
+
+    def reply(self, session, aiMove=None, gs=None):
+        gs = gs or session.state()
+        validMoves = gs.getValidMoves()
+        result = None
+        if len(validMoves) == 0:
+            result = "black" if gs.redToMove else "red"
+        return {"ok": True, "game": session.game, "fen": gs.getFen(),
+                "moves": [move.getPdnNotation() for move in validMoves],
+                "ai": aiMove.getPdnNotation() if aiMove is not None else None, "result": result}
+
+    async def dropIdleGames(self):
+        while True:
+            await asyncio.sleep(IDLE_TIMEOUT / 10)
+            cutoff = time.monotonic() - IDLE_TIMEOUT
+            for game in [game for game, s in self.sessions.items() if s.lastUsed < cutoff and not s.busy]:
+                del self.sessions[game]
+
+
+async def serve(args):
+    server = GameServer(args.workers, args.depth, args.max_games, args.max_waiting, args.max_time)
+    await server.start(args.host, args.port)
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve many human vs AI checkers games over TCP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None, help="search processes, default one per core")
+    parser.add_argument('--depth', type=int, default=CheckersAI.DEPTH)
+    parser.add_argument('--max-games', type=int, default=MAX_GAMES)
+    parser.add_argument('--max-waiting', type=int, default=None, help="AI turns queued at once before new ones are "
+                                                                      "refused, default 4 per worker")
+    parser.add_argument('--max-time', type=float, default=MAX_TIME, help="longest time limit a game may ask for")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
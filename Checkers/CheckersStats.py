@@ -0,0 +1,210 @@
+"""
+Instrumentation for the engine. Every module logs through its own logging.getLogger(__name__) logger, all under the
+"Checkers" logger, and nothing is shown until logging is configured. Counters for move generation, make/undo and
+evaluations work by wrapping those methods while they are switched on, so when they are off the engine runs its own
+unwrapped code and pays nothing. Timers and cProfile can be put around any block. The command line tools switch all of
+this on with --log, --counters and --profile (see addArguments), CheckersMain reads the same settings from the
+CHECKERS_LOG, CHECKERS_COUNTERS and CHECKERS_PROFILE environment variables.
+"""
+import contextlib
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import time
+
+log = logging.getLogger(__name__)
+
+
+class Counters():
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.moveGenCalls = 0
+        self.movesGenerated = 0
+        self.makeMoves = 0
+        self.undoMoves = 0
+        self.evals = 0
+        self.timers = {} #name -> [calls, seconds]
+
+    def report(self):
+        lines = ["move generation calls %d, moves generated %d, makeMove %d, undoMove %d, evaluations %d" % (
+            self.moveGenCalls, self.movesGenerated, self.makeMoves, self.undoMoves, self.evals)]
+        for name in sorted(self.timers):
+            calls, seconds = self.timers[name]
+            lines.append("%-24s %8d calls %10.3fs" % (name, calls, seconds))
+        return '\n'.join(lines)
+
+
+counters = Counters()
+originals = [] #(owner, attribute name, original) for everything enableCounters replaced
+
+
+'''
+Wrappers that count calls and then run the original
+'''
+def countValidMoves(original):
+    def getValidMoves(self):
+        moves = original(self)
+        counters.moveGenCalls += 1
+        counters.movesGenerated += len(moves)
+        return moves
+    return getValidMoves
+
+
+def countGenerateMoves(original):
+    def generateMoves(self, buffer, start):
+        end = original(self, buffer, start)
+        counters.moveGenCalls += 1
+        counters.movesGenerated += end - start
+        return end
+    return generateMoves
+
+
+def countMakeMove(original):
+    def makeMove(self, move):
+        counters.makeMoves += 1
+        return original(self, move)
+    return makeMove
+
+
+def countUndoMove(original):
+    def undoMove(self):
+        counters.undoMoves += 1
+        return original(self)
+    return undoMove
+
+
+def countScoreBoard(original):
+    def scoreBoard(gs):
+        counters.evals += 1
+        return original(gs)
+    return scoreBoard
+
+
+'''
+Starts counting in this process. Worker processes (CheckersParallel, CheckersSelfPlay) keep their own counts
+'''
+def enableCounters():
+    if len(originals) != 0:
+        return
+    from Checkers import CheckersAI
+    from Checkers.CheckersBitboard import BitboardState
+    from Checkers.CheckersEngine import GameState
+    # BitboardState.getValidMoves goes through generateMoves, so only the latter is counted
+    for owner, name, wrapper in ((GameState, 'getValidMoves', countValidMoves),
+                                 (GameState, 'makeMove', countMakeMove),
+                                 (GameState, 'undoMove', countUndoMove),
+                                 (BitboardState, 'generateMoves', countGenerateMoves),
+                                 (BitboardState, 'makeMove', countMakeMove),
+                                 (BitboardState, 'undoMove', countUndoMove),
+                                 (CheckersAI, 'scoreBoard', countScoreBoard)):
+        original = getattr(owner, name)
+        originals.append((owner, name, original))
+        setattr(owner, name, wrapper(original))
+    log.debug("counters on")
+
+
+'''
+Puts the original methods back, the counts are kept until counters.reset()
+'''
+def disableCounters():
+    while len(originals) != 0:
+        owner, name, original = originals.pop()
+        setattr(owner, name, original)
+    log.debug("counters off")
+
+
+def countersEnabled():
+    return len(originals) != 0
+
+
+'''
+Adds the time spent in the block to the named timer
+'''
+@contextlib.contextmanager
+def timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer = counters.timers.setdefault(name, [0, 0.0])
+        timer[0] += 1
+        timer[1] += time.perf_counter() - start
+
+
+'''
+Runs the block under cProfile. The statistics are written to path if one is given, otherwise the top entries by
+cumulative time are printed to out
+'''
+@contextlib.contextmanager
+def profiled(path=None, out=sys.stderr, limit=25):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path is not None:
+            profiler.dump_stats(path)
+            log.info("profile written to %s", path)
+        else:
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+
+
+'''
+Shows the "Checkers" loggers at level (a name like "debug" or a number) on stderr
+'''
+def setLogLevel(level):
+    logger = logging.getLogger("Checkers")
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    logger.setLevel(level)
+    if not any(getattr(handler, 'checkersHandler', False) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(relativeCreated)8.0fms %(name)s %(levelname)s %(message)s"))
+        handler.checkersHandler = True
+        logger.addHandler(handler)
+
+
+'''
+The options every command line tool shares
+'''
+def addArguments(parser):
+    parser.add_argument('--log', default=None, metavar='LEVEL', help="show engine logging, e.g. info or debug")
+    parser.add_argument('--counters', action='store_true', help="count move generation, make/undo and evaluations")
+    parser.add_argument('--profile', default=None, metavar='FILE', help="run under cProfile, '-' prints the top "
+                                                                        "entries instead of writing FILE")
+
+
+'''
+Turns on what the options from addArguments ask for. Returns a context manager for the run: it profiles when asked to
+and prints the counters at the end
+'''
+def configure(logLevel=None, countCalls=False, profilePath=None):
+    if logLevel:
+        setLogLevel(logLevel)
+    if countCalls:
+        enableCounters()
+    return instrumentedRun(countCalls, profilePath)
+
+
+def configureFromArguments(args):
+    return configure(args.log, args.counters, args.profile)
+
+
+def configureFromEnvironment():
+    return configure(os.environ.get('CHECKERS_LOG'), bool(os.environ.get('CHECKERS_COUNTERS')),
+                     os.environ.get('CHECKERS_PROFILE'))
+
+
+@contextlib.contextmanager
+def instrumentedRun(showCounters, profile, out=sys.stderr):
+    with profiled(None if profile == '-' else profile, out) if profile else contextlib.nullcontext():
+        try:
+            yield
+        finally:
+            if showCounters:
+                print(counters.report(), file=out)
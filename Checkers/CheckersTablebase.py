@@ -0,0 +1,340 @@
+"""
+Endgame tablebases. For every material balance up to a few pieces (red men, red kings, black men, black kings) the
+generator works out by retrograde analysis whether each position is a win, loss or draw for the side to move, and how
+many plies the game lasts with best play. Each balance is written to its own file, two bits of win/loss/draw per
+position plus an optional byte of distance. Probing memory-maps the files, so every search process on a machine shares
+one copy in the page cache instead of loading its own. Run python -m Checkers.CheckersTablebase from the folder above
+Checkers to build them, see --help for the options.
+
+The generator is pure Python and meant for small endings: every table up to three pieces takes about 20 seconds, four
+pieces 20 to 100 seconds for each balance, and five or more is out of reach.
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from itertools import combinations
+from math import comb
+from Checkers.CheckersBitboard import BitboardState, newMoveBuffer, RED_KING_ROW, BLACK_KING_ROW
+
+DRAW = 0
+WIN = 1
+LOSS = 2
+ILLEGAL = 3 #a man standing on the row it should have been crowned on
+UNKNOWN = DRAW #while generating, anything not resolved by the end is a draw
+MAX_DISTANCE = 255 #longest distance a table can hold, longer ones are stored as this
+NO_WIN = 1 << 16 #more than any distance, the quickest win of a position no winning move has been found for
+
+MAGIC = b'CKTB'
+VERSION = 1
+HEADER = struct.Struct('<4sBBBBBBxxQ12x') #magic, version, red men, red kings, black men, black kings, flags, entries
+HAS_DISTANCE = 1
+
+
+def popcount(bb):
+    return bin(bb).count('1')
+
+
+'''
+Material balance of a position as (red men, red kings, black men, black kings)
+'''
+def signatureOf(red, black, kings):
+    return popcount(red & ~kings), popcount(red & kings), popcount(black & ~kings), popcount(black & kings)
+
+
+def fileName(signature):
+    return "%d%d%d%d.ctb" % signature
+
+
+'''
+Number of positions (one side to move) for a balance: the red men, red kings, black men and black kings are each a
+combination of the squares the earlier groups left free
+'''
+def positionCount(signature):
+    count, free = 1, 32
+    for n in signature:
+        count *= comb(free, n)
+        free -= n
+    return count
+
+
+'''
+Index of a position within its balance's table. Each group of squares is ranked as a combination (colex order) of the
+squares the earlier groups left free, and the ranks are combined like the digits of a mixed-radix number. Even
+indexes are red to move, odd ones black
+'''
+def positionIndex(signature, red, black, kings, redToMove):
+    index, free, used = 0, 32, 0
+    for group, n in zip((red & ~kings, red & kings, black & ~kings, black & kings), signature):
+        rank, i = 0, 0
+        bits = group
+        while bits:
+            low = bits & -bits
+            bits ^= low
+            sq = low.bit_length() - 1
+            i += 1
+            rank += comb(sq - popcount(used & (low - 1)), i)
+        index = index * comb(free, n) + rank
+        free -= n
+        used |= group
+    return index * 2 + (0 if redToMove else 1)
+
+
+'''
+Every position of a balance as (red, black, kings) bitboards, in no particular order
+'''
+def positionsOf(signature):
+    redMen, redKings, blackMen, blackKings = signature
+    allSquares = range(32)
+    for rm in combinations(allSquares, redMen):
+        rmBits = sum(1 << sq for sq in rm)
+        rest = [sq for sq in allSquares if not rmBits >> sq & 1]
+        for rk in combinations(rest, redKings):
+            rkBits = sum(1 << sq for sq in rk)
+            rest2 = [sq for sq in rest if not rkBits >> sq & 1]
+            for bm in combinations(rest2, blackMen):
+                bmBits = sum(1 << sq for sq in bm)
+                rest3 = [sq for sq in rest2 if not bmBits >> sq & 1]
+                for bk in combinations(rest3, blackKings):
+                    bkBits = sum(1 << sq for sq in bk)
+                    yield rmBits | rkBits, bmBits | bkBits, rkBits | bkBits
+
+
+'''
+Every balance with at least one piece a side and at most maxPieces in total, in the order they have to be built: a
+capture leads to a balance with fewer pieces and a crowning to one with fewer men, so both are built first
+'''
+def signaturesUpTo(maxPieces):
+    signatures = []
+    for total in range(2, maxPieces + 1):
+        for redMen in range(total + 1):
+            for redKings in range(total - redMen + 1):
+                for blackMen in range(total - redMen - redKings + 1):
+                    blackKings = total - redMen - redKings - blackMen
+                    if redMen + redKings > 0 and blackMen + blackKings > 0:
+                        signatures.append((redMen, redKings, blackMen, blackKings))
+    signatures.sort(key=lambda s: (sum(s), s[0] + s[2]))
+    return signatures
+
+
+'''
+Builds one balance's table. probeOther(signature, index) gives (value, distance) in a table already built. Returns the
+values and distances as bytearrays indexed by positionIndex
+'''
+def generateTable(signature, probeOther):
+    size = positionCount(signature) * 2
+    values = bytearray(size)
+    distances = bytearray(size)
+    # moves that stay in this balance, as a flat list of successor indexes with each position's slice in offsets
+    successors = array('I')
+    pending = [] #(index, start of its successors, end, best win found outside, worst win outside, draw outside)
+    gs = BitboardState(0, 0, 0, True)
+    buffer = newMoveBuffer()
+    for red, black, kings in positionsOf(signature):
+        if red & ~kings & RED_KING_ROW or black & ~kings & BLACK_KING_ROW:
+            for side in (0, 1):
+                values[positionIndex(signature, red, black, kings, side == 0)] = ILLEGAL
+            continue
+        for redToMove in (True, False):
+            index = positionIndex(signature, red, black, kings, redToMove)
+            gs.red, gs.black, gs.kings, gs.redToMove = red, black, kings, redToMove
+            end = gs.generateMoves(buffer, 0)
+            if end == 0:
+                values[index] = LOSS
+                continue
+            start = len(successors)
+            bestWin, worstWin, drawOutside = NO_WIN, 0, False
+            for i in range(end):
+                gs.makeMove(buffer[i])
+                nextSignature = signatureOf(gs.red, gs.black, gs.kings)
+                if gs.redToMove and gs.red == 0 or not gs.redToMove and gs.black == 0:
+                    value, distance = LOSS, 0 #that move took the last piece
+                elif nextSignature == signature:
+                    successors.append(positionIndex(signature, gs.red, gs.black, gs.kings, gs.redToMove))
+                    value = None
+                else:
+                    value, distance = probeOther(nextSignature,
+                                                 positionIndex(nextSignature, gs.red, gs.black, gs.kings, gs.redToMove))
+                gs.undoMove()
+                if value == LOSS:
+                    bestWin = min(bestWin, distance + 1)
+                elif value == WIN:
+                    worstWin = max(worstWin, distance + 1)
+                elif value == DRAW:
+                    drawOutside = True
+            pending.append((index, start, len(successors), bestWin, worstWin, drawOutside))
+
+    # each pass settles the positions whose result follows from the ones settled before it
+    while pending:
+        settled, stillPending = [], []
+        for entry in pending:
+            index, start, end, bestWin, worstWin, drawOutside = entry
+            allWins = not drawOutside
+            for i in range(start, end):
+                successor = successors[i]
+                value = values[successor]
+                if value == LOSS:
+                    bestWin = min(bestWin, distances[successor] + 1)
+                elif value == WIN:
+                    worstWin = max(worstWin, distances[successor] + 1)
+                else:
+                    allWins = False
+            if bestWin != NO_WIN: #a win too long for the table is still a win, its distance is capped
+                settled.append((index, WIN, min(bestWin, MAX_DISTANCE)))
+            elif allWins:
+                settled.append((index, LOSS, min(worstWin, MAX_DISTANCE)))
+            else:
+                stillPending.append(entry)
+        if len(settled) == 0:
+            break #everything left is a draw
+        for index, value, distance in settled:
+            values[index] = value
+            distances[index] = distance
+        pending = stillPending
+    return values, distances
+
+
+def writeTable(path, signature, values, distances=None):
+    packed = bytearray((len(values) + 3) // 4)
+    for i in range(len(values)):
+        packed[i >> 2] |= values[i] << ((i & 3) * 2)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, *signature, HAS_DISTANCE if distances is not None else 0, len(values)))
+        f.write(packed)
+        if distances is not None:
+            f.write(distances)
+
+
+'''
+Builds every table up to maxPieces into directory, skipping ones already there
+'''
+def generate(directory, maxPieces, withDistance=True, out=sys.stdout):
+    os.makedirs(directory, exist_ok=True)
+    tablebase = Tablebase(directory)
+    built = {}
+
+    def probeOther(signature, index):
+        if signature in built:
+            values, distances = built[signature]
+            return values[index], distances[index]
+        return tablebase.probeIndex(signature, index)
+
+    for signature in signaturesUpTo(maxPieces):
+        path = os.path.join(directory, fileName(signature))
+        if os.path.exists(path):
+            continue
+        start = time.time()
+        values, distances = generateTable(signature, probeOther)
+        writeTable(path, signature, values, distances if withDistance else None)
+        built[signature] = (values, distances)
+        print("%s %9d positions %6.1fs  win %d loss %d draw %d" % (
+            fileName(signature), len(values), time.time() - start, values.count(WIN), values.count(LOSS),
+            values.count(DRAW)), file=out, flush=True)
+    tablebase.close()
+
+
+'''
+Read only access to the tables in a directory. Files are memory-mapped the first time they are needed
+'''
+class Tablebase():
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = {} #signature -> (mmap, has distances, entries), or None when there is no such file
+        self.maxPieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith('.ctb') and len(name) == 8 and name[:4].isdigit():
+                    self.maxPieces = max(self.maxPieces, sum(int(ch) for ch in name[:4]))
+
+    def table(self, signature):
+        if signature not in self.tables:
+            path = os.path.join(self.directory, fileName(signature))
+            if not os.path.exists(path):
+                self.tables[signature] = None
+            else:
+                with open(path, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, version, rm, rk, bm, bk, flags, entries = HEADER.unpack_from(mm, 0)
+                if magic != MAGIC or version != VERSION or (rm, rk, bm, bk) != signature:
+                    mm.close()
+                    raise ValueError("%s is not a version %d table for %s" % (path, VERSION, signature))
+                self.tables[signature] = (mm, bool(flags & HAS_DISTANCE), entries)
+        return self.tables[signature]
+
+    '''
+    (value, distance) for an index of a balance's table, distance is 0 when the table has none
+    '''
+    def probeIndex(self, signature, index):
+        table = self.table(signature)
+        if table is None:
+            raise KeyError("no tablebase file for %s" % (signature,))
+        mm, hasDistance, entries = table
+        value = (mm[HEADER.size + (index >> 2)] >> ((index & 3) * 2)) & 3
+        distance = mm[HEADER.size + (entries + 3) // 4 + index] if hasDistance else 0
+        return value, distance
+
+    '''
+    (WIN/LOSS/DRAW for the side to move, plies to the end) for a BitboardState, or None if it isn't covered
+    '''
+    def probe(self, gs):
+        if gs.red == 0 or gs.black == 0:
+            return None
+        if popcount(gs.red | gs.black) > self.maxPieces:
+            return None
+        signature = signatureOf(gs.red, gs.black, gs.kings)
+        if self.table(signature) is None:
+            return None
+        value, distance = self.probeIndex(signature, positionIndex(signature, gs.red, gs.black, gs.kings,
+                                                                   gs.redToMove))
+        return None if value == ILLEGAL else (value, distance)
+
+    '''
+    The move that keeps the best result: the quickest win, the longest loss, or any move that holds a draw
+    '''
+    def bestMove(self, gs):
+        best, bestKey = None, None
+        for move in gs.getValidMoves():
+            gs.makeMove(move)
+            if gs.red == 0 or gs.black == 0:
+                key = (0, 0)
+            else:
+                result = self.probe(gs)
+                if result is None:
+                    gs.undoMove()
+                    return None
+                value, distance = result
+                key = (0, distance) if value == LOSS else (1, 0) if value == DRAW else (2, -distance)
+            gs.undoMove()
+            if bestKey is None or key < bestKey:
+                best, bestKey = move, key
+        return best
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table[0].close()
+        self.tables = {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build checkers endgame tablebases")
+    parser.add_argument('directory')
+    parser.add_argument('--pieces', type=int, default=3, help="largest number of pieces on the board, 4 takes "
+                                                               "half an hour or more")
+    parser.add_argument('--no-distance', action='store_true', help="only store win/loss/draw")
+    parser.add_argument('--probe', default=None, metavar='FEN', help="look a position up instead of building")
+    args = parser.parse_args(argv)
+    if args.probe:
+        result = Tablebase(args.directory).probe(BitboardState.fromFen(args.probe))
+        print("not in the tablebase" if result is None else
+              "%s in %d plies" % (("draw", "win", "loss")[result[0]], result[1]))
+        return 0
+    generate(args.directory, args.pieces, not args.no_distance)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""
+A fixed size transposition table for the CheckersAI search. It remembers, for positions already searched, how deep
+they were searched, the score, whether that score is exact or only a bound, and the best move. Entries live in flat
+arrays sized from a memory cap, so the table never grows no matter how long a bot process runs.
+"""
+from array import array
+
+EXACT = 0
+LOWER = 1  # the search failed high, the real score is at least this
+UPPER = 2  # the search failed low, the real score is at most this
+NO_MOVE = -1
+ENTRY_BYTES = 8 + 4 + 8 + 1 + 1 + 1  # key, score, move, depth, bound, age
+DEFAULT_SIZE_MB = 16
+
+
+class TranspositionTable():
+    def __init__(self, sizeMB=DEFAULT_SIZE_MB):
+        self.sizeMB = sizeMB
+        # entries come in buckets of two: slot 0 keeps the deepest result, slot 1 always takes the newest
+        self.buckets = max(1, int(sizeMB * 1024 * 1024) // (2 * ENTRY_BYTES))
+        size = 2 * self.buckets
+        self.keys = array('Q', [0]) * size
+        self.scores = array('i', [0]) * size
+        self.moves = array('q', [NO_MOVE]) * size
+        self.depths = array('b', [-1]) * size
+        self.bounds = array('B', [0]) * size
+        self.ages = array('B', [0]) * size
+        self.age = 0
+        self.hits = 0
+        self.stores = 0
+
+    '''
+    Called at the start of every search. Entries from older searches are still used but are the first to be replaced
+    '''
+    def newSearch(self):
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        size = len(self.keys)
+        self.keys = array('Q', [0]) * size
+        self.depths = array('b', [-1]) * size
+        self.moves = array('q', [NO_MOVE]) * size
+
+    '''
+    Returns the slot holding key or None
+    '''
+    def probe(self, key):
+        i = (key % self.buckets) << 1
+        if self.keys[i] == key and self.depths[i] >= 0:
+            self.hits += 1
+            return i
+        if self.keys[i + 1] == key and self.depths[i + 1] >= 0:
+            self.hits += 1
+            return i + 1
+        return None
+
+    def store(self, key, depth, bound, score, moveID):
+        i = (key % self.buckets) << 1
+        # the deep slot is replaced by the same position, a deeper search, or anything left over from an old search
+        if self.keys[i] == key or depth >= self.depths[i] or self.ages[i] != self.age:
+            if self.keys[i] != key and self.ages[i] == self.age and self.depths[i] >= 0:
+                self.write(i + 1, self.keys[i], self.depths[i], self.bounds[i], self.scores[i], self.moves[i])
+            self.write(i, key, depth, bound, score, moveID)
+        else:
+            self.write(i + 1, key, depth, bound, score, moveID)
+        self.stores += 1
+
+    def write(self, i, key, depth, bound, score, moveID):
+        self.keys[i] = key
+        self.depths[i] = min(depth, 127)
+        self.bounds[i] = bound
+        self.scores[i] = score
+        self.moves[i] = moveID
+        self.ages[i] = self.age
+
+    '''
+    How full the table is in parts per thousand, counting only entries from the current search
+    '''
+    def usage(self):
+        sample = min(1000, len(self.ages))
+        used = sum(1 for i in range(sample) if self.depths[i] >= 0 and self.ages[i] == self.age)
+        return used * 1000 // sample
@@ -0,0 +1,116 @@
+"""
+Runs the CheckersAI search on a background thread so CheckersMain can keep drawing and handling events while the AI
+thinks. The main loop starts a search, polls it once a frame, and cancels it on undo or reset. While the human is
+thinking the worker can ponder: it plays the reply the last search expected and searches the position after it, which
+fills the shared transposition table so the AI's next search finishes sooner when the guess was right.
+"""
+import logging
+import threading
+from Checkers import CheckersAI
+from Checkers.CheckersBitboard import BitboardState, BitboardMove, matchMove
+from Checkers.CheckersEngine import AMERICAN
+
+log = logging.getLogger(__name__)
+
+
+class SearchWorker():
+    def __init__(self, depth=CheckersAI.DEPTH, timeLimit=None):
+        self.depth = depth
+        self.timeLimit = timeLimit
+        self.thread = None
+        self.stopEvent = threading.Event()
+        self.info = None #SearchInfo of the finished search, None while it is still running
+        self.validMoves = []
+        self.pondering = False
+        self.expectedReply = None #second move of the last principal variation, what pondering assumes the human plays
+
+    '''
+    Starts searching gs on a copy of the position, so the caller's GameState can still be drawn while it runs
+    '''
+    def start(self, gs, validMoves):
+        self.cancel()
+        self.validMoves = validMoves
+        self.pondering = False
+        self.launch(searchState(gs), self.timeLimit)
+
+    '''
+    Searches the position after the expected reply until cancel is called. Does nothing if there is no guess
+    '''
+    def ponder(self, gs):
+        self.cancel()
+        if self.expectedReply is None or getattr(gs, 'variant', AMERICAN) is not AMERICAN:
+            return
+        bitboard = BitboardState.fromGameState(gs)
+        if self.expectedReply not in [int(m) for m in bitboard.getValidMoves()]:
+            return
+        bitboard.makeMove(self.expectedReply)
+        log.debug("pondering after %s", BitboardMove(self.expectedReply).getChessNotation())
+        self.validMoves = []
+        self.pondering = True
+        self.launch(bitboard, None)
+
+    def launch(self, bitboard, timeLimit):
+        self.stopEvent = threading.Event()
+        self.info = None
+        self.thread = threading.Thread(target=self.run, args=(bitboard, timeLimit, self.stopEvent), daemon=True)
+        self.thread.start()
+
+    def run(self, bitboard, timeLimit, stopEvent):
+        try:
+            info = CheckersAI.searchPosition(bitboard, bitboard.getValidMoves(), self.depth, timeLimit,
+                                             stopEvent=stopEvent)
+        except Exception:
+            #a finished search without a move, so poll still hands back a legal one instead of waiting forever
+            log.exception("search failed")
+            info = CheckersAI.SearchInfo()
+        if not stopEvent.is_set():
+            self.info = info
+
+    '''
+    True from start until poll hands back the move, pondering doesn't count
+    '''
+    def isThinking(self):
+        return self.thread is not None and not self.pondering
+
+    '''
+    Called once a frame. Returns the chosen move out of the validMoves given to start once the search is done, None
+    until then. validMoves must not be empty
+    '''
+    def poll(self):
+        if self.pondering or self.thread is None or self.thread.is_alive() or self.info is None:
+            return None
+        info = self.info
+        self.thread = None
+        self.info = None
+        if len(info.pv) == 0:
+            log.warning("search finished without a move, playing a random one")
+            return CheckersAI.findRandomMove(self.validMoves)
+        self.expectedReply = int(info.pv[1]) if len(info.pv) > 1 and isinstance(info.pv[1], int) else None
+        move = matchMove(info.pv[0], self.validMoves)
+        if move is None:
+            log.warning("%s is not one of the valid moves, playing a random one", info.pv[0].getChessNotation())
+            return CheckersAI.findRandomMove(self.validMoves)
+        log.debug("depth %d score %d nodes %d", info.depth, info.score, info.nodes)
+        return move
+
+    '''
+    Stops a search or ponder that is running and throws its result away
+    '''
+    def cancel(self):
+        if self.thread is not None:
+            self.stopEvent.set()
+            self.thread.join()
+            log.debug("search cancelled")
+        self.thread = None
+        self.info = None
+        self.pondering = False
+
+
+'''
+The state a search of gs runs on: a BitboardState for American checkers, a copy of the GameState for the variants the
+bitboards don't play
+'''
+def searchState(gs):
+    if getattr(gs, 'variant', AMERICAN) is AMERICAN:
+        return BitboardState.fromGameState(gs)
+    return gs.clone()
@@ -0,0 +1,88 @@
+import random
+import unittest
+from Checkers import CheckersAI
+from Checkers.CheckersBatch import BoardBatch
+from Checkers.CheckersBitboard import BitboardState, newMoveBuffer, squareToRowCol, rowColToSquare
+from Checkers.CheckersEngine import GameState
+
+DELTAS = ((-1, -1), (-1, 1), (1, -1), (1, 1)) #row and col steps of BoardBatch.DIRECTIONS
+
+
+'''
+Positions from random games, every one with a move to play. Every other game is played on a GameState
+'''
+def randomStates(games, seed=7):
+    rng = random.Random(seed)
+    states = []
+    for game in range(games):
+        gs = GameState() if game % 2 else BitboardState()
+        for _ in range(rng.randint(0, 60)):
+            validMoves = gs.getValidMoves()
+            if len(validMoves) == 0:
+                break
+            states.append(gs.clone())
+            gs.makeMove(rng.choice(validMoves))
+    return states
+
+
+'''
+(4, 32 bit) targets moveTargets should give gs, worked out from its moves one at a time. A jump's first leg can be any
+jump of its piece over one of the pieces it takes, so every one of those counts
+'''
+def expectedTargets(gs):
+    targets = [0, 0, 0, 0]
+    empty = ~(gs.red | gs.black)
+    for move in gs.getValidMoves():
+        row, col = squareToRowCol(move.fromSq)
+        for i, (dr, dc) in enumerate(DELTAS):
+            if not gs.kings & (1 << move.fromSq) and (dr < 0) != gs.redToMove:
+                continue #men only go forward
+            if not move.isCapture:
+                if (row + dr, col + dc) == squareToRowCol(move.toSq):
+                    targets[i] |= 1 << move.toSq
+                continue
+            landRow, landCol = row + 2 * dr, col + 2 * dc
+            if 0 <= landRow < 8 and 0 <= landCol < 8 and move.captured >> rowColToSquare(row + dr, col + dc) & 1:
+                landing = rowColToSquare(landRow, landCol)
+                if empty >> landing & 1:
+                    targets[i] |= 1 << landing
+    return targets
+
+
+def quietSteps(gs, redToMove):
+    side = BitboardState(gs.red, gs.black, gs.kings, redToMove)
+    return side.generateQuietMoves(newMoveBuffer(), 0)
+
+
+class BoardBatchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.states = randomStates(16)
+        cls.boards = [gs if isinstance(gs, BitboardState) else BitboardState.fromGameState(gs) for gs in cls.states]
+        cls.batch = BoardBatch.fromStates(cls.states)
+
+    def test_evaluate_matches_score_board(self):
+        scores = self.batch.evaluate()
+        for gs, score in zip(self.states, scores):
+            self.assertEqual(int(score), CheckersAI.scoreBoard(gs), gs.getFen())
+
+    def test_step_counts_match_quiet_moves(self):
+        redSteps, blackSteps = self.batch.stepCounts()
+        for gs, red, black in zip(self.boards, redSteps, blackSteps):
+            self.assertEqual(int(red), quietSteps(gs, True), gs.getFen())
+            self.assertEqual(int(black), quietSteps(gs, False), gs.getFen())
+
+    def test_move_targets_match_generated_moves(self):
+        targets, hasJump = self.batch.moveTargets()
+        moveCounts = self.batch.moveCounts()
+        self.assertTrue(hasJump.any() and not hasJump.all())
+        for n, gs in enumerate(self.boards):
+            validMoves = gs.getValidMoves()
+            self.assertEqual(bool(hasJump[n]), validMoves[0].isCapture, gs.getFen())
+            self.assertEqual([int(target) for target in targets[:, n]], expectedTargets(gs), gs.getFen())
+            if not hasJump[n]:
+                self.assertEqual(int(moveCounts[n]), len(validMoves), gs.getFen())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,17 @@
+import unittest
+from Checkers.CheckersBitboard import BitboardState
+from Checkers.CheckersEngine import GameState
+
+
+class BitboardMoveTest(unittest.TestCase):
+    def test_equal_moves_hash_the_same(self):
+        listMoves = GameState().getValidMoves()
+        for move in BitboardState().getValidMoves():
+            same = [listMove for listMove in listMoves if listMove == move]
+            self.assertEqual(len(same), 1)
+            self.assertEqual(hash(move), hash(same[0]))
+            self.assertIn(move, set(listMoves))
+
+
+if __name__ == "__main__":
+    unittest.main()
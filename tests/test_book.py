@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from Checkers.CheckersBitboard import BitboardState, matchMove
+from Checkers.CheckersBook import BookBuilder, OpeningBook
+from Checkers.CheckersEngine import GameState
+
+
+def firstMoves(plies):
+    gs = BitboardState()
+    moves = []
+    for _ in range(plies):
+        move = gs.getValidMoves()[-1]
+        moves.append(int(move))
+        gs.makeMove(move)
+    return moves
+
+
+class BookBuilderTest(unittest.TestCase):
+    def test_random_plies_are_not_booked(self):
+        builder = BookBuilder(plies=8)
+        builder.addGame(firstMoves(10), "red", randomPlies=4)
+        self.assertEqual(len(builder.counts), 4)
+        self.assertNotIn(BitboardState().zobristHash, [key for key, move in builder.counts])
+
+    def test_book_moves_come_back(self):
+        builder = BookBuilder()
+        moves = firstMoves(6)
+        builder.addGame(moves, "draw")
+        builder.addGame(moves, "draw")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "book.bin")
+            self.assertEqual(builder.write(path), 6)
+            book = OpeningBook(path)
+            try:
+                gs = BitboardState()
+                self.assertEqual(int(book.chooseMove(gs, gs.getValidMoves())), moves[0])
+            finally:
+                book.close()
+
+
+class MatchMoveTest(unittest.TestCase):
+    def test_jumps_between_the_same_squares(self):
+        fen = "W:W26:B22,23,14,15,1"
+        for bitboardMove in BitboardState.fromFen(fen).getValidMoves():
+            for validMoves in (GameState.fromFen(fen).getValidMoves(), BitboardState.fromFen(fen).getValidMoves()):
+                self.assertEqual(matchMove(bitboardMove, validMoves).getPdnNotation(), bitboardMove.getPdnNotation())
+
+
+if __name__ == "__main__":
+    unittest.main()
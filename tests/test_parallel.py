@@ -0,0 +1,31 @@
+import unittest
+from Checkers import CheckersParallel
+from Checkers.CheckersBitboard import BitboardState
+from Checkers.CheckersEngine import GameState, INTERNATIONAL, RUSSIAN
+
+
+class VariantTest(unittest.TestCase):
+    def test_bitboards_refuse_other_variants(self):
+        for variant in (RUSSIAN, INTERNATIONAL):
+            with self.assertRaises(ValueError):
+                BitboardState.fromGameState(GameState(variant))
+
+    def test_variant_games_search_on_the_list_engine(self):
+        for variant in (RUSSIAN, INTERNATIONAL):
+            gs = GameState(variant)
+            validMoves = gs.getValidMoves()
+            move = CheckersParallel.findBestMoveParallel(gs, validMoves, depth=2, workers=1)
+            self.assertTrue(any(move is validMove for validMove in validMoves))
+
+    def test_american_game_state_matches_its_moves(self):
+        gs = GameState()
+        validMoves = gs.getValidMoves()
+        try:
+            result = CheckersParallel.searchParallel(gs, validMoves, depth=2, workers=1)
+        finally:
+            CheckersParallel.shutdownPool()
+        self.assertTrue(any(result.move is validMove for validMove in validMoves))
+
+
+if __name__ == "__main__":
+    unittest.main()
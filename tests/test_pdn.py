@@ -0,0 +1,86 @@
+import io
+import os
+import tempfile
+import unittest
+from Checkers.CheckersBitboard import BitboardState
+from Checkers.CheckersEngine import START_FEN, GameState
+from Checkers.CheckersPdn import PDN_START_FEN, PdnError, PositionIndex, buildIndex, findPdnMove, readGames, \
+    writeGame
+
+# The trunk of the Old Fourteenth opening the way database collections write it: no FEN tag, black moves first
+OLD_FOURTEENTH = b"""[Event "Old Fourteenth"]
+[Black "?"]
+[White "?"]
+[Result "*"]
+1. 11-15 23-19 2. 8-11 22-17 3. 4-8 17-13 4. 15-18 24-20 5. 11-15 28-24 6. 8-11
+26-23 7. 9-14 31-26 8. 6-9 13x6 9. 2x9 26-22 *
+"""
+
+
+class UntaggedGameTest(unittest.TestCase):
+    def test_starts_with_black_to_move(self):
+        game = next(readGames(io.BytesIO(OLD_FOURTEENTH)))
+        self.assertEqual(game.startFen(), PDN_START_FEN)
+        played = [move.getPdnNotation() for gs, move in game.replay()]
+        self.assertEqual(played, game.moves)
+        self.assertEqual(len(played), 18)
+
+    def test_index_finds_every_position(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            pdnPath, indexPath = os.path.join(tmp, "games.pdn"), os.path.join(tmp, "games.idx")
+            with open(pdnPath, 'wb') as f:
+                f.write(OLD_FOURTEENTH)
+            games, entries = buildIndex(pdnPath, indexPath)
+            self.assertEqual((games, entries), (1, 19))
+            positionIndex = PositionIndex(indexPath)
+            try:
+                after = BitboardState.fromFen("B:W19,20,21,22,23,24,25,27,29,30,32:B1,3,5,7,9,10,11,12,14,15,18")
+                self.assertEqual(positionIndex.gamesReaching(after.zobristHash), [0])
+            finally:
+                positionIndex.close()
+
+
+class WriteGameTest(unittest.TestCase):
+    def test_engine_game_round_trips(self):
+        gs = BitboardState()
+        moves = []
+        for _ in range(12):
+            move = gs.getValidMoves()[0]
+            moves.append(move)
+            gs.makeMove(move)
+        out = io.StringIO()
+        writeGame(out, moves, {'FEN': START_FEN})
+        self.assertIn("1... %s" % moves[0].getPdnNotation(), out.getvalue())
+        game = next(readGames(io.BytesIO(out.getvalue().encode())))
+        self.assertEqual([move for gs, move in game.replay()], moves)
+
+    def test_untagged_game_numbers_black_first(self):
+        out = io.StringIO()
+        writeGame(out, ["11-15", "23-19", "8-11"])
+        self.assertIn("1. 11-15 23-19 2. 8-11", out.getvalue())
+
+
+# two ways to jump from 26 to 10 that take different pieces
+TWO_ROUTES = "W:W26:B22,23,14,15,1"
+
+
+class MultiJumpTest(unittest.TestCase):
+    def test_every_landing_square_is_written(self):
+        for cls in (BitboardState, GameState):
+            gs = cls.fromFen(TWO_ROUTES)
+            self.assertEqual(sorted(move.getPdnNotation() for move in gs.getValidMoves()), ["26x17x10", "26x19x10"])
+
+    def test_routes_replay_to_different_positions(self):
+        for text, fen in (("26x19x10", "B:W10:B1,14,22"), ("26x17x10", "B:W10:B1,15,23")):
+            for cls in (BitboardState, GameState):
+                gs = cls.fromFen(TWO_ROUTES)
+                gs.makeMove(findPdnMove(gs, text))
+                self.assertEqual(gs.getFen(), fen)
+
+    def test_short_form_is_ambiguous(self):
+        with self.assertRaises(PdnError):
+            findPdnMove(BitboardState.fromFen(TWO_ROUTES), "26x10")
+
+
+if __name__ == "__main__":
+    unittest.main()
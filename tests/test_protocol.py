@@ -0,0 +1,34 @@
+import io
+import unittest
+from Checkers import CheckersProtocol
+from Checkers.CheckersProtocol import EngineProtocol
+
+
+def failingThink(*args, **kwargs):
+    raise RuntimeError("search broke")
+
+
+class EngineProtocolTest(unittest.TestCase):
+    def run_engine(self, lines):
+        out = io.StringIO()
+        EngineProtocol(out).run(lines)
+        return out.getvalue().splitlines()
+
+    def test_missing_book_is_an_error_not_an_exit(self):
+        lines = self.run_engine(["setoption name Book value /nonexistent/book.bin", "isready"])
+        self.assertTrue(lines[0].startswith("error "))
+        self.assertEqual(lines[-1], "readyok")
+
+    def test_failed_search_still_answers(self):
+        think = CheckersProtocol.think
+        CheckersProtocol.think = failingThink
+        try:
+            lines = self.run_engine(["position startpos", "go depth 3"])
+        finally:
+            CheckersProtocol.think = think
+        self.assertTrue(lines[0].startswith("error "))
+        self.assertTrue(lines[-1].startswith("bestmove "))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import random
+import unittest
+from Checkers import CheckersAI, CheckersTablebase
+from Checkers.CheckersBitboard import BitboardState
+from Checkers.CheckersEngine import GameState
+
+
+def randomPositions(count, seed=1):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        gs = GameState()
+        for _ in range(rng.randint(0, 30)):
+            validMoves = gs.getValidMoves()
+            if len(validMoves) == 0:
+                break
+            gs.makeMove(rng.choice(validMoves))
+        if len(gs.getValidMoves()) != 0:
+            positions.append(gs)
+    return positions
+
+
+class PackedSearchTest(unittest.TestCase):
+    def test_bitboard_search_scores_like_the_list_engine(self):
+        for gs in randomPositions(12):
+            bitboard = BitboardState.fromGameState(gs)
+            expected = CheckersAI.searchPosition(gs, gs.getValidMoves(), 3, useTable=False)
+            info = CheckersAI.searchPosition(bitboard, bitboard.getValidMoves(), 3, useTable=False)
+            self.assertEqual(info.score, expected.score)
+
+    def test_stopped_search_keeps_a_move_and_the_board(self):
+        gs = BitboardState()
+        validMoves = gs.getValidMoves()
+        info = CheckersAI.searchPosition(gs, validMoves, 20, useTable=False, nodeLimit=500)
+        self.assertIn(info.pv[0], validMoves)
+        self.assertEqual(gs.pack(), BitboardState().pack())
+
+
+class TableScoreTest(unittest.TestCase):
+    def test_wins_are_stored_counted_from_the_position(self):
+        for win in (CheckersAI.CHECKMATE, CheckersAI.TABLEBASE_WIN - CheckersTablebase.MAX_DISTANCE):
+            for sign in (1, -1):
+                stored = CheckersAI.scoreToTable(sign * (win - 3), 3)
+                self.assertEqual(CheckersAI.scoreFromTable(stored, 7), sign * (win - 7))
+
+    def test_evaluations_are_stored_as_they_are(self):
+        for score in (0, 250, -1200):
+            self.assertEqual(CheckersAI.scoreToTable(score, 5), score)
+            self.assertEqual(CheckersAI.scoreFromTable(score, 5), score)
+
+
+if __name__ == "__main__":
+    unittest.main()
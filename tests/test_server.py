@@ -0,0 +1,51 @@
+import asyncio
+import json
+import logging
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from Checkers import CheckersServer
+from Checkers.CheckersServer import GameServer
+
+
+def failingSearch(packedState, depth, timeLimit):
+    raise RuntimeError("worker died")
+
+
+class FailingWorkerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        logging.disable(logging.CRITICAL)
+        self.server = GameServer(workers=1)
+        self.server.pool.shutdown()
+        self.server.pool = ThreadPoolExecutor(max_workers=1) #the patched search is seen by a thread, not a process
+        self.server.searchSlots = asyncio.Semaphore(1)
+        self.searchMove = CheckersServer.searchMove
+
+    async def asyncTearDown(self):
+        CheckersServer.searchMove = self.searchMove
+        self.server.pool.shutdown()
+        logging.disable(logging.NOTSET)
+
+    async def request(self, **request):
+        return await self.server.handle(json.dumps(request))
+
+    async def test_game_goes_on_after_a_failed_search(self):
+        CheckersServer.searchMove = failingSearch
+        game = await self.request(op="new", human="red", depth=2, time=1.0)
+        reply = await self.request(op="move", game=game["game"], move=game["moves"][0])
+        self.assertTrue(reply["ok"], reply)
+        self.assertIsNotNone(reply["ai"])
+        reply = await self.request(op="move", game=game["game"], move=reply["moves"][0])
+        self.assertTrue(reply["ok"], reply)
+        await asyncio.sleep(0) #let the done callbacks run
+        self.assertEqual(self.server.searchSlots._value, 1)
+
+    async def test_broken_pool_gives_the_slot_back(self):
+        self.server.pool.shutdown()
+        game = await self.request(op="new", human="black", depth=2, time=1.0)
+        self.assertTrue(game["ok"], game)
+        self.assertIsNotNone(game["ai"])
+        self.assertEqual(self.server.searchSlots._value, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
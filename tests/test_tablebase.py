@@ -0,0 +1,41 @@
+import io
+import os
+import tempfile
+import unittest
+from Checkers import CheckersTablebase
+from Checkers.CheckersTablebase import Tablebase, generate, positionCount, signaturesUpTo
+
+
+def readTables(directory):
+    tablebase = Tablebase(directory)
+    tables = {}
+    for signature in signaturesUpTo(2):
+        entries = positionCount(signature) * 2
+        tables[signature] = [tablebase.probeIndex(signature, i) for i in range(entries)]
+    tablebase.close()
+    return tables
+
+
+class GenerateTest(unittest.TestCase):
+    def test_long_wins_keep_their_value(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            full, capped = os.path.join(tmp, "full"), os.path.join(tmp, "capped")
+            generate(full, 2, out=io.StringIO())
+            maxDistance = CheckersTablebase.MAX_DISTANCE
+            CheckersTablebase.MAX_DISTANCE = 3 #most wins in the table are longer than this
+            try:
+                generate(capped, 2, out=io.StringIO())
+            finally:
+                CheckersTablebase.MAX_DISTANCE = maxDistance
+            fullTables, cappedTables = readTables(full), readTables(capped)
+            longest = 0
+            for signature, entries in fullTables.items():
+                for (value, distance), (cappedValue, cappedDistance) in zip(entries, cappedTables[signature]):
+                    self.assertEqual(value, cappedValue)
+                    self.assertEqual(min(distance, 3), cappedDistance)
+                    longest = max(longest, distance)
+            self.assertGreater(longest, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()